@@ -1,14 +1,84 @@
 
 import logging
-import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+from requests.utils import parse_header_links
+
+import metrics
+from disk_cache import make_key
+from filters import compile_filters
+from projection import compile_fields, project
+from rate_limit import RateLimitScheduler, resource_for
+from transport import HttpTransport
 
 logger = logging.getLogger(__name__)
 
+# Constants
+SEARCH_ENDPOINT = '/search/issues'
+SEARCH_RESULTS_LIMIT = 1000 # the search API never returns more results than this
+# time bounds the sorted PR listing already stops at, without the search API's extra requests
+LISTING_BOUND_QUALIFIERS = ('merged:', 'updated:')
+MAX_RATE_LIMIT_RETRIES = 10
+
+# Page size per endpoint kind (GitHub allows up to 100 everywhere)
+DEFAULT_PAGE_SIZE = 100
+PAGE_SIZES = {
+    'pulls': 100,
+    'reviews': 100,
+    'check_runs': 100,
+    'check_suites': 100,
+    'search': 100,
+    'repos': 100,
+}
+
+
+def parse_timestamp(value):
+    """
+    Parses a GitHub ISO-8601 timestamp (e.g. '2024-05-01T12:00:00Z') into an aware UTC datetime.
+    """
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def parse_links(header):
+    """
+    Parses a Link header into {rel: page number}, e.g. {'next': 2, 'last': 7}.
+    """
+    links = {}
+    for link in parse_header_links(header or ''):
+        page = parse_qs(urlparse(link.get('url', '')).query).get('page')
+        if link.get('rel') and page:
+            links[link['rel']] = int(page[0])
+    return links
+
+
 class GitHubClient:
-    def __init__(self, token, base_url, page_size=50):
+    def __init__(self, token, base_url, page_size=None, transport=None, cache=None, max_workers=1,
+                 scheduler=None, page_sizes=None, fields=None, metrics_registry=None):
+        """
+        page_size applies to every endpoint, page_sizes ({kind: size}, see PAGE_SIZES) to single ones;
+        without either, the PAGE_SIZES defaults are used.
+        fields ({'pr' | 'review' | 'check': dotted paths}, see projection.py) trims the returned objects
+        to those fields, after the filters ran on the full objects.
+        Requests are recorded in metrics_registry (default: the process-wide metrics.REGISTRY).
+        """
         self.base_url = base_url.rstrip('/')
-        self.page_size = page_size
+        self.page_size = page_size or DEFAULT_PAGE_SIZE
+        self.page_sizes = {kind: page_size or size for kind, size in PAGE_SIZES.items()}
+        self.page_sizes.update(page_sizes or {})
+        self.max_workers = max_workers
+        self._page_executor = None # created on first concurrent pagination
+        self._page_executor_lock = threading.Lock()
         self._token = token
+        self._transport = transport or HttpTransport()
+        self._cache = cache # optional DiskCache for conditional requests
+        self._scheduler = scheduler or RateLimitScheduler([token]) # may pool several tokens
+        self._metrics = metrics_registry or metrics.REGISTRY
+        self._projections = {kind: compile_fields(kind_fields) for kind, kind_fields in (fields or {}).items()}
 
         self._headers = {
             'Authorization': f'Bearer {token}',
@@ -17,36 +87,240 @@ class GitHubClient:
 
         logger.debug(f"GitHubClient initialized with base_url={self.base_url}, page_size={self.page_size}")
 
-    def _get_json(self, endpoint, params=None):
+    def _send(self, method, url, headers, params=None, json=None):
+        """
+        Sends a request with the token handed out by the rate-limit scheduler.
+        Requests rejected by a rate limit are retried once the scheduler allows it.
+        """
+        resource = resource_for(url)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES):
+            if attempt:
+                self._metrics.record_retry(url, 'rate_limit')
+            waited_from = time.perf_counter()
+            token = self._scheduler.acquire(resource)
+            self._metrics.observe_rate_limit_wait(resource, time.perf_counter() - waited_from)
+            request_headers = dict(headers, Authorization=f'Bearer {token}')
+
+            start = time.perf_counter()
+            try:
+                if method == 'POST':
+                    response = self._transport.post(url, headers=request_headers, json=json)
+                else:
+                    response = self._transport.get(url, headers=request_headers, params=params)
+            except Exception:
+                self._metrics.observe_request(method, url, 'error', time.perf_counter() - start)
+                raise
+            self._observe(method, url, resource, response, time.perf_counter() - start)
+
+            if not self._scheduler.observe(token, response, resource):
+                break
+
+        return response
+
+    def _observe(self, method, url, resource, response, seconds):
+        """
+        Records the request and the rate-limit headroom its response reports in the metrics.
+        """
+        self._metrics.observe_request(method, url, response.status_code, seconds,
+                                      len(getattr(response, 'content', None) or b''))
+        headers = response.headers
+        if 'X-RateLimit-Remaining' in headers:
+            limit = headers.get('X-RateLimit-Limit')
+            self._metrics.observe_rate_limit(headers.get('X-RateLimit-Resource', resource),
+                                             int(headers['X-RateLimit-Remaining']),
+                                             int(limit) if limit else None)
+
+    def _get_page(self, endpoint, params=None):
+        """
+        GET an endpoint and return the decoded JSON body with the pages of its Link header.
+        When a cache is configured, sends If-None-Match / If-Modified-Since from the cached
+        entry and serves the cached body on 304 (which doesn't count against the rate limit).
+        """
         url = f"{self.base_url}{endpoint}"
 
-        response = requests.get(url, headers=self._headers, params=params)
+        headers = self._headers
+        cache_key = None
+        cached = None
+        if self._cache is not None:
+            cache_key = make_key(url, params)
+            cached = self._cache.get(cache_key)
+            if cached:
+                headers = dict(headers)
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self._send('GET', url, headers, params=params)
+        if response.status_code == 304 and cached:
+            logger.debug(f"Not modified, serving {url} from cache")
+            return cached['body'], parse_links(cached.get('link'))
+
         response.raise_for_status()
+        payload = response.json()
+        link = response.headers.get('Link')
+
+        if cache_key is not None:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self._cache.put(cache_key, {'etag': etag, 'last_modified': last_modified, 'link': link,
+                                            'body': payload})
 
-        return response.json()
+        return payload, parse_links(link)
 
-    def _paginate(self, endpoint, params=None, data_key=None):
+    def _get_json(self, endpoint, params=None):
+        return self._get_page(endpoint, params)[0]
+
+    def _project(self, kind, obj):
+        spec = self._projections.get(kind)
+        return project(obj, spec) if spec else obj
+
+    def _executor(self):
+        with self._page_executor_lock:
+            if self._page_executor is None:
+                self._page_executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                         thread_name_prefix='github-pages')
+            return self._page_executor
+
+    def _paginate(self, endpoint, params=None, data_key=None, page_size=None, concurrent=True):
         """
-        iterate over paginated results and yield items one by one.
-        handles pagination by fetching pages until no more items are available.
+        iterate over paginated results and yield items one by one, in order.
+        the first response's Link header tells whether (and up to which rel="last" page) to continue,
+        so no request is spent on an empty page. with max_workers > 1 and concurrent=True, the remaining
+        pages are fetched in parallel, a bounded window ahead of the consumer.
         """
+        page_size = page_size or self.page_size
+        base_params = dict(params or {}, per_page=page_size)
+
+        def fetch(page):
+            payload, links = self._get_page(endpoint, dict(base_params, page=page))
+            items = (payload.get(data_key) if data_key else payload) or []
+            return items, links
+
+        items, links = fetch(1)
+        yield from items # yield each item one by one (iterator dp)
+
+        last_page = links.get('last')
+        if concurrent and self.max_workers > 1 and last_page and last_page > 2:
+            executor = self._executor()
+            window = deque()
+            next_page = 2
+            try:
+                while window or next_page <= last_page:
+                    while next_page <= last_page and len(window) < 2 * self.max_workers:
+                        window.append(executor.submit(fetch, next_page))
+                        next_page += 1
+                    items, _ = window.popleft().result()
+                    yield from items
+            finally:
+                # consumer stopped early (or a page failed), drop the pages not started yet
+                for future in window:
+                    future.cancel()
+            return
+
         page = 1
+        # without Link headers (non-GitHub stand-ins) a full page means there may be more
+        while links.get('next') or (not links and len(items) == page_size):
+            page = links.get('next', page + 1)
+            items, links = fetch(page)
+            if not items:
+                break
+            yield from items
+
+    @staticmethod
+    def _pagination_bound(filters, updated_since=None):
+        """
+        Returns the latest of updated_since and the `updated_since` bounds declared by the filters, or None.
+        """
+        bounds = [updated_since] + [getattr(fn, 'updated_since', None) for fn in filters or []]
+        bounds = [bound for bound in bounds if bound is not None]
+        return max(bounds) if bounds else None
+
+    def _plan_search_query(self, org, repo, filters, updated_since):
+        """
+        Builds a search query from the filters that can be pushed down to the server, through their
+        `search_qualifiers` attribute (see filters.py), plus the updated_since bound.
+
+        Only worth it with a qualifier the listing can't bound (e.g. `author:`): time bounds alone are
+        cheaper through the listing sorted by update, 100 full PRs per request, than through search
+        pages plus a request per hit, from the search rate limit of 30 per minute.
 
+        Returns:
+            The query string, or None if the listing is cheaper.
+        """
+        qualifiers = [qualifier for fn in filters or [] for qualifier in getattr(fn, 'search_qualifiers', ())]
+        if all(qualifier.startswith(LISTING_BOUND_QUALIFIERS) for qualifier in qualifiers):
+            return None
+        if updated_since:
+            qualifiers.append(f"updated:>={updated_since:%Y-%m-%dT%H:%M:%SZ}")
+
+        return ' '.join([f"repo:{org}/{repo}", 'is:pr', 'is:merged'] + qualifiers)
+
+    def clear_prefetched(self, org, repo):
+        """
+        Drops the results prefetched for a repository and not requested (none with REST, see
+        GitHubGraphQLClient).
+        """
+
+    def fetch_pull(self, org, repo, pr_number):
+        return self._get_json(f"/repos/{org}/{repo}/pulls/{pr_number}")
+
+    def _search_merged_prs(self, org, repo, query):
+        """
+        Finds merged PRs with the search API and fetches their full PR objects
+        (search results are issues, without merge_commit_sha).
+
+        Returns:
+            The PRs newest update first, or None if the search results are incomplete.
+        """
+        params = {'q': query, 'sort': 'updated', 'order': 'desc'}
+
+        numbers = []
+        page = 1
         while True:
-            page_params = dict(params or {}, per_page=self.page_size, page=page)
-            payload = self._get_json(endpoint, page_params)
+            payload = self._get_json(SEARCH_ENDPOINT, dict(params, per_page=self.page_sizes['search'], page=page))
+            if payload.get('total_count', 0) > SEARCH_RESULTS_LIMIT or payload.get('incomplete_results'):
+                logger.info(f"Search for '{query}' matched {payload.get('total_count')} PRs (incomplete), "
+                            f"falling back to the PR listing")
+                return None
 
-            items = payload.get(data_key) if data_key else payload
+            items = payload.get('items')
             if not items:
                 break
 
-            for item in items:
-                yield item # yield each item one by one (iterator dp)
-
+            numbers.extend(item['number'] for item in items)
+            if len(numbers) >= payload['total_count']:
+                break
             page += 1
 
-    def fetch_merged_prs(self, org, repo, filters=None):
-        logger.info(f"Fetching merged PRs for {org}/{repo}")
+        logger.info(f"Search for '{query}' matched {len(numbers)} PRs")
+        if self.max_workers > 1 and len(numbers) > 1:
+            return list(self._executor().map(lambda num: self.fetch_pull(org, repo, num), numbers))
+        return [self.fetch_pull(org, repo, num) for num in numbers]
+
+    def fetch_merged_prs(self, org, repo, filters=None, updated_since=None, use_search=False):
+        """
+        Fetches merged PRs, newest update first.
+        If updated_since (aware datetime) is given, pagination stops at the first PR updated before it.
+        Filters can declare such a bound themselves with an `updated_since` attribute
+        (see filters.merge_date_filter); the latest bound wins.
+
+        With use_search, the filters that support it are pushed down into a search API query, so only
+        matching PRs are fetched. All filters are still applied client-side afterwards.
+        """
+        updated_since = self._pagination_bound(filters, updated_since)
+        matches = compile_filters(filters)
+
+        query = self._plan_search_query(org, repo, filters, updated_since) if use_search else None
+        if query:
+            prs = self._search_merged_prs(org, repo, query)
+            if prs is not None:
+                prs = [self._project('pr', pr) for pr in matches.select(pr for pr in prs if pr.get('merged_at'))]
+                logger.info(f"Found {len(prs)} merged PRs for {org}/{repo}")
+                return prs
+
+        logger.info(f"Fetching merged PRs for {org}/{repo}" + (f" updated since {updated_since}" if updated_since else ""))
 
         endpoint = f"/repos/{org}/{repo}/pulls"
         params = {
@@ -56,14 +330,21 @@ class GitHubClient:
         }
 
         prs = []
-        for pr in self._paginate(endpoint, params): # iterate over paginated results
+        # with a bound, fetch page by page so no page past the bound is requested
+        pages = self._paginate(endpoint, params, page_size=self.page_sizes['pulls'], concurrent=updated_since is None)
+        for pr in pages: # iterate over paginated results
+            if updated_since and parse_timestamp(pr['updated_at']) < updated_since:
+                # sorted by `updated` desc, so all remaining PRs are older too
+                logger.debug(f"Reached PRs updated before {updated_since}, stopping pagination")
+                break
+
             if not pr.get('merged_at'):
                 continue
 
-            if filters and not all(fn(pr) for fn in filters): # apply filters if provided
+            if not matches(pr): # apply filters if provided
                 continue
 
-            prs.append(pr)
+            prs.append(self._project('pr', pr))
 
         logger.info(f"Found {len(prs)} merged PRs for {org}/{repo}")
         return prs
@@ -73,15 +354,10 @@ class GitHubClient:
 
         endpoint = f"/repos/{org}/{repo}/pulls/{pr_number}/reviews"
 
-        reviews = []
-        for review in self._paginate(endpoint):
-            if review.get('state') != 'APPROVED': # only interested in approved reviews
-                continue
-
-            if filters and not all(fn(review) for fn in filters): # apply filters if provided
-                continue
-
-            reviews.append(review)
+        # only interested in approved reviews, then apply filters if provided
+        approved = (review for review in self._paginate(endpoint, page_size=self.page_sizes['reviews'])
+                    if review.get('state') == 'APPROVED')
+        reviews = [self._project('review', review) for review in compile_filters(filters).select(approved)]
 
         logger.debug(f"Retrieved {len(reviews)} approved reviews for PR #{pr_number}")
         return reviews
@@ -92,13 +368,50 @@ class GitHubClient:
         endpoint = f"/repos/{org}/{repo}/commits/{commit_sha}/check-runs"
         params = {'status': status}
 
-        runs = []
-        for check in self._paginate(endpoint, params, data_key='check_runs'):
-            if filters and not all(fn(check) for fn in filters): # apply filters if provided
-                continue
-
-            runs.append(check)
+        checks = self._paginate(endpoint, params, data_key='check_runs', page_size=self.page_sizes['check_runs'])
+        runs = [self._project('check', check) for check in compile_filters(filters).select(checks)]
 
         logger.debug(f"Found {len(runs)} check runs for commit {commit_sha}")
         return runs
 
+    def fetch_check_suites(self, org, repo, commit_sha):
+        """
+        Fetches the completed check suites of a commit that ran check runs, shaped like check runs:
+        one per suite, named after its app, with the aggregate conclusion of the suite's latest runs.
+        Commits with many check runs take a fraction of the requests and payload of fetch_pr_check_runs.
+        """
+        logger.debug(f"Fetching check suites for commit {commit_sha} in {org}/{repo}")
+
+        endpoint = f"/repos/{org}/{repo}/commits/{commit_sha}/check-suites"
+
+        suites = []
+        for suite in self._paginate(endpoint, data_key='check_suites', page_size=self.page_sizes['check_suites']):
+            # apps create an empty suite for every push, only suites that ran checks count
+            if suite.get('status') != 'completed' or not suite.get('latest_check_runs_count'):
+                continue
+
+            suites.append(self._project('check', {
+                'id': suite['id'],
+                'name': (suite.get('app') or {}).get('slug'),
+                'status': suite['status'],
+                'conclusion': suite.get('conclusion'),
+            }))
+
+        logger.debug(f"Found {len(suites)} completed check suites for commit {commit_sha}")
+        return suites
+
+    def fetch_org_repos(self, org, include_archived=False):
+        """
+        Lists the names of the organization's repositories (archived ones only with include_archived).
+        """
+        logger.info(f"Fetching repositories of {org}")
+
+        endpoint = f"/orgs/{org}/repos"
+        params = {'type': 'all', 'sort': 'full_name'}
+
+        repos = [repo['name'] for repo in self._paginate(endpoint, params, page_size=self.page_sizes['repos'])
+                 if include_archived or not repo.get('archived')]
+
+        logger.info(f"Found {len(repos)} repositories in {org}")
+        return repos
+
@@ -0,0 +1,244 @@
+import logging
+
+from filters import compile_filters
+from GitHubClient import GitHubClient, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Constants
+GHOST_LOGIN = 'ghost' # what the REST API reports for deleted users
+CHECK_SUITES_PER_COMMIT = 20
+CHECK_RUNS_PER_SUITE = 50
+REVIEWS_PER_PR = 50
+LABELS_PER_PR = 100
+# Fields (dotted paths) of the REST shapes the query maps, per object kind; filters on other fields are rejected
+GRAPHQL_FIELDS = {
+    'pr': ('id', 'number', 'state', 'title', 'body', 'draft', 'html_url', 'author_association', 'user.login',
+           'labels.name', 'created_at', 'updated_at', 'closed_at', 'merged_at', 'merge_commit_sha',
+           'head.ref', 'head.sha', 'base.ref', 'base.sha'),
+    'review': ('id', 'state', 'body', 'html_url', 'author_association', 'user.login', 'submitted_at', 'commit_id'),
+    'check': ('id', 'name', 'head_sha', 'status', 'conclusion', 'details_url', 'html_url', 'started_at',
+              'completed_at', 'app.slug', 'app.name'),
+}
+
+MERGED_PRS_QUERY = f"""
+query($owner: String!, $name: String!, $first: Int!, $after: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequests(states: MERGED, first: $first, after: $after, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        databaseId
+        number
+        title
+        body
+        isDraft
+        url
+        authorAssociation
+        createdAt
+        updatedAt
+        closedAt
+        mergedAt
+        author {{ login }}
+        labels(first: {LABELS_PER_PR}) {{ nodes {{ name }} }}
+        headRefName
+        headRefOid
+        baseRefName
+        baseRefOid
+        mergeCommit {{
+          oid
+          checkSuites(first: {CHECK_SUITES_PER_COMMIT}) {{
+            pageInfo {{ hasNextPage }}
+            nodes {{
+              app {{ slug name }}
+              checkRuns(first: {CHECK_RUNS_PER_SUITE}, filterBy: {{status: COMPLETED, checkType: LATEST}}) {{
+                pageInfo {{ hasNextPage }}
+                nodes {{ databaseId name status conclusion detailsUrl url startedAt completedAt }}
+              }}
+            }}
+          }}
+        }}
+        reviews(states: APPROVED, first: {REVIEWS_PER_PR}) {{
+          pageInfo {{ hasNextPage }}
+          nodes {{ databaseId state body url authorAssociation submittedAt commit {{ oid }} author {{ login }} }}
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def _login(actor):
+    return {'login': actor['login'] if actor else GHOST_LOGIN}
+
+
+def unsupported_fields(kind, fields):
+    """
+    Returns the fields (dotted paths) of an object kind ('pr', 'review' or 'check') that the GraphQL
+    backend doesn't map, which would read as None.
+    """
+    supported = GRAPHQL_FIELDS[kind]
+    return sorted(field for field in set(fields)
+                  if not any(path == field or path.startswith(f"{field}.") for path in supported))
+
+
+def _pr(node):
+    commit = node['mergeCommit']
+    return {
+        'id': node['databaseId'],
+        'number': node['number'],
+        'state': 'closed', # merged PRs, REST has no 'merged' state
+        'title': node['title'],
+        'body': node['body'],
+        'draft': node['isDraft'],
+        'html_url': node['url'],
+        'author_association': node['authorAssociation'],
+        'user': _login(node['author']),
+        'labels': [{'name': label['name']} for label in node['labels']['nodes']],
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'closed_at': node['closedAt'],
+        'merged_at': node['mergedAt'],
+        'merge_commit_sha': commit['oid'] if commit else None,
+        'head': {'ref': node['headRefName'], 'sha': node['headRefOid']},
+        'base': {'ref': node['baseRefName'], 'sha': node['baseRefOid']},
+    }
+
+
+class GitHubGraphQLClient(GitHubClient):
+    """
+    GitHubClient backend that fetches merged PRs together with their approved reviews and the
+    check runs of their merge commits, in batched cursor-paginated GraphQL queries.
+
+    fetch_merged_prs does all the network work and keeps reviews and check runs in memory, so the
+    following fetch_approved_reviews / fetch_pr_check_runs calls are served without requests.
+    Each prefetched result is served once and then evicted: a later call (e.g. a webhook-driven
+    refetch) goes to REST, and run_extract clears what is left at the end of a run (clear_prefetched).
+    The objects are converted to the REST shapes run_transformation consumes, with the fields of
+    GRAPHQL_FIELDS (filters on other fields are rejected, see extract.build_client). Check runs are
+    the latest run per name, like the REST endpoint. When a nested connection was truncated, that
+    PR falls back to REST.
+    """
+
+    def __init__(self, token, base_url, graphql_url=None, page_size=50, **kwargs):
+        super().__init__(token, base_url, page_size=page_size, **kwargs)
+        self.graphql_url = graphql_url or f"{self.base_url}/graphql"
+
+        self._reviews = {} # (org, repo, pr number) -> approved reviews, complete connections only
+        self._check_runs = {} # (org, repo, commit sha) -> completed check runs, complete connections only
+
+    def _graphql(self, query, variables):
+        response = self._send('POST', self.graphql_url, self._headers,
+                              json={'query': query, 'variables': variables})
+        response.raise_for_status()
+
+        payload = response.json()
+        if payload.get('errors'):
+            raise RuntimeError(f"GraphQL query failed: {payload['errors']}")
+        return payload['data']
+
+    def _store_details(self, org, repo, node):
+        reviews = node['reviews']
+        if not reviews['pageInfo']['hasNextPage']:
+            self._reviews[(org, repo, node['number'])] = [
+                {
+                    'id': review['databaseId'],
+                    'state': review['state'],
+                    'body': review['body'],
+                    'html_url': review['url'],
+                    'author_association': review['authorAssociation'],
+                    'user': _login(review['author']),
+                    'submitted_at': review['submittedAt'],
+                    'commit_id': review['commit']['oid'] if review['commit'] else None,
+                }
+                for review in reviews['nodes']
+            ]
+
+        commit = node['mergeCommit']
+        if not commit:
+            return
+        suites = commit['checkSuites']
+        if suites['pageInfo']['hasNextPage'] or any(suite['checkRuns']['pageInfo']['hasNextPage']
+                                                    for suite in suites['nodes']):
+            return
+
+        self._check_runs[(org, repo, commit['oid'])] = [
+            {
+                'id': run['databaseId'],
+                'name': run['name'],
+                'head_sha': commit['oid'],
+                'status': run['status'].lower(),
+                'conclusion': run['conclusion'].lower() if run['conclusion'] else None,
+                'details_url': run['detailsUrl'],
+                'html_url': run['url'],
+                'started_at': run['startedAt'],
+                'completed_at': run['completedAt'],
+                'app': dict(suite['app']) if suite['app'] else None,
+            }
+            for suite in suites['nodes'] for run in suite['checkRuns']['nodes']
+        ]
+
+    def fetch_merged_prs(self, org, repo, filters=None, updated_since=None, use_search=False):
+        """
+        Fetches merged PRs, newest update first, with the same pagination bounds as the REST backend.
+        Search pushdown is not supported here, use_search is ignored.
+        """
+        updated_since = self._pagination_bound(filters, updated_since)
+        matches = compile_filters(filters)
+        logger.info(f"Fetching merged PRs for {org}/{repo} with GraphQL"
+                    + (f" updated since {updated_since}" if updated_since else ""))
+
+        variables = {'owner': org, 'name': repo, 'first': self.page_size, 'after': None}
+        prs = []
+        while True:
+            connection = self._graphql(MERGED_PRS_QUERY, variables)['repository']['pullRequests']
+
+            reached_bound = False
+            for node in connection['nodes']:
+                if updated_since and parse_timestamp(node['updatedAt']) < updated_since:
+                    # sorted by UPDATED_AT desc, so all remaining PRs are older too
+                    reached_bound = True
+                    break
+
+                pr = _pr(node)
+                if not matches(pr): # apply filters if provided
+                    continue
+
+                self._store_details(org, repo, node)
+                prs.append(self._project('pr', pr))
+
+            if reached_bound or not connection['pageInfo']['hasNextPage']:
+                break
+            variables['after'] = connection['pageInfo']['endCursor']
+
+        logger.info(f"Found {len(prs)} merged PRs for {org}/{repo}")
+        return prs
+
+    def clear_prefetched(self, org, repo):
+        for prefetched in (self._reviews, self._check_runs):
+            for key in [key for key in list(prefetched) if key[:2] == (org, repo)]:
+                prefetched.pop(key, None)
+
+    def fetch_approved_reviews(self, org, repo, pr_number, filters=None):
+        reviews = self._reviews.pop((org, repo, pr_number), None)
+        if reviews is None:
+            # not prefetched or truncated, page through REST
+            return super().fetch_approved_reviews(org, repo, pr_number, filters=filters)
+
+        return [self._project('review', review) for review in compile_filters(filters).select(reviews)]
+
+    def fetch_pr_check_runs(self, org, repo, commit_sha, status='completed', filters=None):
+        runs = self._check_runs.pop((org, repo, commit_sha), None) if status == 'completed' else None
+        if runs is None:
+            # not prefetched or truncated, page through REST
+            return super().fetch_pr_check_runs(org, repo, commit_sha, status=status, filters=filters)
+
+        return [self._project('check', run) for run in compile_filters(filters).select(runs)]
+
+    def fetch_check_suites(self, org, repo, commit_sha):
+        runs = self._check_runs.pop((org, repo, commit_sha), None)
+        if runs is None:
+            return super().fetch_check_suites(org, repo, commit_sha)
+
+        # the individual runs were prefetched already, they cost nothing
+        return [self._project('check', run) for run in runs]
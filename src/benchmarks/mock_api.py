@@ -0,0 +1,172 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Constants
+MAX_PAGE_SIZE = 100 # like GitHub
+DEFAULT_PAGE_SIZE = 30
+ROUTES = (
+    ('pulls', re.compile(r'/repos/[^/]+/[^/]+/pulls')),
+    ('reviews', re.compile(r'/repos/[^/]+/[^/]+/pulls/(?P<number>\d+)/reviews')),
+    ('check_runs', re.compile(r'/repos/[^/]+/[^/]+/commits/(?P<sha>[0-9a-f]+)/check-runs')),
+    ('check_suites', re.compile(r'/repos/[^/]+/[^/]+/commits/(?P<sha>[0-9a-f]+)/check-suites')),
+)
+
+
+class MockGitHubAPI:
+    """
+    Local stand-in for the REST endpoints the extraction uses (/pulls, /reviews, /check-runs and /check-suites),
+    serving a SyntheticRepo for any org/repo.
+
+    - latency: seconds added to every response (the server handles requests concurrently)
+    - pagination: per_page/page with Link rel="next"/"last" headers, per_page capped at 100
+    - check runs: filter=latest (the default) keeps the latest run of each name, like GitHub
+    - rate limit: X-RateLimit-* headers for a budget of `rate_limit` requests per
+      `rate_limit_window` seconds; once exhausted, requests get 403 until the window resets
+
+    Served requests are counted per endpoint template in `counts`.
+    """
+
+    def __init__(self, repo, latency=0.0, rate_limit=5000, rate_limit_window=3600.0, port=0):
+        self.repo = repo
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._used = 0
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive, like the real API
+            disable_nagle_algorithm = True # headers and body are separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                api._handle(self)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def _take_budget(self):
+        """
+        Returns (allowed, remaining, reset epoch seconds) of the rate-limit window.
+        """
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.rate_limit_window:
+                self._window_start = now
+                self._used = 0
+            reset_at = int(self._window_start + self.rate_limit_window) + 1
+            if self._used >= self.rate_limit:
+                return False, 0, reset_at
+            self._used += 1
+            return True, self.rate_limit - self._used, reset_at
+
+    def _handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        for endpoint, pattern in ROUTES:
+            match = pattern.fullmatch(url.path)
+            if match:
+                break
+        else:
+            return self._send(request, 404, {'message': 'Not Found'})
+
+        with self._lock:
+            self.counts[endpoint] += 1
+
+        allowed, remaining, reset_at = self._take_budget()
+        headers = {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset_at),
+            'X-RateLimit-Resource': 'core',
+        }
+        if not allowed:
+            return self._send(request, 403, {'message': 'API rate limit exceeded'}, headers)
+
+        per_page = min(int(query.get('per_page', [DEFAULT_PAGE_SIZE])[0]), MAX_PAGE_SIZE)
+        page = int(query.get('page', ['1'])[0])
+        start = (page - 1) * per_page
+
+        if endpoint == 'pulls':
+            total = self.repo.pr_count
+            body = self.repo.prs(start, start + per_page)
+        elif endpoint == 'reviews':
+            reviews = self.repo.reviews(int(match['number']))
+            total = len(reviews)
+            body = reviews[start:start + per_page]
+        elif endpoint == 'check_suites':
+            suites = self.repo.check_suites(match['sha'])
+            total = len(suites)
+            body = {'total_count': total, 'check_suites': suites[start:start + per_page]}
+        else:
+            runs = self.repo.check_runs(match['sha'])
+            if query.get('status', ['completed'])[0] != 'completed':
+                runs = []
+            if query.get('filter', ['latest'])[0] == 'latest':
+                latest = {}
+                for run in runs:
+                    if run['name'] not in latest or run['id'] > latest[run['name']]['id']:
+                        latest[run['name']] = run
+                runs = [run for run in runs if latest[run['name']] is run]
+            total = len(runs)
+            body = {'total_count': total, 'check_runs': runs[start:start + per_page]}
+
+        headers['Link'] = self._link_header(url.path, query, page, per_page, total)
+        self._send(request, 200, body, headers)
+
+    @staticmethod
+    def _link_header(path, query, page, per_page, total):
+        last_page = max(1, -(-total // per_page))
+        params = '&'.join(f"{key}={values[0]}" for key, values in query.items() if key != 'page')
+
+        def link(target_page, rel):
+            return f'<http://127.0.0.1{path}?{params}&page={target_page}>; rel="{rel}"'
+
+        links = []
+        if page < last_page:
+            links.append(link(page + 1, 'next'))
+        links.append(link(last_page, 'last'))
+        return ', '.join(links)
+
+    @staticmethod
+    def _send(request, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json; charset=utf-8')
+        request.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(data)
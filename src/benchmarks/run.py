@@ -0,0 +1,238 @@
+"""
+Benchmark harness: runs extract, transform and end-to-end scenarios against a local mock GitHub API
+serving synthetic repositories, offline, and writes machine-readable results.
+
+Run from the src directory:
+
+    python -m benchmarks.run --prs 100 10000 --latency-ms 20 --output benchmark-results.json
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import yaml
+
+from benchmarks.mock_api import MockGitHubAPI
+from benchmarks.synthetic import SyntheticRepo
+
+# Constants
+SCENARIOS = ('extract', 'transform', 'end_to_end')
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'settings.yaml')
+ORGANIZATION = 'synthetic'
+REPOSITORY = 'repo'
+BENCHMARK_TOKEN = 'benchmark-token'
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark_config(args, base_url, work_dir):
+    """
+    Returns the settings.yaml configuration pointed at the mock API and a scratch directory.
+    """
+    with open(SETTINGS_PATH, 'r') as ymlfile:
+        config = yaml.safe_load(ymlfile)
+
+    config = copy.deepcopy(config)
+    config['github'].update(api_base_url=base_url, organization=ORGANIZATION, repository=REPOSITORY, backend='rest')
+    for key in ('repositories', 'all_repositories'):
+        config['github'].pop(key, None)
+    config['data'].update(raw_dir_path=os.path.join(work_dir, 'raw'),
+                          processed_dir_path=os.path.join(work_dir, 'processed'),
+                          sqlite_path=os.path.join(work_dir, 'github.db'),
+                          raw_format=args.raw_format)
+    config['output']['report_dir_path'] = os.path.join(work_dir, 'reports')
+    config.setdefault('extract', {}).update(max_workers=args.max_workers, check_strategy=args.check_strategy,
+                                            incremental=False)
+    config.setdefault('transform', {}).update(pipelined=args.pipelined)
+    config.setdefault('cache', {}).update(
+        enabled=args.cache, results_enabled=args.cache,
+        dir_path=os.path.join(work_dir, 'cache', 'http'), results_dir_path=os.path.join(work_dir, 'cache', 'results'))
+    return config
+
+
+def write_snapshot(repo, config):
+    """
+    Writes the raw snapshot of a synthetic repository (projected like the extraction would),
+    for the transform scenario.
+    """
+    import extract
+    import projection
+
+    cfg = extract.fetch_config(config)
+    fields = extract.projected_fields(cfg, [], [], [])
+    specs = {kind: projection.compile_fields(kind_fields) for kind, kind_fields in (fields or {}).items()}
+
+    def project(kind, obj):
+        return projection.project(obj, specs[kind]) if kind in specs else obj
+
+    records = ((project('pr', pr), [project('review', rev) for rev in reviews], [project('check', chk) for chk in checks])
+               for pr, reviews, checks in repo.iter_records())
+    if cfg.raw_format == 'sqlite':
+        extract.save_store_records(records, cfg)
+    elif cfg.raw_format == 'ndjson':
+        extract.save_raw_records(records, cfg)
+    else:
+        extract.save_raw_payload(records, cfg)
+
+
+def run_child(scenario, config_path, result_path):
+    """
+    Runs one scenario in this (fresh) process, so its peak RSS is the scenario's own.
+    """
+    import extract
+    import pipeline
+    import transform
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    start = time.perf_counter()
+    if scenario == 'extract':
+        ok = extract.run_extract(config, [], [], [])
+    elif scenario == 'transform':
+        ok = transform.run_transformation(config) is not None
+    elif pipeline.is_pipelined(config):
+        ok = pipeline.run_pipelined(config, [], [], []) is not None
+    else:
+        ok = extract.run_extract(config, [], [], []) and transform.run_transformation(config) is not None
+    wall_seconds = time.perf_counter() - start
+
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({'ok': bool(ok), 'wall_seconds': wall_seconds, 'peak_rss_mb': peak_rss_mb()}, f)
+
+
+def run_scenario(args, scenario, repo, merged_count):
+    """
+    Runs a scenario in a child process against a fresh mock API.
+
+    Returns:
+        The scenario's result dict.
+    """
+    api = MockGitHubAPI(repo, latency=args.latency_ms / 1000, rate_limit=args.rate_limit,
+                        rate_limit_window=args.rate_limit_window).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='scytale-bench-') as work_dir:
+            config = benchmark_config(args, api.base_url, work_dir)
+            if scenario == 'transform':
+                write_snapshot(repo, config)
+            api.reset_counts()
+
+            config_path = os.path.join(work_dir, 'config.json')
+            result_path = os.path.join(work_dir, 'result.json')
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+
+            env = dict(os.environ, TQDM_DISABLE='1')
+            completed = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.run', '--child', scenario, config_path, result_path],
+                env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+
+            if completed.returncode != 0 or not os.path.exists(result_path):
+                child = {'ok': False, 'wall_seconds': None, 'peak_rss_mb': None}
+            else:
+                with open(result_path, 'r', encoding='utf-8') as f:
+                    child = json.load(f)
+    finally:
+        api.stop()
+
+    requests_issued = sum(api.counts.values())
+    wall_seconds = child['wall_seconds']
+    return {
+        'scenario': scenario,
+        'prs': repo.pr_count,
+        'merged_prs': merged_count,
+        'ok': child['ok'],
+        'wall_seconds': wall_seconds,
+        'requests': requests_issued,
+        'requests_by_endpoint': dict(api.counts),
+        'throughput_prs_per_second': merged_count / wall_seconds if wall_seconds else None,
+        'requests_per_second': requests_issued / wall_seconds if wall_seconds else None,
+        'peak_rss_mb': child['peak_rss_mb'],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        run_child(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Scytale PR Report - benchmarks against a local mock GitHub API")
+    parser.add_argument("--prs", type=int, nargs='+', default=[1000],
+        help="Sizes (closed PRs) of the synthetic repositories, e.g. 100 10000 1000000"
+    )
+    parser.add_argument("--scenarios", nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every API response")
+    parser.add_argument("--rate-limit", type=int, default=1_000_000, help="Requests per rate-limit window")
+    parser.add_argument("--rate-limit-window", type=float, default=3600.0, help="Rate-limit window in seconds")
+    parser.add_argument("--max-workers", type=int, default=8, help="extract.max_workers")
+    parser.add_argument("--check-strategy", choices=('runs', 'suites'), default='runs', help="extract.check_strategy")
+    parser.add_argument("--raw-format", choices=('json', 'ndjson', 'sqlite'), default='json')
+    parser.add_argument("--pipelined", action="store_true", help="transform.pipelined for end_to_end")
+    parser.add_argument("--cache", action="store_true", help="Enable the HTTP and result caches (cold)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file (default: stdout)")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the scenario processes")
+    args = parser.parse_args()
+
+    # only the mock API is ever called
+    os.environ['GITHUB_TOKEN'] = BENCHMARK_TOKEN
+    os.environ.pop('GITHUB_TOKENS', None)
+
+    results = {
+        'benchmark': {
+            'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency_ms': args.latency_ms,
+            'rate_limit': args.rate_limit,
+            'max_workers': args.max_workers,
+            'check_strategy': args.check_strategy,
+            'raw_format': args.raw_format,
+            'pipelined': args.pipelined,
+            'cache': args.cache,
+            'seed': args.seed,
+        },
+        'results': [],
+    }
+    for pr_count in args.prs:
+        repo = SyntheticRepo(pr_count, seed=args.seed)
+        merged_count = repo.merged_count()
+        for scenario in args.scenarios:
+            result = run_scenario(args, scenario, repo, merged_count)
+            results['results'].append(result)
+            print(f"{scenario:>10} {pr_count:>8} PRs: "
+                  + (f"{result['wall_seconds']:.2f}s, {result['requests']} requests, "
+                     f"{result['throughput_prs_per_second']:.0f} PRs/s, peak RSS {result['peak_rss_mb']:.0f} MB"
+                     if result['ok'] else "FAILED (rerun with --verbose)"),
+                  file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+# Constants
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+AUTHORS = tuple(f"dev{i:03d}" for i in range(200))
+REVIEW_STATES = ('APPROVED', 'APPROVED', 'COMMENTED', 'CHANGES_REQUESTED')
+CHECK_NAMES = ('build', 'test', 'lint', 'security-scan', 'docs', 'e2e')
+
+
+def _iso(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class SyntheticRepo:
+    """
+    Deterministic synthetic repository of `pr_count` closed PRs, generated on demand.
+
+    Nothing is held in memory: PR i (0 = most recently updated, like GitHub's sort=updated
+    direction=desc) and its reviews and check runs are derived from (seed, PR number), so the
+    same objects come back on every call and a 1M-PR repository costs no more memory than a
+    100-PR one. The objects carry a realistic amount of fields the pipeline doesn't read.
+    """
+
+    def __init__(self, pr_count, seed=0, merged_ratio=0.8, max_reviews=4, max_check_runs=6,
+                 update_interval_minutes=7):
+        self.pr_count = pr_count
+        self.seed = seed
+        self.merged_ratio = merged_ratio
+        self.max_reviews = max_reviews
+        self.max_check_runs = max_check_runs
+        self.update_interval = timedelta(minutes=update_interval_minutes)
+        self.newest_update = EPOCH + self.update_interval * pr_count
+
+    def _rng(self, number, kind):
+        return random.Random(f"{self.seed}:{kind}:{number}")
+
+    def number_at(self, index):
+        return self.pr_count - index
+
+    def pr(self, index):
+        number = self.number_at(index)
+        rng = self._rng(number, 'pr')
+        updated_at = self.newest_update - self.update_interval * index
+        merged = rng.random() < self.merged_ratio
+        author = rng.choice(AUTHORS)
+        return {
+            'url': f"https://api.github.com/repos/synthetic/repo/pulls/{number}",
+            'id': 1_000_000 + number,
+            'number': number,
+            'state': 'closed',
+            'title': f"Synthetic change #{number}",
+            'user': {'login': author, 'id': AUTHORS.index(author), 'type': 'User', 'site_admin': False},
+            'body': 'x' * rng.randint(0, 400),
+            'labels': [],
+            'created_at': _iso(updated_at - timedelta(hours=rng.randint(1, 72))),
+            'updated_at': _iso(updated_at),
+            'closed_at': _iso(updated_at),
+            'merged_at': _iso(updated_at) if merged else None,
+            'merge_commit_sha': f"{number:040x}",
+            'head': {'ref': f"feature-{number}", 'sha': f"{number + 1:040x}"},
+            'base': {'ref': 'main', 'sha': f"{number + 2:040x}"},
+            'draft': False,
+        }
+
+    def prs(self, start, stop):
+        return [self.pr(index) for index in range(max(start, 0), min(stop, self.pr_count))]
+
+    def reviews(self, number):
+        rng = self._rng(number, 'reviews')
+        submitted_at = EPOCH + self.update_interval * (number - 1)
+        return [
+            {
+                'id': number * 100 + i,
+                'user': {'login': rng.choice(AUTHORS), 'type': 'User'},
+                'body': '',
+                'state': rng.choice(REVIEW_STATES),
+                'submitted_at': _iso(submitted_at + timedelta(minutes=i)),
+                'commit_id': f"{number + 1:040x}",
+            }
+            for i in range(rng.randint(0, self.max_reviews))
+        ]
+
+    def check_runs(self, sha):
+        number = int(sha, 16)
+        rng = self._rng(number, 'checks')
+        completed_at = EPOCH + self.update_interval * (number - 1)
+        return [
+            {
+                'id': number * 100 + i,
+                'name': name,
+                'head_sha': sha,
+                'status': 'completed',
+                'conclusion': 'success' if rng.random() < 0.9 else 'failure',
+                'started_at': _iso(completed_at - timedelta(minutes=5)),
+                'completed_at': _iso(completed_at),
+                'output': {'title': None, 'summary': None, 'annotations_count': 0},
+                'app': {'slug': 'github-actions', 'name': 'GitHub Actions'},
+            }
+            for i, name in enumerate(CHECK_NAMES[:rng.randint(1, self.max_check_runs)])
+        ]
+
+    def check_suites(self, sha):
+        # one suite of the app with the aggregate conclusion of its runs, like GitHub
+        runs = self.check_runs(sha)
+        return [{
+            'id': int(sha, 16),
+            'head_sha': sha,
+            'status': 'completed',
+            'conclusion': 'success' if all(run['conclusion'] == 'success' for run in runs) else 'failure',
+            'latest_check_runs_count': len(runs),
+            'app': {'slug': 'github-actions', 'name': 'GitHub Actions'},
+        }]
+
+    def merged_count(self):
+        # same first draw as pr()
+        return sum(1 for index in range(self.pr_count)
+                   if self._rng(self.number_at(index), 'pr').random() < self.merged_ratio)
+
+    def iter_records(self):
+        """
+        Yields the (pr, approved reviews, check runs) records of the merged PRs, like
+        extract.iter_pr_details (without projection), to build raw snapshots without the API.
+        """
+        for index in range(self.pr_count):
+            pr = self.pr(index)
+            if not pr['merged_at']:
+                continue
+            reviews = [review for review in self.reviews(pr['number']) if review['state'] == 'APPROVED']
+            yield pr, reviews, self.check_runs(pr['merge_commit_sha'])
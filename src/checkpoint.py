@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PRS_RECORD = 'prs'
+REVIEWS_RECORD = 'reviews'
+CHECKS_RECORD = 'checks'
+
+
+class ExtractJournal:
+    """
+    Append-only checkpoint journal of an extraction run (one JSON record per line).
+
+    The merged-PR list and each PR's reviews and check runs are appended as they arrive, so an
+    interrupted run can be resumed without repeating the requests that already succeeded.
+    On resume, the state of the previous run is loaded as `prs` (None if the PR list wasn't recorded
+    yet), `reviews` and `checks` ({pr number: items}); the records of the current run are only
+    appended to the file, not kept in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.prs = None
+        self.reviews = {}
+        self.checks = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self, resume=False):
+        """
+        Opens the journal for appending. With resume, loads the records of the previous run first,
+        otherwise starts a new journal.
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if resume and os.path.exists(self.path):
+            self._load()
+            mode = 'a'
+        else:
+            if resume:
+                logger.info(f"No checkpoint journal found at {self.path}, starting from scratch.")
+            mode = 'w'
+
+        self._file = open(self.path, mode, encoding='utf-8')
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the previous run died mid-write, everything before this line is intact
+                    logger.warning(f"Ignoring truncated journal record at line {line_number} of {self.path}")
+                    break
+
+                if record['kind'] == PRS_RECORD:
+                    self.prs = record['items']
+                elif record['kind'] == REVIEWS_RECORD:
+                    self.reviews[record['pr']] = record['items']
+                elif record['kind'] == CHECKS_RECORD:
+                    self.checks[record['pr']] = record['items']
+
+        logger.info(f"Resuming from checkpoint: {len(self.prs or [])} PRs, {len(self.reviews)} with reviews, "
+                    f"{len(self.checks)} with check runs")
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush() # survive a crash or Ctrl-C of the process
+
+    def record_prs(self, prs):
+        self.prs = prs
+        self._append({'kind': PRS_RECORD, 'items': prs})
+
+    def record_reviews(self, pr_number, reviews):
+        self._append({'kind': REVIEWS_RECORD, 'pr': pr_number, 'items': reviews})
+
+    def record_checks(self, pr_number, checks):
+        self._append({'kind': CHECKS_RECORD, 'pr': pr_number, 'items': checks})
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """
+        Closes and deletes the journal, once its data made it into the raw snapshot.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Constants
+ENTRY_SUFFIX = '.json'
+EVICTION_TARGET_RATIO = 0.9 # evict a little more than needed, so eviction doesn't run on every put
+
+
+def make_key(*parts) -> str:
+    """
+    Builds a stable cache key from JSON-serializable parts (e.g. URL and params).
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key/value store with one JSON file per entry.
+
+    - Size bounded: once the entries exceed `max_bytes`, the least recently used ones
+      (oldest modification time, refreshed on every hit) are evicted.
+    - TTL: entries stored more than `ttl_seconds` ago are dropped on access (None = no TTL).
+
+    Safe to share between threads of one process.
+    """
+
+    def __init__(self, dir_path, max_bytes=512 * 1024 * 1024, ttl_seconds=None):
+        self.dir_path = dir_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        os.makedirs(dir_path, exist_ok=True)
+        self._sizes = {
+            entry.name: entry.stat().st_size
+            for entry in os.scandir(dir_path) if entry.name.endswith(ENTRY_SUFFIX)
+        }
+        self._total_bytes = sum(self._sizes.values())
+
+        logger.debug(f"DiskCache initialized at {dir_path} with {len(self._sizes)} entries ({self._total_bytes} bytes)")
+
+    def _path(self, name):
+        return os.path.join(self.dir_path, name)
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None if it is missing or expired.
+        """
+        name = key + ENTRY_SUFFIX
+        path = self._path(name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning(f"Dropping unreadable cache entry {path}")
+            self.delete(key)
+            return None
+
+        if self.ttl_seconds is not None and time.time() - entry['stored_at'] > self.ttl_seconds:
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(path) # mark as recently used
+        except OSError:
+            pass
+        return entry['value']
+
+    def put(self, key, value):
+        name = key + ENTRY_SUFFIX
+        path = self._path(name)
+        data = json.dumps({'stored_at': time.time(), 'value': value}, ensure_ascii=False).encode('utf-8')
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path) # atomic, readers never see partial entries
+
+        with self._lock:
+            self._total_bytes += len(data) - self._sizes.get(name, 0)
+            self._sizes[name] = len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        name = key + ENTRY_SUFFIX
+        with self._lock:
+            self._remove(name)
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._sizes):
+                self._remove(name)
+        logger.info(f"Cleared cache at {self.dir_path}")
+
+    def _remove(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+        self._total_bytes -= self._sizes.pop(name, 0)
+
+    def _evict(self):
+        # caller holds the lock
+        def mtime(name):
+            try:
+                return os.path.getmtime(self._path(name))
+            except OSError:
+                return 0
+
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        evicted = 0
+        for name in sorted(self._sizes, key=mtime):
+            if self._total_bytes <= target:
+                break
+            self._remove(name)
+            evicted += 1
+
+        logger.debug(f"Evicted {evicted} cache entries from {self.dir_path}")
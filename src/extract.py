@@ -1,17 +1,40 @@
 import json
 import os
 import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+from typing import Optional
 
 from dotenv import load_dotenv
 from tqdm import tqdm
-from GitHubClient import GitHubClient
+from checkpoint import ExtractJournal
+from disk_cache import DiskCache
+from filters import compile_filters, filter_signature
+from GitHubClient import GitHubClient, parse_timestamp
+from GitHubGraphQLClient import GitHubGraphQLClient, unsupported_fields
+import metrics
+import projection
+from rate_limit import RateLimitScheduler
+from result_cache import ResultCache
+from raw_records import RAW_NDJSON_FILENAME_TEMPLATE, RawRecordWriter, iter_raw_records
+from sqlite_store import SQLiteStore
+from transport import HttpTransport
 
 logger = logging.getLogger(__name__)
 
 # Constants
 RAW_FILENAME_TEMPLATE = "{org}_{repo}_merged_prs.json"
+STATE_FILENAME_TEMPLATE = "{org}_{repo}_extract_state.json"
+JOURNAL_FILENAME_TEMPLATE = "{org}_{repo}_journal.ndjson"
 GITHUB_TOKEN_ENV_VER_NAME = 'GITHUB_TOKEN'
+GITHUB_TOKENS_ENV_VER_NAME = 'GITHUB_TOKENS' # optional comma-separated pool of tokens
+BACKENDS = ('rest', 'graphql')
+CHECK_STRATEGIES = ('runs', 'suites')
+STORE_BATCH_SIZE = 100 # PRs upserted per SQLite transaction
+RAW_FORMATS = ('json', 'ndjson', 'sqlite')
 
 
 @dataclass(frozen=True)
@@ -24,6 +47,29 @@ class ExtractConfig:
     repository: str
     organization: str
     raw_dir_path: str
+    raw_format: str = 'json'
+    sqlite_path: Optional[str] = None # database of the sqlite raw format
+    tokens: tuple = ()
+    rate_limit_reserve: int = 50
+    backend: str = 'rest'
+    graphql_url: Optional[str] = None
+    max_workers: int = 1
+    check_strategy: str = 'runs'
+    max_retries: int = 5
+    page_sizes: Optional[dict] = None
+    backoff_factor: float = 0.5
+    request_timeout: float = 30.0
+    cache_dir_path: Optional[str] = None # None = HTTP cache disabled
+    cache_max_bytes: int = 512 * 1024 * 1024
+    cache_ttl_seconds: Optional[float] = None
+    results_cache_dir_path: Optional[str] = None # None = result cache disabled
+    results_cache_max_bytes: int = 256 * 1024 * 1024
+    results_cache_ttl_seconds: Optional[float] = None
+    results_cache_min_age_days: float = 3.0
+    search_pushdown: bool = False
+    project_fields: bool = False
+    incremental: bool = False
+    incremental_lookback_hours: float = 24.0
 
 # Functions (main extraction function is run_extract (last one defined))
 def fetch_config(config) -> ExtractConfig:
@@ -39,22 +85,89 @@ def fetch_config(config) -> ExtractConfig:
     for key in ('api_base_url', 'repository', 'organization'):
         if key not in github_cfg:
             raise ValueError(f"Missing GitHub config key: '{key}'")
+    backend = github_cfg.get('backend', 'rest')
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid 'github.backend': '{backend}' (expected one of {', '.join(BACKENDS)})")
 
     data_cfg = config.get('data')
     if not data_cfg or 'raw_dir_path' not in data_cfg:
         raise ValueError("Missing 'data.raw_dir_path' in configuration.")
+    raw_format = data_cfg.get('raw_format', 'json')
+    if raw_format not in RAW_FORMATS:
+        raise ValueError(f"Invalid 'data.raw_format': '{raw_format}' (expected one of {', '.join(RAW_FORMATS)})")
+    if raw_format == 'sqlite' and 'sqlite_path' not in data_cfg:
+        raise ValueError("Missing 'data.sqlite_path' in configuration.")
+
+    extract_cfg = config.get('extract') or {}
+    max_workers = extract_cfg.get('max_workers', 1)
+    if not isinstance(max_workers, int) or max_workers < 1:
+        raise ValueError("'extract.max_workers' must be a positive integer.")
+    check_strategy = extract_cfg.get('check_strategy', 'runs')
+    if check_strategy not in CHECK_STRATEGIES:
+        raise ValueError(f"Invalid 'extract.check_strategy': '{check_strategy}' "
+                         f"(expected one of {', '.join(CHECK_STRATEGIES)})")
+    lookback_hours = extract_cfg.get('incremental_lookback_hours', 24)
+    if not isinstance(lookback_hours, (int, float)) or lookback_hours < 0:
+        raise ValueError("'extract.incremental_lookback_hours' must be a non-negative number.")
+
+    http_cfg = config.get('http') or {}
+    max_retries = http_cfg.get('max_retries', 5)
+    if not isinstance(max_retries, int) or max_retries < 0:
+        raise ValueError("'http.max_retries' must be a non-negative integer.")
+
+    cache_cfg = config.get('cache') or {}
+    if cache_cfg.get('enabled') and 'dir_path' not in cache_cfg:
+        raise ValueError("Missing 'cache.dir_path' in configuration.")
+    ttl_hours = cache_cfg.get('ttl_hours')
+    if cache_cfg.get('results_enabled') and 'results_dir_path' not in cache_cfg:
+        raise ValueError("Missing 'cache.results_dir_path' in configuration.")
+    results_ttl_days = cache_cfg.get('results_ttl_days')
+    results_min_age_days = cache_cfg.get('results_min_age_days', 3)
+    if not isinstance(results_min_age_days, (int, float)) or results_min_age_days < 0:
+        raise ValueError("'cache.results_min_age_days' must be a non-negative number.")
+
+    rate_limit_cfg = config.get('rate_limit') or {}
+    reserve = rate_limit_cfg.get('reserve', 50)
+    if not isinstance(reserve, int) or reserve < 0:
+        raise ValueError("'rate_limit.reserve' must be a non-negative integer.")
 
     load_dotenv()
-    if not os.getenv(GITHUB_TOKEN_ENV_VER_NAME):
+    tokens = tuple(t.strip() for t in os.getenv(GITHUB_TOKENS_ENV_VER_NAME, '').split(',') if t.strip())
+    if not tokens and os.getenv(GITHUB_TOKEN_ENV_VER_NAME):
+        tokens = (os.getenv(GITHUB_TOKEN_ENV_VER_NAME),)
+    if not tokens:
         raise ValueError(f"Missing {GITHUB_TOKEN_ENV_VER_NAME} environment variable. Please set it before running the script.")
 
 
     return ExtractConfig(
-        token= os.getenv(GITHUB_TOKEN_ENV_VER_NAME),
+        token=tokens[0],
         api_base_url=github_cfg['api_base_url'],
         repository=github_cfg['repository'],
         organization=github_cfg['organization'],
         raw_dir_path=data_cfg['raw_dir_path'],
+        raw_format=raw_format,
+        sqlite_path=data_cfg.get('sqlite_path'),
+        tokens=tokens,
+        rate_limit_reserve=reserve,
+        backend=backend,
+        graphql_url=github_cfg.get('graphql_url'),
+        max_workers=max_workers,
+        check_strategy=check_strategy,
+        max_retries=max_retries,
+        page_sizes=http_cfg.get('page_sizes'),
+        backoff_factor=float(http_cfg.get('backoff_factor', 0.5)),
+        request_timeout=float(http_cfg.get('timeout', 30.0)),
+        cache_dir_path=cache_cfg['dir_path'] if cache_cfg.get('enabled') else None,
+        cache_max_bytes=int(cache_cfg.get('max_size_mb', 512) * 1024 * 1024),
+        cache_ttl_seconds=ttl_hours * 3600 if ttl_hours is not None else None,
+        results_cache_dir_path=cache_cfg['results_dir_path'] if cache_cfg.get('results_enabled') else None,
+        results_cache_max_bytes=int(cache_cfg.get('results_max_size_mb', 256) * 1024 * 1024),
+        results_cache_ttl_seconds=results_ttl_days * 86400 if results_ttl_days is not None else None,
+        results_cache_min_age_days=float(results_min_age_days),
+        search_pushdown=bool(extract_cfg.get('search_pushdown', False)),
+        project_fields=bool(extract_cfg.get('project_fields', False)),
+        incremental=bool(extract_cfg.get('incremental', False)),
+        incremental_lookback_hours=float(lookback_hours),
     )
 
 def fetch_data(fetch_func, description: str, *args, **kwargs):
@@ -79,14 +192,178 @@ def save_raw_data(raw_payload, cfg):
         IOError: if file write fails.
     """
     os.makedirs(cfg.raw_dir_path, exist_ok=True)
-    filename = RAW_FILENAME_TEMPLATE.format(org=cfg.organization, repo=cfg.repository)
-    path = os.path.join(cfg.raw_dir_path, filename)
+    path = raw_data_path(cfg)
 
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(raw_payload, f, ensure_ascii=False, indent=4)
     logger.info(f"Saved raw data to {path}")
 
-def fetch_check_runs(client, merged_prs, config, check_filters):
+def raw_data_path(cfg):
+    if cfg.raw_format == 'sqlite':
+        return cfg.sqlite_path
+    template = RAW_NDJSON_FILENAME_TEMPLATE if cfg.raw_format == 'ndjson' else RAW_FILENAME_TEMPLATE
+    filename = template.format(org=cfg.organization, repo=cfg.repository)
+    return os.path.join(cfg.raw_dir_path, filename)
+
+def state_path(cfg):
+    filename = STATE_FILENAME_TEMPLATE.format(org=cfg.organization, repo=cfg.repository)
+    return os.path.join(cfg.raw_dir_path, filename)
+
+def journal_path(cfg):
+    filename = JOURNAL_FILENAME_TEMPLATE.format(org=cfg.organization, repo=cfg.repository)
+    return os.path.join(cfg.raw_dir_path, filename)
+
+def load_previous_snapshot(cfg, filters=None):
+    """
+    Loads the raw snapshot and watermark of the previous run, for incremental extraction.
+    The snapshot is only usable with the filters it was extracted with (filters, see
+    filters.filter_signature): PRs that only match wider filters were never fetched.
+
+    Returns:
+        (raw_payload, watermark datetime), or None if there is no usable previous run.
+        With the ndjson and sqlite raw formats raw_payload is None, the previous records are read from
+        the file or database when merging.
+    """
+    try:
+        with open(state_path(cfg), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if cfg.raw_format in ('ndjson', 'sqlite'):
+            if not os.path.exists(raw_data_path(cfg)):
+                raise FileNotFoundError(raw_data_path(cfg))
+            raw_payload = None
+        else:
+            with open(raw_data_path(cfg), 'r', encoding='utf-8') as f:
+                raw_payload = json.load(f)
+        watermark = parse_timestamp(state['watermark'])
+    except FileNotFoundError:
+        logger.info("No previous snapshot found, running a full extraction.")
+        return None
+    except (ValueError, KeyError):
+        logger.warning("Previous snapshot or extract state is unreadable, running a full extraction.")
+        return None
+
+    if state.get('filters') != filters:
+        logger.info("The filters changed since the previous run, running a full extraction.")
+        return None
+
+    logger.info(f"Loaded previous snapshot {raw_data_path(cfg)} (watermark {state['watermark']})")
+    return raw_payload, watermark
+
+def merge_raw_payloads(previous, delta, pr_filters, review_filters, check_filters):
+    """
+    Merges newly fetched PRs (delta) into the previous raw snapshot.
+
+    PRs in the delta replace their previous version. The current filters are re-applied to
+    the previous data, so sliding windows like --merged-since drop PRs that fell out of them.
+    Newest updates come first, like in a full extraction.
+    """
+    keep_pr = compile_filters(pr_filters)
+    keep_reviews = compile_filters(review_filters).select
+    keep_checks = compile_filters(check_filters).select
+
+    delta_numbers = {str(pr['number']) for pr in delta['merged_prs']}
+    old_prs = [pr for pr in previous.get('merged_prs', [])
+               if str(pr['number']) not in delta_numbers and keep_pr(pr)]
+    merged_prs = sorted(delta['merged_prs'] + old_prs, key=lambda pr: pr['updated_at'], reverse=True)
+
+    # JSON object keys are strings, normalize the freshly fetched int keys the same way
+    reviews = {}
+    check_statuses = {}
+    for pr in merged_prs:
+        num = str(pr['number'])
+        if num in delta_numbers:
+            reviews[num] = delta['reviews'][pr['number']]
+            check_statuses[num] = delta['check_statuses'][pr['number']]
+        else:
+            reviews[num] = keep_reviews(previous['reviews'].get(num, []))
+            check_statuses[num] = keep_checks(previous['check_statuses'].get(num, []))
+
+    logger.info(f"Merged {len(delta['merged_prs'])} new or updated PRs into snapshot of {len(merged_prs)} PRs")
+    return {
+        'merged_prs': merged_prs,
+        'reviews': reviews,
+        'check_statuses': check_statuses,
+    }
+
+def newest_update(prs, watermark=None):
+    """
+    Returns the newest `updated_at` of the PRs (and the given watermark), or None.
+    """
+    for pr in prs:
+        if watermark is None or parse_timestamp(pr['updated_at']) > parse_timestamp(watermark):
+            watermark = pr['updated_at']
+    return watermark
+
+def save_extract_state(watermark, cfg, filters=None):
+    """
+    Records the newest `updated_at` of the snapshot as the watermark of the next incremental run,
+    with the filters it was extracted with (see filters.filter_signature).
+    """
+    if watermark is None:
+        return
+
+    with open(state_path(cfg), 'w', encoding='utf-8') as f:
+        json.dump({'watermark': watermark, 'filters': filters}, f, indent=4)
+    logger.info(f"Saved extract state (watermark {watermark})")
+
+def fetch_pr_reviews(client, pr, config, review_filters, result_cache=None, refresh=False):
+    """
+    Fetches the approved reviews of a PR, from the result cache if the PR was merged long enough ago.
+    With refresh, they are refetched and the cache entry replaced (e.g. a webhook reported a new review).
+    """
+    num = pr['number']
+    if result_cache is None or not result_cache.is_settled(pr):
+        return fetch_data(client.fetch_approved_reviews, f"reviews for PR {num}",
+                          config.organization, config.repository, num, filters=review_filters) or []
+
+    reviews = None if refresh else result_cache.get_reviews(config.organization, config.repository, num)
+    if reviews is None:
+        reviews = fetch_data(client.fetch_approved_reviews, f"reviews for PR {num}",
+                             config.organization, config.repository, num) or []
+        result_cache.put_reviews(config.organization, config.repository, num, reviews)
+    return compile_filters(review_filters).select(reviews)
+
+def fetch_pr_check_suites(client, pr, config, result_cache=None, refresh=False):
+    """
+    Fetches the completed check suites of a PR's merge commit (see GitHubClient.fetch_check_suites),
+    from the result cache if the PR was merged long enough ago (see fetch_pr_reviews for refresh).
+    """
+    num = pr['number']
+    sha = pr['merge_commit_sha']
+    if result_cache is None or not sha or not result_cache.is_settled(pr):
+        return fetch_data(client.fetch_check_suites, f"check suites for PR {num}",
+                          config.organization, config.repository, sha) or []
+
+    suites = None if refresh else result_cache.get_check_suites(config.organization, config.repository, sha)
+    if suites is None:
+        suites = fetch_data(client.fetch_check_suites, f"check suites for PR {num}",
+                            config.organization, config.repository, sha) or []
+        result_cache.put_check_suites(config.organization, config.repository, sha, suites)
+    return suites
+
+def fetch_pr_checks(client, pr, config, check_filters, result_cache=None, refresh=False):
+    """
+    Fetches the completed check runs of a PR's merge commit, from the result cache if the PR was
+    merged long enough ago (see fetch_pr_reviews for refresh). With the suites check strategy and
+    no check filters (they need the individual runs), the aggregate check suites stand in for the runs.
+    """
+    if config.check_strategy == 'suites' and not check_filters:
+        return fetch_pr_check_suites(client, pr, config, result_cache, refresh)
+
+    num = pr['number']
+    sha = pr['merge_commit_sha']
+    if result_cache is None or not sha or not result_cache.is_settled(pr):
+        return fetch_data(client.fetch_pr_check_runs, f"check runs for PR {num}",
+                          config.organization, config.repository, sha, filters=check_filters) or []
+
+    checks = None if refresh else result_cache.get_check_runs(config.organization, config.repository, sha)
+    if checks is None:
+        checks = fetch_data(client.fetch_pr_check_runs, f"check runs for PR {num}",
+                            config.organization, config.repository, sha) or []
+        result_cache.put_check_runs(config.organization, config.repository, sha, checks)
+    return compile_filters(check_filters).select(checks)
+
+def fetch_check_runs(client, merged_prs, config, check_filters, journal=None, result_cache=None):
 
     logger.info('Fetching check runs for merged PRs...')
     if len(check_filters) > 0:
@@ -95,10 +372,13 @@ def fetch_check_runs(client, merged_prs, config, check_filters):
     checks_list = []
     for pr in tqdm(merged_prs, desc="Fetching check runs", unit="PR"):
         num = pr['number']
-        checks = (
-            fetch_data(client.fetch_pr_check_runs, f"check runs for PR {num}",
-                       config.organization, config.repository, pr['merge_commit_sha'], filters=check_filters)
-            or [])
+        if journal and num in journal.checks: # already fetched before the run was interrupted
+            checks_list.append((num, journal.checks[num]))
+            continue
+
+        checks = fetch_pr_checks(client, pr, config, check_filters, result_cache)
+        if journal:
+            journal.record_checks(num, checks)
         checks_list.append((num, checks))
 
     check_statuses = {num: checks for num, checks in checks_list}
@@ -106,7 +386,7 @@ def fetch_check_runs(client, merged_prs, config, check_filters):
 
     return check_statuses
 
-def fetch_reviews(client, merged_prs, config, review_filters):
+def fetch_reviews(client, merged_prs, config, review_filters, journal=None, result_cache=None):
 
     logger.info('Fetching reviews for merged PRs...')
     if len(review_filters) > 0:
@@ -115,9 +395,13 @@ def fetch_reviews(client, merged_prs, config, review_filters):
     reviews_list = []
     for pr in tqdm(merged_prs, desc="Fetching PR reviews", unit="PR"):
         num = pr['number']
-        revs = (fetch_data(client.fetch_approved_reviews, f"reviews for PR {num}",
-                           config.organization, config.repository, num, filters=review_filters)
-                or [])
+        if journal and num in journal.reviews: # already fetched before the run was interrupted
+            reviews_list.append((num, journal.reviews[num]))
+            continue
+
+        revs = fetch_pr_reviews(client, pr, config, review_filters, result_cache)
+        if journal:
+            journal.record_reviews(num, revs)
         reviews_list.append((num, revs))
 
     reviews = {num: revs for num, revs in reviews_list}
@@ -125,22 +409,326 @@ def fetch_reviews(client, merged_prs, config, review_filters):
 
     return reviews
 
+def iter_pr_details(client, merged_prs, config, review_filters, check_filters, journal=None, result_cache=None):
+    """
+    Fetches reviews and check runs for all merged PRs concurrently.
+
+    Both phases are submitted to one thread pool of `config.max_workers` workers,
+    so review and check-run requests of different PRs overlap. Only a window of
+    `config.max_workers` PRs (2 calls each) is in flight at a time, and each PR's results
+    are dropped once yielded, so memory doesn't grow with the number of PRs.
+    Results already in the journal (on resume) are reused, new ones are recorded in it.
+    Results of PRs merged long enough ago come from the result cache, if given.
+
+    Yields:
+        (pr, reviews, checks) in the order of merged_prs, as soon as the PR and all PRs before it are complete
+    """
+    logger.info(f"Fetching reviews and check runs for merged PRs using {config.max_workers} workers...")
+    if len(review_filters) > 0 or len(check_filters) > 0:
+        logger.info(f"Applying review and check filters")
+
+    resumed_reviews = journal.reviews if journal else {}
+    resumed_checks = journal.checks if journal else {}
+    with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+        in_flight = deque() # (pr, reviews future or resumed reviews, checks future or resumed checks)
+
+        def submit(pr):
+            num = pr['number']
+            reviews = resumed_reviews.pop(num, None)
+            if reviews is None:
+                reviews = executor.submit(fetch_pr_reviews, client, pr, config, review_filters, result_cache)
+            checks = resumed_checks.pop(num, None)
+            if checks is None:
+                checks = executor.submit(fetch_pr_checks, client, pr, config, check_filters, result_cache)
+            in_flight.append((pr, reviews, checks))
+
+        try:
+            with tqdm(total=len(merged_prs), desc="Fetching reviews and check runs", unit="PR") as progress:
+                pending_prs = iter(merged_prs)
+                for pr in islice(pending_prs, config.max_workers):
+                    submit(pr)
+
+                while in_flight:
+                    pr, reviews, checks = in_flight.popleft()
+                    next_pr = next(pending_prs, None)
+                    if next_pr is not None:
+                        submit(next_pr)
+
+                    if isinstance(reviews, Future):
+                        reviews = reviews.result() or []
+                        if journal:
+                            journal.record_reviews(pr['number'], reviews)
+                    if isinstance(checks, Future):
+                        checks = checks.result() or []
+                        if journal:
+                            journal.record_checks(pr['number'], checks)
+                    progress.update(1)
+
+                    yield pr, reviews, checks
+        finally:
+            # a call failed or the consumer stopped early, don't wait for the remaining calls
+            for _, reviews, checks in in_flight:
+                for future in (reviews, checks):
+                    if isinstance(future, Future):
+                        future.cancel()
+
+def fetch_reviews_and_checks(client, merged_prs, config, review_filters, check_filters, journal=None,
+                             result_cache=None):
+    """
+    Fetches reviews and check runs for all merged PRs concurrently (see iter_pr_details).
+
+    Returns:
+        reviews: mapping of PR number to list of approved review dicts
+        check_statuses: mapping of PR number to list of check-run dicts
+    """
+    reviews = {}
+    check_statuses = {}
+    for pr, revs, checks in iter_pr_details(client, merged_prs, config, review_filters, check_filters, journal,
+                                            result_cache):
+        reviews[pr['number']] = revs
+        check_statuses[pr['number']] = checks
+
+    logger.info(f"Fetched {sum(len(revs) for revs in reviews.values())} approved reviews and "
+                f"{sum(len(checks) for checks in check_statuses.values())} check runs for {len(merged_prs)} PRs.")
+
+    return reviews, check_statuses
+
+def save_raw_records(records, cfg, merge_previous=False, pr_filters=(), review_filters=(), check_filters=()):
+    """
+    Streams (pr, reviews, checks) records into the line-delimited raw file as they arrive.
+    With merge_previous (incremental mode), the records of the previous file that weren't refetched
+    are appended after them, with the current filters re-applied.
+
+    Returns:
+        The newest `updated_at` of the written PRs (the next watermark).
+    """
+    keep_pr = compile_filters(pr_filters)
+    keep_reviews = compile_filters(review_filters).select
+    keep_checks = compile_filters(check_filters).select
+
+    path = raw_data_path(cfg)
+    writer = RawRecordWriter(path)
+    try:
+        written = set()
+        watermark = None
+        for pr, reviews, checks in records:
+            writer.write(pr, reviews, checks)
+            written.add(pr['number'])
+            watermark = newest_update([pr], watermark)
+
+        if merge_previous:
+            delta_count = writer.count
+            for pr, reviews, checks in iter_raw_records(path):
+                if pr['number'] in written or not keep_pr(pr):
+                    continue
+                writer.write(pr, keep_reviews(reviews), keep_checks(checks))
+                watermark = newest_update([pr], watermark)
+            logger.info(f"Merged {delta_count} new or updated PRs into snapshot of {writer.count} PRs")
+
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    return watermark
+
+def save_raw_payload(records, cfg, merge_previous=False, pr_filters=(), review_filters=(), check_filters=()):
+    """
+    Collects (pr, reviews, checks) records into the raw JSON payload and saves it
+    (the JSON raw format can't be appended to, see save_raw_records for streaming).
+    With merge_previous (incremental mode), they are merged into the previous snapshot (see merge_raw_payloads).
+
+    Returns:
+        The newest `updated_at` of the saved PRs (the next watermark).
+    """
+    raw_payload = {'merged_prs': [], 'reviews': {}, 'check_statuses': {}}
+    for pr, reviews, checks in records:
+        raw_payload['merged_prs'].append(pr)
+        raw_payload['reviews'][pr['number']] = reviews
+        raw_payload['check_statuses'][pr['number']] = checks
+
+    if merge_previous:
+        with open(raw_data_path(cfg), 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        raw_payload = merge_raw_payloads(previous, raw_payload, pr_filters, review_filters, check_filters)
+
+    save_raw_data(raw_payload, cfg)
+    return newest_update(raw_payload['merged_prs'])
+
+def save_store_records(records, cfg, merge_previous=False, pr_filters=(), review_filters=(), check_filters=()):
+    """
+    Upserts (pr, reviews, checks) records into the SQLite store as they arrive, in batches of
+    STORE_BATCH_SIZE PRs: each batch is fetched into memory first and then written in a short
+    transaction, so the write lock is never held across network calls and the runs of other
+    repositories can write to the store in between.
+    Once all records are written, a full run deletes the repository's PRs that weren't refetched.
+    With merge_previous (incremental mode), they are kept, with the current filters re-applied.
+
+    Returns:
+        The newest `updated_at` of the repository's stored PRs (the next watermark).
+    """
+    keep_pr = compile_filters(pr_filters)
+    keep_reviews = compile_filters(review_filters).select
+    keep_checks = compile_filters(check_filters).select
+
+    repo = f"{cfg.organization}/{cfg.repository}"
+    records = iter(records)
+    store = SQLiteStore(cfg.sqlite_path)
+    try:
+        written = set()
+        while True:
+            batch = list(islice(records, STORE_BATCH_SIZE)) # fetched outside of the transaction
+            if not batch:
+                break
+            with store.transaction():
+                for pr, reviews, checks in batch:
+                    store.upsert_pr(repo, pr, reviews, checks)
+                    written.add(pr['number'])
+
+        if merge_previous:
+            # only the PRs that weren't refetched are read back
+            deleted = []
+            refiltered = []
+            for pr, reviews, checks in store.iter_records(repo, exclude=written):
+                if not keep_pr(pr):
+                    deleted.append(pr)
+                    continue
+
+                kept_reviews = keep_reviews(reviews)
+                kept_checks = keep_checks(checks)
+                if len(kept_reviews) != len(reviews) or len(kept_checks) != len(checks):
+                    refiltered.append((pr, kept_reviews, kept_checks))
+
+            with store.transaction():
+                for pr in deleted:
+                    store.delete_pr(repo, pr)
+                for pr, kept_reviews, kept_checks in refiltered:
+                    store.upsert_pr(repo, pr, kept_reviews, kept_checks)
+            logger.info(f"Merged {len(written)} new or updated PRs into the stored PRs of {repo}")
+        else:
+            with store.transaction():
+                deleted = store.delete_prs_except(repo, written)
+            logger.debug(f"Deleted {deleted} PRs of {repo} that weren't refetched")
+
+        watermark = store.latest_update(repo)
+        logger.info(f"Saved {len(written)} PRs to {cfg.sqlite_path}")
+    finally:
+        store.close()
+
+    return watermark
+
+
+def projected_fields(cfg, pr_filters, review_filters, check_filters):
+    """
+    Returns the fields to keep of each object kind (see projection.py), or None without projection.
+    """
+    if not cfg.project_fields:
+        return None
+
+    # keep only what the transform and the active filters read
+    return {
+        'pr': projection.fields_for(projection.PR_FIELDS, pr_filters),
+        'review': projection.fields_for(projection.REVIEW_FIELDS, review_filters),
+        'check': projection.fields_for(projection.CHECK_FIELDS, check_filters),
+    }
+
+def check_backend_fields(cfg, pr_filters, review_filters, check_filters):
+    """
+    Checks that the configured backend provides every field the filters read.
+
+    Raises:
+        ValueError: if a filter reads a field the GraphQL backend doesn't map (it would match nothing).
+    """
+    if cfg.backend != 'graphql':
+        return
+    for kind, filters in (('pr', pr_filters), ('review', review_filters), ('check', check_filters)):
+        missing = unsupported_fields(kind, projection.fields_for((), filters))
+        if missing:
+            raise ValueError(f"The graphql backend doesn't provide the {kind} fields {', '.join(missing)} "
+                             f"the filters read, use 'github.backend: rest'.")
+
+def build_client(cfg, pr_filters, review_filters, check_filters, concurrent_repos=1):
+    """
+    Builds the GitHub client of the configured backend, with its transport, HTTP cache and
+    rate-limit scheduler. One client can be shared by the runs of several repositories
+    (concurrent_repos sizes its connection pool).
+
+    Raises:
+        ValueError: if the filters read fields the backend doesn't provide (see check_backend_fields).
+    """
+    check_backend_fields(cfg, pr_filters, review_filters, check_filters)
+    # each run's per-PR workers plus the client's page executor, which paginates concurrently with them
+    pool_size = cfg.max_workers * (concurrent_repos + 1)
+    transport = HttpTransport(pool_size=pool_size, max_retries=cfg.max_retries,
+                              backoff_factor=cfg.backoff_factor, timeout=cfg.request_timeout)
+    cache = None
+    if cfg.cache_dir_path:
+        cache = DiskCache(cfg.cache_dir_path, max_bytes=cfg.cache_max_bytes, ttl_seconds=cfg.cache_ttl_seconds)
+    scheduler = RateLimitScheduler(cfg.tokens, reserve=cfg.rate_limit_reserve)
+    if len(cfg.tokens) > 1:
+        logger.info(f"Spreading requests over {len(cfg.tokens)} tokens")
+
+    fields = projected_fields(cfg, pr_filters, review_filters, check_filters)
+    if cfg.backend == 'graphql':
+        return GitHubGraphQLClient(cfg.token, cfg.api_base_url, graphql_url=cfg.graphql_url,
+                                   transport=transport, cache=cache, max_workers=cfg.max_workers,
+                                   scheduler=scheduler, page_sizes=cfg.page_sizes, fields=fields)
+    return GitHubClient(cfg.token, cfg.api_base_url, transport=transport, cache=cache,
+                        max_workers=cfg.max_workers, scheduler=scheduler, page_sizes=cfg.page_sizes,
+                        fields=fields)
+
+def build_result_cache(cfg, pr_filters, review_filters, check_filters, invalidate=False):
+    """
+    Builds the cache of check runs and reviews of PRs merged long enough ago (not refetched),
+    or returns None if it is disabled. With invalidate, its entries are dropped first.
+    """
+    if not cfg.results_cache_dir_path:
+        return None
+
+    result_cache = ResultCache(DiskCache(cfg.results_cache_dir_path, max_bytes=cfg.results_cache_max_bytes,
+                                         ttl_seconds=cfg.results_cache_ttl_seconds),
+                               min_age_days=cfg.results_cache_min_age_days,
+                               fields=projected_fields(cfg, pr_filters, review_filters, check_filters))
+    if invalidate:
+        result_cache.clear()
+    return result_cache
+
 
 # Main extraction function
-def run_extract(config, pr_filters, review_filters, check_filters) -> bool:
+@metrics.REGISTRY.timed('extract')
+def run_extract(config, pr_filters, review_filters, check_filters, resume=False, invalidate_cache=False,
+                client=None, result_cache=None, record_sink=None) -> bool:
     """
     extraction pipeline:
       1. Validates configuration
       2. Fetches merged PRs
+         (in incremental mode only the PRs updated since the last run's watermark)
       3. Fetches reviews
       4. Fetches check runs
+         (steps 3 and 4 run together on a thread pool when extract.max_workers > 1)
       5. Compiles and saves raw JSON
+         (in incremental mode merged into the previous snapshot)
+
+    Results of steps 2-4 are checkpointed in a journal as they arrive; it is deleted once
+    step 5 succeeded.
+    With the ndjson and sqlite raw formats, steps 3-5 are streamed: each PR is written to the raw
+    file (or upserted into the SQLite store) with its reviews and check runs as soon as they arrived.
 
     Args:
         config: dict loaded from settings.yaml
         pr_filters:   list of callables to filter PR dicts
         review_filters: list of callables to filter review dicts
         check_filters:  list of callables to filter check-run dicts
+        resume: continue an interrupted run from its journal instead of starting over
+                (use the same filters as the interrupted run)
+        invalidate_cache: drop the cached check runs and reviews of merged PRs and refetch them
+        client: shared GitHub client (see build_client), built from the configuration if None
+        result_cache: result cache to use with a shared client (see build_result_cache)
+        record_sink: optional generator function record_sink(records, incremental) wrapped around the
+                     (pr, reviews, checks) records before they are saved, to process them as they arrive
+                     (see pipeline.py); forces the streaming steps 3-5. In incremental runs (incremental
+                     True) the records are only the refetched PRs, merged into the previous snapshot
+                     when saved; otherwise they are the whole snapshot (resumed runs included)
 
     Returns:
         True if successful, False otherwise.
@@ -148,51 +736,125 @@ def run_extract(config, pr_filters, review_filters, check_filters) -> bool:
     # 1. Validate configuration
     try:
         cfg = fetch_config(config)
-        logger.name = f"{__name__}_{cfg.organization}_{cfg.repository}"
-        logger.info(f"Configuration validated for {cfg.organization}/{cfg.repository}")
+        log = logger.getChild(f"{cfg.organization}_{cfg.repository}") # per repository, runs can be concurrent
+        log.info(f"Configuration validated for {cfg.organization}/{cfg.repository}")
     except Exception:
         logger.exception("Failed to validate configuration.")
         return False
 
-    # Initialize GitHub client
-    logger.info("Initializing GitHub client...")
-    client = GitHubClient(cfg.token, cfg.api_base_url)
-
     # Default to no filters
     pr_filters = pr_filters or []
     review_filters = review_filters or []
     check_filters = check_filters or []
 
-    # 2. Fetch merged PRs
-    try:
-        logger.info('Fetching merged PRs...')
-        if len(pr_filters) > 0:
-            logger.info(f"Applying PR filters")
-
-        merged_prs = fetch_data(client.fetch_merged_prs,"merged PRs",
-                                cfg.organization,cfg.repository, filters=pr_filters) or []
-        if not merged_prs:
-            logger.warning("No merged PRs found. Stopping extraction.")
-            return False
-
-        logger.info(f"Fetched {len(merged_prs)} merged PRs.")
-    except Exception:
-        # fetch_data logs the exception
-        return False
+    if cfg.check_strategy == 'suites' and check_filters:
+        log.info("Check filters need the individual check runs, fetching check runs instead of check suites.")
 
-    # 3. Fetch reviews
+    # Initialize GitHub client (unless a shared one was given)
+    if client is None:
+        log.info(f"Initializing GitHub client ({cfg.backend} backend)...")
+        try:
+            client = build_client(cfg, pr_filters, review_filters, check_filters)
+        except ValueError:
+            log.exception("Failed to initialize the GitHub client.")
+            return False
+        result_cache = build_result_cache(cfg, pr_filters, review_filters, check_filters,
+                                          invalidate=invalidate_cache)
+
+    # Incremental mode: only fetch what changed since the previous run
+    signature = filter_signature(pr_filters, review_filters, check_filters)
+    previous = load_previous_snapshot(cfg, signature) if cfg.incremental else None
+    updated_since = None
+    if previous is not None:
+        # look back a bit, check runs that complete after the merge don't bump the PR's updated_at
+        updated_since = previous[1] - timedelta(hours=cfg.incremental_lookback_hours)
+
+    # Checkpoint journal of this run (or of the interrupted run being resumed)
+    journal = ExtractJournal(journal_path(cfg))
     try:
-        reviews = fetch_reviews(client, merged_prs, cfg, review_filters)
+        journal.open(resume=resume)
     except Exception:
-        # fetch_data that inside fetch_reviews logs the exception
+        log.exception("Failed to open the checkpoint journal.")
         return False
 
-    # 4. Fetch check runs
     try:
-        check_statuses = fetch_check_runs(client, merged_prs, cfg, check_filters)
-    except Exception:
-        # fetch_data that inside fetch_check_runs logs the exception
-        return False
+        # 2. Fetch merged PRs
+        try:
+            if journal.prs is not None:
+                merged_prs = journal.prs
+                log.info(f"Using {len(merged_prs)} merged PRs from the checkpoint journal.")
+            else:
+                log.info('Fetching merged PRs...')
+                if len(pr_filters) > 0:
+                    log.info(f"Applying PR filters")
+
+                with metrics.REGISTRY.stage('extract.prs'):
+                    merged_prs = fetch_data(client.fetch_merged_prs,"merged PRs",
+                                            cfg.organization,cfg.repository, filters=pr_filters,
+                                            updated_since=updated_since, use_search=cfg.search_pushdown) or []
+                journal.record_prs(merged_prs)
+
+            if not merged_prs and previous is None:
+                log.warning("No merged PRs found. Stopping extraction.")
+                return False
+
+            log.info(f"Fetched {len(merged_prs)} merged PRs.")
+        except Exception:
+            # fetch_data logs the exception
+            return False
+
+        if cfg.raw_format in ('ndjson', 'sqlite') or record_sink is not None:
+            # 3-5. Fetch reviews and check runs, streaming every complete PR into the raw file or store
+            try:
+                records = iter_pr_details(client, merged_prs, cfg, review_filters, check_filters, journal, result_cache)
+                if record_sink is not None:
+                    records = record_sink(records, previous is not None)
+                if cfg.raw_format == 'sqlite':
+                    save_records = save_store_records
+                elif cfg.raw_format == 'ndjson':
+                    save_records = save_raw_records
+                else:
+                    save_records = save_raw_payload
+                with metrics.REGISTRY.stage('extract.details'): # fetched and saved together
+                    watermark = save_records(records, cfg, previous is not None,
+                                             pr_filters, review_filters, check_filters)
+                save_extract_state(watermark, cfg, signature)
+                journal.discard()
+            except Exception:
+                log.exception("Error fetching or saving raw records.")
+                return False
+
+            log.info(f"Extraction completed successfully for {cfg.organization}/{cfg.repository}")
+            return True
+
+        if cfg.max_workers > 1:
+            # 3+4. Fetch reviews and check runs concurrently
+            try:
+                with metrics.REGISTRY.stage('extract.details'):
+                    reviews, check_statuses = fetch_reviews_and_checks(client, merged_prs, cfg, review_filters,
+                                                                       check_filters, journal, result_cache)
+            except Exception:
+                # fetch_data that inside fetch_reviews_and_checks logs the exception
+                return False
+        else:
+            # 3. Fetch reviews
+            try:
+                with metrics.REGISTRY.stage('extract.reviews'):
+                    reviews = fetch_reviews(client, merged_prs, cfg, review_filters, journal, result_cache)
+            except Exception:
+                # fetch_data that inside fetch_reviews logs the exception
+                return False
+
+            # 4. Fetch check runs
+            try:
+                with metrics.REGISTRY.stage('extract.check_runs'):
+                    check_statuses = fetch_check_runs(client, merged_prs, cfg, check_filters, journal, result_cache)
+            except Exception:
+                # fetch_data that inside fetch_check_runs logs the exception
+                return False
+    finally:
+        journal.close()
+        client.clear_prefetched(cfg.organization, cfg.repository)
 
     # 5. Compile payload and save
     raw_payload = {
@@ -200,14 +862,20 @@ def run_extract(config, pr_filters, review_filters, check_filters) -> bool:
         'reviews': reviews,
         'check_statuses': check_statuses,
     }
+    if previous is not None:
+        raw_payload = merge_raw_payloads(previous[0], raw_payload, pr_filters, review_filters, check_filters)
+
     try:
-        save_raw_data(raw_payload, cfg)
+        with metrics.REGISTRY.stage('extract.save'):
+            save_raw_data(raw_payload, cfg)
+        save_extract_state(newest_update(raw_payload['merged_prs']), cfg, signature)
+        journal.discard()
 
     except Exception:
-        logger.exception("Error saving raw data.")
+        log.exception("Error saving raw data.")
         return False
 
-    logger.info(f"Extraction completed successfully for {cfg.organization}/{cfg.repository}")
+    log.info(f"Extraction completed successfully for {cfg.organization}/{cfg.repository}")
     return True
 
 
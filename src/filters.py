@@ -1,4 +1,28 @@
-from datetime import datetime, timedelta
+import operator
+import re
+from datetime import datetime, timedelta, timezone
+
+# Constants
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ' # GitHub's, sorts like the instants it denotes
+TIMESTAMP_LENGTH = 20
+LEGACY_FILTER_COST = 5 # plain callables, cost unknown
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+DURATION_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+KEYWORDS = {'true': True, 'false': False, 'null': None}
+TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<relative>now\b(?:\s*-\s*\d+(?:\.\d+)?[smhdw]\b)?)
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<op>==|!=|<=|>=|<|>|\(|\)|\[|\]|,)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_.]*)
+)""", re.VERBOSE)
 
 
 def add_filter_args(parser):
@@ -14,6 +38,10 @@ def add_filter_args(parser):
         "--only-authors", nargs='+',
         help="Only include PRs authored by these usernames"
     )
+    parser.add_argument(
+        "--pr-filter", action='append', metavar='EXPR',
+        help="Only include PRs matching the expression, e.g. \"user.login in ['alice', 'bob'] and merged_at >= now-30d\""
+    )
 
     # Review-level filters
     parser.add_argument(
@@ -24,43 +52,451 @@ def add_filter_args(parser):
         "--recent-reviews", type=int,
         help="Only include reviews in the last N days"
     )
+    parser.add_argument(
+        "--review-filter", action='append', metavar='EXPR',
+        help="Only include reviews matching the expression"
+    )
 
     # Check-run filters
     parser.add_argument(
         "--check-names", nargs='+',
         help="Only include check runs with these names"
     )
+    parser.add_argument(
+        "--check-filter", action='append', metavar='EXPR',
+        help="Only include check runs matching the expression, e.g. \"app.slug == 'github-actions'\""
+    )
+
+
+# --- Timestamps ------------------------------------------
+
+def utc_timestamp(value):
+    """
+    Returns a timestamp as a UTC 'YYYY-MM-DDTHH:MM:SSZ' string, which compares like the instant.
+    GitHub's own timestamps already have that form and are returned as they are, without parsing;
+    other ISO-8601 values are converted (naive ones read as UTC), anything else but a string is None.
+    """
+    if not isinstance(value, str):
+        return None
+    if len(value) == TIMESTAMP_LENGTH and value[-1] == 'Z':
+        return value
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def utc_cutoff(days=0, **delta):
+    """
+    Returns now (UTC) minus the given timedelta, as an aware datetime.
+    """
+    return datetime.now(timezone.utc) - timedelta(days=days, **delta)
+
+
+# --- Predicates ------------------------------------------
+
+def field_getter(field):
+    """
+    Returns a function reading a dotted path (e.g. 'user.login') of a dict, None where it is missing.
+    """
+    keys = field.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda item: item.get(key)
+
+    def get(item):
+        for key in keys:
+            if not isinstance(item, dict):
+                return None
+            item = item.get(key)
+        return item
+    return get
+
+
+class Predicate:
+    """
+    One condition on a PR, review or check-run dict.
+
+    - test(item) -> bool evaluates it on one item
+    - cost: relative evaluation cost, cheaper predicates are evaluated first
+    - fields: the dotted paths it reads (kept by the field projection)
+    - search_qualifiers / updated_since: what the GitHub client can push down (see GitHubClient)
+    - options: the CLI options it was built from (see the builders), None otherwise
+    """
+
+    def __init__(self, test, fields=(), cost=1, search_qualifiers=(), updated_since=None,
+                 description=None):
+        self.test = test
+        self.fields = tuple(fields)
+        self.cost = cost
+        self.search_qualifiers = list(search_qualifiers)
+        self.updated_since = updated_since
+        self.description = description or getattr(test, '__name__', 'filter')
+        self.options = None
+
+    def __call__(self, item):
+        return self.test(item)
+
+    def __repr__(self):
+        return f"Predicate({self.description})"
+
+
+def _comparison(field, op, value):
+    """
+    Predicate `field op value`. Fields named *_at and relative times (now-7d) compare as
+    timestamps, canonical GitHub timestamps without being parsed.
+    """
+    get = field_getter(field)
+    compare = COMPARISONS[op]
+    description = f"{field} {op} {value!r}"
+
+    if value is None:
+        if op not in ('==', '!='):
+            raise ValueError(f"Only == and != compare with null: {description}")
+        is_null = op == '=='
+        return Predicate(lambda item: (get(item) is None) == is_null, [field], description=description)
+
+    updated_since = None
+    if isinstance(value, datetime) or field.rsplit('.', 1)[-1].endswith('_at'):
+        if isinstance(value, datetime):
+            cutoff = value.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        elif isinstance(value, str):
+            cutoff = utc_timestamp(value)
+        else:
+            raise ValueError(f"Timestamps compare with ISO-8601 strings or now-N[smhdw]: {description}")
+        if field == 'merged_at' and op in ('>=', '>'):
+            # merged_at can't be later than updated_at, see merge_date_filter
+            updated_since = datetime.strptime(cutoff, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+
+        def test(item):
+            stamp = utc_timestamp(get(item))
+            return stamp is not None and compare(stamp, cutoff)
+
+        return Predicate(test, [field], cost=2, updated_since=updated_since,
+                         description=f"{field} {op} '{cutoff}'")
+
+    def test(item):
+        actual = get(item)
+        if actual is None:
+            return False
+        try:
+            return compare(actual, value)
+        except TypeError: # e.g. a number against a string, no match
+            return False
+
+    return Predicate(test, [field], description=description)
+
+
+def _membership(field, values, negate=False):
+    get = field_getter(field)
+    allowed = frozenset(values)
+    description = f"{field} {'not in' if negate else 'in'} {sorted(allowed, key=str)!r}"
+    if negate:
+        return Predicate(lambda item: get(item) not in allowed, [field], description=description)
+    return Predicate(lambda item: get(item) in allowed, [field], description=description)
+
+
+def _all_of(predicates):
+    """
+    Conjunction, cheapest first. Keeps the pushdown attributes of its members.
+    """
+    predicates = sorted(predicates, key=lambda p: p.cost)
+    if len(predicates) == 1:
+        return predicates[0]
+    tests = [p.test for p in predicates]
+    if len(tests) == 2:
+        first, second = tests
+        test = lambda item: first(item) and second(item)
+    else:
+        test = lambda item: all(t(item) for t in tests)
+
+    bounds = [p.updated_since for p in predicates if p.updated_since is not None]
+    return Predicate(test, [f for p in predicates for f in p.fields], cost=sum(p.cost for p in predicates),
+                     search_qualifiers=[q for p in predicates for q in p.search_qualifiers],
+                     updated_since=max(bounds) if bounds else None,
+                     description=' and '.join(f"({p.description})" for p in predicates))
+
+
+def _any_of(predicates):
+    """
+    Disjunction, cheapest first. Nothing can be pushed down.
+    """
+    predicates = sorted(predicates, key=lambda p: p.cost)
+    tests = [p.test for p in predicates]
+    return Predicate(lambda item: any(t(item) for t in tests), [f for p in predicates for f in p.fields],
+                     cost=sum(p.cost for p in predicates),
+                     description=' or '.join(f"({p.description})" for p in predicates))
+
+
+def _none_of(predicate):
+    test = predicate.test
+    return Predicate(lambda item: not test(item), predicate.fields, cost=predicate.cost,
+                     description=f"not ({predicate.description})")
+
+
+# --- Expressions -----------------------------------------
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Invalid filter expression at {position}: {expression[position:]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'string':
+            value = re.sub(r'\\(.)', r'\1', text[1:-1])
+        elif kind == 'number':
+            value = float(text) if '.' in text else int(text)
+        elif kind == 'relative':
+            amount = re.search(r'(\d+(?:\.\d+)?)([smhdw])', text)
+            value = utc_cutoff(**{DURATION_UNITS[amount.group(2)]: float(amount.group(1))}) if amount else utc_cutoff()
+        else:
+            value = text
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive descent parser of filter expressions:
+
+        expr       := and_expr ('or' and_expr)*
+        and_expr   := not_expr ('and' not_expr)*
+        not_expr   := 'not' not_expr | '(' expr ')' | comparison
+        comparison := FIELD ('==' | '!=' | '<' | '<=' | '>' | '>=') VALUE
+                    | FIELD ['not'] 'in' '[' VALUE (',' VALUE)* ']'
+                    | FIELD 'is' ['not'] 'null'
+        VALUE      := 'string' | "string" | number | true | false | null | now | now-N(s|m|h|d|w)
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def parse(self):
+        predicate = self._or()
+        if self.position != len(self.tokens):
+            self._error(f"unexpected {self.tokens[self.position][1]!r}")
+        return predicate
+
+    def _error(self, message):
+        raise ValueError(f"Invalid filter expression {self.expression!r}: {message}")
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            self._error("unexpected end")
+        self.position += 1
+        return token
+
+    def _accept(self, kind, value):
+        if self._peek() == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, kind, value):
+        if not self._accept(kind, value):
+            self._error(f"expected {value!r}")
+
+    def _or(self):
+        predicates = [self._and()]
+        while self._accept('word', 'or'):
+            predicates.append(self._and())
+        return predicates[0] if len(predicates) == 1 else _any_of(predicates)
+
+    def _and(self):
+        predicates = [self._not()]
+        while self._accept('word', 'and'):
+            predicates.append(self._not())
+        return predicates[0] if len(predicates) == 1 else _all_of(predicates)
+
+    def _not(self):
+        if self._accept('word', 'not'):
+            return _none_of(self._not())
+        if self._accept('op', '('):
+            predicate = self._or()
+            self._expect('op', ')')
+            return predicate
+        return self._comparison()
+
+    def _value(self):
+        kind, value = self._next()
+        if kind == 'word':
+            if value not in KEYWORDS:
+                self._error(f"expected a value, got {value!r} (quote strings)")
+            return KEYWORDS[value]
+        if kind == 'op':
+            self._error(f"expected a value, got {value!r}")
+        return value
+
+    def _comparison(self):
+        kind, field = self._next()
+        if kind != 'word' or field in KEYWORDS or field in ('and', 'or', 'not', 'in', 'is'):
+            self._error(f"expected a field, got {field!r}")
+
+        if self._accept('word', 'is'):
+            negate = self._accept('word', 'not')
+            self._expect('word', 'null')
+            return _comparison(field, '!=' if negate else '==', None)
+
+        negate = self._accept('word', 'not')
+        if negate or self._peek() == ('word', 'in'):
+            self._expect('word', 'in')
+            self._expect('op', '[')
+            values = [self._value()]
+            while self._accept('op', ','):
+                values.append(self._value())
+            self._expect('op', ']')
+            return _membership(field, values, negate=negate)
+
+        kind, op = self._next()
+        if kind != 'op' or op not in COMPARISONS:
+            self._error(f"expected a comparison after {field!r}")
+        return _comparison(field, op, self._value())
+
+
+def parse_expression(expression):
+    """
+    Compiles a filter expression (see _Parser) into a Predicate, e.g.
+    "user.login in ['alice', 'bob'] and merged_at >= now-30d" or "conclusion == 'success'".
+
+    Raises:
+        ValueError: if the expression is invalid.
+    """
+    return _Parser(expression).parse()
+
+
+# --- Compiled filters ------------------------------------
+
+class CompiledFilter(Predicate):
+    """
+    A filter list compiled into a single predicate: the conjunction of its members, cheapest first,
+    with their `fields`, `search_qualifiers` and `updated_since` combined, so it can stand in for
+    the list everywhere filters are accepted.
+
+    select(items) is a shorthand for the list of matching items: the predicate is still called
+    once per item, there is no columnar evaluation.
+    """
+
+    def __init__(self, filters):
+        predicates = []
+        for fn in filters:
+            if isinstance(fn, CompiledFilter):
+                predicates.extend(fn.predicates)
+            elif isinstance(fn, Predicate):
+                predicates.append(fn)
+            else:
+                predicates.append(Predicate(fn, getattr(fn, 'fields', ()), cost=getattr(fn, 'cost', LEGACY_FILTER_COST),
+                                            search_qualifiers=getattr(fn, 'search_qualifiers', ()),
+                                            updated_since=getattr(fn, 'updated_since', None)))
+        self.predicates = tuple(sorted(predicates, key=lambda p: p.cost))
+
+        if not self.predicates:
+            super().__init__(lambda item: True, description='all')
+            return
+        combined = _all_of(self.predicates)
+        super().__init__(combined.test, sorted(set(combined.fields)), cost=combined.cost,
+                         search_qualifiers=combined.search_qualifiers, updated_since=combined.updated_since,
+                         description=combined.description)
+
+    def select(self, items):
+        """
+        Returns the items that match, in order (one call per item).
+        """
+        test = self.test
+        return [item for item in items if test(item)]
+
+
+def compile_filters(filters):
+    """
+    Returns the filters (a list of predicates / callables, or an already compiled filter) as one
+    CompiledFilter.
+    """
+    if isinstance(filters, CompiledFilter):
+        return filters
+    if not filters:
+        return MATCH_ALL
+    if len(filters) == 1 and isinstance(filters[0], CompiledFilter):
+        return filters[0]
+    return CompiledFilter(filters)
+
+
+MATCH_ALL = CompiledFilter([])
 
 
 # --- Filter factories ------------------------------------
 
 def merge_date_filter(days: int):
-    cutoff = datetime.now() - timedelta(days=days)
-    return lambda pr: datetime.fromisoformat(pr['merged_at'].replace('Z', '')) >= cutoff
+    cutoff = utc_cutoff(days=days)
+    predicate = _comparison('merged_at', '>=', cutoff)
+
+    # pagination bound: merged_at can't be later than updated_at, so once PRs sorted by `updated` desc
+    # are older than the cutoff none of the remaining ones can match (set by _comparison)
+    # search API pushdown, day granularity (the exact cutoff is still applied client-side)
+    predicate.search_qualifiers = [f"merged:>={cutoff:%Y-%m-%d}"]
+    return predicate
 
 
 def author_whitelist_filter(authors):
-    whitelist = set(authors)
-    return lambda pr: pr['user']['login'] in whitelist
+    predicate = _membership('user.login', authors)
+
+    # search API pushdown, a single `author:` qualifier only (several ones don't OR together)
+    if len(set(authors)) == 1:
+        predicate.search_qualifiers = [f"author:{author}" for author in set(authors)]
+    return predicate
 
 
 def reviews_by_users_filter(reviewers):
-    reviewers_set = set(reviewers)
-    return lambda rev: rev['user']['login'] in reviewers_set
+    return _membership('user.login', reviewers)
 
 
 def recent_reviews_filter(days: int):
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    return lambda rev: datetime.fromisoformat(rev['submitted_at'].replace('Z', '')) >= cutoff
+    return _comparison('submitted_at', '>=', utc_cutoff(days=days))
 
 
 def check_name_filter(names):
-    names_set = set(names)
-    return lambda chk: chk['name'] in names_set
-
+    return _membership('name', names)
 
 
 # --- Builders --------------------------------------------
+# Each returns the options' filters compiled into one predicate (an empty list without any),
+# which records the normalized options in its `options` (see filter_signature).
+
+def _built(fns, args, names):
+    if not fns:
+        return []
+    compiled = CompiledFilter(fns)
+    compiled.options = {}
+    for name in names:
+        value = getattr(args, name, None)
+        if isinstance(value, (list, tuple)):
+            value = sorted(set(value)) or None # order and repetitions don't change the filters
+        if value is not None:
+            compiled.options[name] = value
+    return [compiled]
+
+
+def filter_signature(pr_filters, review_filters, check_filters):
+    """
+    Returns a JSON-serializable description of the filters, to tell whether two runs used the same
+    ones: the options of the built filters (e.g. --merged-since 30, not its moving cutoff), the
+    descriptions of other predicates.
+    """
+    return {
+        kind: [fn.options if getattr(fn, 'options', None) is not None
+               else getattr(fn, 'description', getattr(fn, '__name__', repr(fn))) for fn in fns or []]
+        for kind, fns in (('pr', pr_filters), ('review', review_filters), ('check', check_filters))
+    }
+
 
 def build_pr_filters(args):
     fns = []
@@ -68,7 +504,8 @@ def build_pr_filters(args):
         fns.append(merge_date_filter(args.merged_since))
     if args.only_authors:
         fns.append(author_whitelist_filter(args.only_authors))
-    return fns
+    fns.extend(parse_expression(expression) for expression in getattr(args, 'pr_filter', None) or [])
+    return _built(fns, args, ('merged_since', 'only_authors', 'pr_filter'))
 
 
 def build_review_filters(args):
@@ -77,13 +514,13 @@ def build_review_filters(args):
         fns.append(reviews_by_users_filter(args.reviewers))
     if args.recent_reviews is not None:
         fns.append(recent_reviews_filter(args.recent_reviews))
-    return fns
+    fns.extend(parse_expression(expression) for expression in getattr(args, 'review_filter', None) or [])
+    return _built(fns, args, ('reviewers', 'recent_reviews', 'review_filter'))
 
 
 def build_check_filters(args):
     fns = []
     if args.check_names:
         fns.append(check_name_filter(args.check_names))
-    return fns
-
-
+    fns.extend(parse_expression(expression) for expression in getattr(args, 'check_filter', None) or [])
+    return _built(fns, args, ('check_names', 'check_filter'))
@@ -1,12 +1,17 @@
 import argparse
 import logging
 import sys
+from contextlib import nullcontext
 import yaml
 
 from logger import setup_logging
 from extract import run_extract
 from transform import run_transformation
+from multi_repo import is_multi_repo, run_multi_repo
+from pipeline import is_pipelined, run_pipelined
 import filters
+import metrics
+import profiling
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +21,14 @@ def load_config(path : str):
     with open(path, 'r') as ymlfile:
         return yaml.safe_load(ymlfile)
 
+def run_name(config):
+    """Name of the run's metrics and profile files, like its report(s)."""
+    github_cfg = config.get('github') or {}
+    org = github_cfg.get('organization')
+    if is_multi_repo(config):
+        return f"{org or 'multi_repo'}_combined"
+    return f"{org}_{github_cfg.get('repository')}"
+
 def main():
     # Initialize logging
     setup_logging(name=__name__)
@@ -25,6 +38,18 @@ def main():
     parser.add_argument("--config", default="config/settings.yaml",
         help="Path to your settings.yaml"
     )
+    parser.add_argument("--resume", action="store_true",
+        help="Resume an interrupted extraction from its checkpoint journal (use the same filters)"
+    )
+    parser.add_argument("--invalidate-cache", action="store_true",
+        help="Drop the cached check runs and reviews of merged PRs and refetch them"
+    )
+    parser.add_argument("--transform-only", action="store_true",
+        help="Skip the extraction, build the report from the existing raw snapshot (e.g. merged by shard.py)"
+    )
+    parser.add_argument("--profile", action="store_true",
+        help="Profile CPU (cProfile) and memory (tracemalloc) of each stage, see the profiling settings"
+    )
     # register all filter flags
     filters.add_filter_args(parser)
     args = parser.parse_args()
@@ -43,15 +68,62 @@ def main():
         logger.error(f"Configuration file not found: {args.config}")
         sys.exit(1)
 
+    # the metrics are saved also when the run fails
+    try:
+        run(args, config, pr_filters, review_filters, check_filters)
+    finally:
+        metrics.save_run_metrics(config, run_name(config))
+
+def run(args, config, pr_filters, review_filters, check_filters):
+    """Run the configured mode: multi-repository, pipelined, or extraction then transformation."""
+    stage = lambda name: nullcontext()
+    if args.profile:
+        try:
+            stage = profiling.StageProfiler(profiling.fetch_config(config), run_name(config)).stage
+        except ValueError as e:
+            logger.error(f"Invalid profiling configuration: {e}")
+            sys.exit(1)
+
+    # several repositories: extract and transform them concurrently, plus a combined report
+    if is_multi_repo(config):
+        with stage('multi_repo'):
+            succeeded = run_multi_repo(config, pr_filters, review_filters, check_filters, resume=args.resume,
+                                       invalidate_cache=args.invalidate_cache)
+        if not succeeded:
+            logger.error("No report created for any repository. Exiting.")
+            sys.exit(1)
+        logger.info("Multi-repository reports created successfully.")
+        return
+
+    # extract and transform in one pass, processing every PR as soon as it is complete
+    if is_pipelined(config) and not args.transform_only:
+        try:
+            with stage('pipeline'):
+                processed_prs = run_pipelined(config, pr_filters, review_filters, check_filters,
+                                              resume=args.resume, invalidate_cache=args.invalidate_cache)
+        except Exception as e:
+            logger.exception(f"Pipelined run failed: {e}")
+            sys.exit(1)
+        if processed_prs is None:
+            logger.error("Extraction failed or no PRs matched filters. Exiting.")
+            sys.exit(1)
+        logger.info(f"Report for {config['github']['organization']}/{config['github']['repository']} created successfully.")
+        return
+
     # run extraction (applies the filters internally)
-    succeeded = run_extract(config, pr_filters, review_filters, check_filters)
+    succeeded = args.transform_only
+    if not succeeded:
+        with stage('extract'):
+            succeeded = run_extract(config, pr_filters, review_filters, check_filters,
+                                    resume=args.resume, invalidate_cache=args.invalidate_cache)
     if not succeeded:
         logger.error("Extraction failed or no PRs matched filters. Exiting.")
         sys.exit(1)
 
     # then run your transformation step
     try:
-        run_transformation(config)
+        with stage('transform'):
+            run_transformation(config)
         org = config['github']['organization']
         repo = config['github']['repository']
         logger.info(f"Report for {org}/{repo} created successfully.")
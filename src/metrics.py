@@ -0,0 +1,326 @@
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Constants
+METRIC_PREFIX = 'scytale'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # seconds, upper bounds
+METRICS_FILENAME_TEMPLATE = "{name}_metrics.json"
+PROMETHEUS_FILENAME_TEMPLATE = "{name}_metrics.prom"
+# URL path parts replaced by placeholders, so every PR / commit lands in the same endpoint template
+PATH_TEMPLATES = (
+    (re.compile(r'/orgs/[^/]+'), '/orgs/{org}'),
+    (re.compile(r'/repos/[^/]+/[^/]+'), '/repos/{owner}/{repo}'),
+    (re.compile(r'/pulls/\d+'), '/pulls/{number}'),
+    (re.compile(r'/commits/[^/]+'), '/commits/{ref}'),
+)
+
+
+def endpoint_template(url):
+    """
+    Returns the endpoint template of a request URL,
+    e.g. '/repos/{owner}/{repo}/pulls/{number}/reviews' (query string dropped).
+    """
+    path = urlparse(url).path
+    for pattern, template in PATH_TEMPLATES:
+        path = pattern.sub(template, path, count=1)
+    return path
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    """
+    Configuration of the metrics export.
+    """
+    enabled: bool = False
+    dir_path: Optional[str] = None
+
+
+def fetch_config(config) -> MetricsConfig:
+    """
+    Parses and validates the metrics section of the configuration dictionary.
+
+    Raises:
+        ValueError: if the section is invalid.
+    """
+    metrics_cfg = config.get('metrics') or {}
+    enabled = bool(metrics_cfg.get('enabled', False))
+    if enabled and 'dir_path' not in metrics_cfg:
+        raise ValueError("Missing 'metrics.dir_path' in configuration.")
+    return MetricsConfig(enabled=enabled, dir_path=metrics_cfg.get('dir_path'))
+
+
+class _Histogram:
+    """
+    Cumulative-bucket histogram, like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """
+        Returns [(upper bound, observations <= bound)], ending with ('+Inf', count).
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsRegistry:
+    """
+    In-process metrics of a run:
+
+    - GitHub requests per method, endpoint template and status, with latency histograms
+      and response body bytes
+    - retries (transport retries of connection errors / 5xx, rate-limit retries)
+    - rate-limit headroom per resource (last and lowest X-RateLimit-Remaining) and the time
+      spent waiting for the rate-limit scheduler
+    - wall time of the pipeline stages
+
+    Recording is a dict update under a lock, cheap next to a network round trip.
+    Safe to share between threads.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._started_at = time.time()
+            self._requests = defaultdict(int) # (method, endpoint, status) -> count
+            self._latency = {} # (method, endpoint) -> _Histogram
+            self._bytes = defaultdict(int) # (method, endpoint) -> response body bytes
+            self._retries = defaultdict(int) # (endpoint, reason) -> count
+            self._rate_limit = {} # resource -> {'limit', 'remaining', 'min_remaining'}
+            self._rate_limit_wait = defaultdict(float) # resource -> seconds
+            self._stages = {} # stage -> [runs, seconds]
+
+    def observe_request(self, method, url, status, seconds, response_bytes=0):
+        """
+        Records one request (status is the HTTP status, or 'error' if no response was received).
+        """
+        endpoint = endpoint_template(url)
+        with self._lock:
+            self._requests[(method, endpoint, str(status))] += 1
+            histogram = self._latency.get((method, endpoint))
+            if histogram is None:
+                histogram = self._latency[(method, endpoint)] = _Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+            self._bytes[(method, endpoint)] += response_bytes
+
+    def record_retry(self, url, reason):
+        endpoint = endpoint_template(url)
+        with self._lock:
+            self._retries[(endpoint, reason)] += 1
+
+    def observe_rate_limit(self, resource, remaining, limit=None):
+        with self._lock:
+            state = self._rate_limit.setdefault(resource, {'limit': None, 'remaining': None, 'min_remaining': None})
+            state['remaining'] = remaining
+            if limit is not None:
+                state['limit'] = limit
+            if state['min_remaining'] is None or remaining < state['min_remaining']:
+                state['min_remaining'] = remaining
+
+    def observe_rate_limit_wait(self, resource, seconds):
+        with self._lock:
+            self._rate_limit_wait[resource] += seconds
+
+    def observe_stage(self, name, seconds):
+        with self._lock:
+            stage = self._stages.setdefault(name, [0, 0.0])
+            stage[0] += 1
+            stage[1] += seconds
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the block as a run of the stage (also when it raises).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """
+        Decorator timing every call of the function as a run of the stage.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """
+        Returns the metrics as a JSON-serializable dict.
+        """
+        with self._lock:
+            endpoints = {}
+            for (method, endpoint, status), count in sorted(self._requests.items()):
+                entry = endpoints.setdefault(f"{method} {endpoint}", {'requests': 0, 'statuses': {}})
+                entry['requests'] += count
+                entry['statuses'][status] = count
+            for (method, endpoint), histogram in self._latency.items():
+                entry = endpoints[f"{method} {endpoint}"]
+                entry['response_bytes'] = self._bytes[(method, endpoint)]
+                entry['latency_seconds'] = {
+                    'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count else None,
+                    'max': histogram.max,
+                    'buckets': {str(bound): count for bound, count in histogram.cumulative()},
+                }
+
+            return {
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self._started_at)),
+                'duration_seconds': time.time() - self._started_at,
+                'requests': sum(self._requests.values()),
+                'response_bytes': sum(self._bytes.values()),
+                'retries': sum(self._retries.values()),
+                'endpoints': endpoints,
+                'retries_by_reason': {f"{endpoint} {reason}": count
+                                      for (endpoint, reason), count in sorted(self._retries.items())},
+                'rate_limit': {resource: dict(state, wait_seconds=self._rate_limit_wait.get(resource, 0.0))
+                               for resource, state in sorted(self._rate_limit.items())},
+                'stages': {name: {'runs': runs, 'seconds': seconds}
+                           for name, (runs, seconds) in sorted(self._stages.items())},
+            }
+
+    def prometheus_text(self):
+        """
+        Returns the metrics in the Prometheus text exposition format (e.g. for the node_exporter
+        textfile collector or a Pushgateway).
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            if not samples:
+                return
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f"{full_name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{full_name}{suffix} {_format_value(value)}")
+
+        with self._lock:
+            metric('github_requests_total', 'counter', "GitHub API requests.",
+                   [('', {'method': method, 'endpoint': endpoint, 'status': status}, count)
+                    for (method, endpoint, status), count in sorted(self._requests.items())])
+
+            latency_samples = []
+            for (method, endpoint), histogram in sorted(self._latency.items()):
+                labels = {'method': method, 'endpoint': endpoint}
+                for bound, count in histogram.cumulative():
+                    latency_samples.append(('_bucket', dict(labels, le=str(bound)), count))
+                latency_samples.append(('_sum', labels, histogram.sum))
+                latency_samples.append(('_count', labels, histogram.count))
+            metric('github_request_duration_seconds', 'histogram', "GitHub API request latency.", latency_samples)
+
+            metric('github_response_bytes_total', 'counter', "GitHub API response body bytes.",
+                   [('', {'method': method, 'endpoint': endpoint}, count)
+                    for (method, endpoint), count in sorted(self._bytes.items())])
+            metric('github_retries_total', 'counter', "Retried GitHub API requests.",
+                   [('', {'endpoint': endpoint, 'reason': reason}, count)
+                    for (endpoint, reason), count in sorted(self._retries.items())])
+
+            rate_limits = sorted(self._rate_limit.items())
+            metric('github_rate_limit_remaining', 'gauge', "Last reported rate-limit requests remaining.",
+                   [('', {'resource': resource}, state['remaining']) for resource, state in rate_limits])
+            metric('github_rate_limit_min_remaining', 'gauge', "Lowest reported rate-limit requests remaining.",
+                   [('', {'resource': resource}, state['min_remaining']) for resource, state in rate_limits])
+            metric('github_rate_limit_limit', 'gauge', "Rate-limit requests per window.",
+                   [('', {'resource': resource}, state['limit'])
+                    for resource, state in rate_limits if state['limit'] is not None])
+            metric('github_rate_limit_wait_seconds_total', 'counter', "Time spent waiting for rate-limit headroom.",
+                   [('', {'resource': resource}, seconds) for resource, seconds in sorted(self._rate_limit_wait.items())])
+
+            stages = sorted(self._stages.items())
+            metric('stage_duration_seconds_total', 'counter', "Wall time of the pipeline stages.",
+                   [('', {'stage': name}, seconds) for name, (_, seconds) in stages])
+            metric('stage_runs_total', 'counter', "Runs of the pipeline stages.",
+                   [('', {'stage': name}, runs) for name, (runs, _) in stages])
+
+        return '\n'.join(lines) + '\n'
+
+    def save(self, cfg: MetricsConfig, name):
+        """
+        Writes the JSON summary and the Prometheus text file of the run.
+
+        Returns:
+            (JSON path, Prometheus path)
+        """
+        os.makedirs(cfg.dir_path, exist_ok=True)
+        json_path = os.path.join(cfg.dir_path, METRICS_FILENAME_TEMPLATE.format(name=name))
+        prometheus_path = os.path.join(cfg.dir_path, PROMETHEUS_FILENAME_TEMPLATE.format(name=name))
+
+        summary = self.summary()
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
+        with open(prometheus_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+
+        logger.info(f"Run metrics: {summary['requests']} requests ({summary['response_bytes'] / 1e6:.1f} MB, "
+                    f"{summary['retries']} retries) in {summary['duration_seconds']:.1f}s, saved to {json_path}")
+        return json_path, prometheus_path
+
+
+def save_run_metrics(config, name):
+    """
+    Saves the metrics of the process registry as the run `name` (metrics section of settings.yaml).
+    Failures are logged, not raised: they must not fail the run.
+    """
+    try:
+        metrics_cfg = fetch_config(config)
+        if not metrics_cfg.enabled:
+            return
+        REGISTRY.save(metrics_cfg, name)
+    except Exception:
+        logger.exception("Failed to save the run metrics.")
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+# Registry of the process, recorded into by the GitHub clients and the pipeline stages
+REGISTRY = MetricsRegistry()
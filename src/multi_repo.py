@@ -0,0 +1,140 @@
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import extract
+from pipeline import is_pipelined, run_pipelined
+from transform import run_transformation, save_combined_report
+
+logger = logging.getLogger(__name__)
+
+
+def is_multi_repo(config) -> bool:
+    """
+    True if the configuration selects several repositories (github.repositories or github.all_repositories).
+    """
+    github_cfg = config.get('github') or {}
+    return bool(github_cfg.get('repositories') or github_cfg.get('all_repositories'))
+
+
+def list_targets(config, client):
+    """
+    Resolves the configured repositories to (org, repo) pairs: the github.repositories entries
+    ('repo' of github.organization, or 'org/repo'), or every repository of the organization.
+
+    Raises:
+        ValueError: if the configuration is invalid or selects no repository.
+    """
+    github_cfg = config['github']
+    org = github_cfg.get('organization')
+
+    if github_cfg.get('all_repositories'):
+        if not org:
+            raise ValueError("'github.all_repositories' needs 'github.organization'.")
+        names = client.fetch_org_repos(org, include_archived=bool(github_cfg.get('include_archived', False)))
+    else:
+        names = github_cfg['repositories']
+
+    targets = []
+    for name in names:
+        target_org, _, repo = name.rpartition('/')
+        target_org = target_org or org
+        if not target_org or not repo:
+            raise ValueError(f"Invalid 'github.repositories' entry: '{name}' (expected 'repo' or 'org/repo')")
+        targets.append((target_org, repo))
+
+    if not targets:
+        raise ValueError("No repositories selected.")
+    return targets
+
+
+def target_config(config, org, repo):
+    """
+    Returns a copy of the configuration for a single repository.
+    """
+    target = copy.deepcopy(config)
+    target.setdefault('github', {}).update(organization=org, repository=repo)
+    for key in ('repositories', 'all_repositories'):
+        target['github'].pop(key, None)
+    return target
+
+
+def run_multi_repo(config, pr_filters, review_filters, check_filters, resume=False, invalidate_cache=False) -> bool:
+    """
+    Runs the extraction and transformation of several repositories concurrently
+    (multi_repo.max_parallel_repos at a time), all sharing one GitHub client: its connection pool,
+    caches and rate-limit budget. Writes the per-repository reports and one combined report.
+
+    Repositories without merged PRs are skipped, the failure of one doesn't stop the others.
+
+    Returns:
+        True if at least one report was created, False otherwise.
+    """
+    multi_cfg = config.get('multi_repo') or {}
+    max_parallel = multi_cfg.get('max_parallel_repos', 4)
+    if not isinstance(max_parallel, int) or max_parallel < 1:
+        logger.error("'multi_repo.max_parallel_repos' must be a positive integer.")
+        return False
+
+    pr_filters = pr_filters or []
+    review_filters = review_filters or []
+    check_filters = check_filters or []
+
+    try:
+        # the shared settings (API, tokens, caches) don't depend on the repository
+        github_cfg = config.get('github') or {}
+        cfg = extract.fetch_config(target_config(config, github_cfg.get('organization', ''), ''))
+        client = extract.build_client(cfg, pr_filters, review_filters, check_filters, concurrent_repos=max_parallel)
+        result_cache = extract.build_result_cache(cfg, pr_filters, review_filters, check_filters,
+                                                  invalidate=invalidate_cache)
+        targets = list_targets(config, client)
+    except Exception:
+        logger.exception("Failed to set up the multi-repository run.")
+        return False
+
+    logger.info(f"Running {len(targets)} repositories, {max_parallel} at a time")
+
+    def run_target(org, repo):
+        target = target_config(config, org, repo)
+        if is_pipelined(config):
+            processed = run_pipelined(target, pr_filters, review_filters, check_filters, resume=resume,
+                                      client=client, result_cache=result_cache)
+            if processed is not None:
+                return processed
+        elif extract.run_extract(target, pr_filters, review_filters, check_filters, resume=resume,
+                                 client=client, result_cache=result_cache):
+            return run_transformation(target)
+
+        logger.warning(f"Skipping {org}/{repo}: extraction failed or no PRs matched filters.")
+        return False
+
+    reports = {}
+    skipped = []
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = {executor.submit(run_target, org, repo): (org, repo) for org, repo in targets}
+        for future, (org, repo) in futures.items(): # in target order, for a stable combined report
+            try:
+                processed = future.result()
+            except Exception:
+                logger.exception(f"Transformation failed for {org}/{repo}")
+                skipped.append(f"{org}/{repo}")
+                continue
+
+            if processed is False:
+                skipped.append(f"{org}/{repo}")
+            elif processed is not None:
+                reports[f"{org}/{repo}"] = processed
+
+    if reports:
+        try:
+            # named after github.organization (or the first repository's owner)
+            first_org, first_repo = targets[0]
+            save_combined_report(reports, target_config(config, github_cfg.get('organization') or first_org,
+                                                        first_repo))
+        except Exception:
+            logger.exception("Failed to save the combined report.")
+            return False
+
+    logger.info(f"Created reports for {len(reports)} of {len(targets)} repositories"
+                + (f", failed or skipped: {', '.join(skipped)}" if skipped else ""))
+    return bool(reports)
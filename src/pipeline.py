@@ -0,0 +1,58 @@
+import logging
+
+import metrics
+from extract import run_extract
+from transform import ReportStream, fetch_config, run_transformation
+
+logger = logging.getLogger(__name__)
+
+
+def is_pipelined(config) -> bool:
+    return bool((config.get('transform') or {}).get('pipelined', False))
+
+
+@metrics.REGISTRY.timed('pipeline')
+def run_pipelined(config, pr_filters, review_filters, check_filters, **extract_kwargs):
+    """
+    Runs extraction and transformation as one pipeline: each PR is processed and its report row
+    written as soon as its reviews and check runs arrived, while the raw snapshot is saved on the
+    side. The report is the same as run_extract followed by run_transformation, which is what
+    incremental runs still do (their report also covers the PRs that weren't refetched).
+
+    Args:
+        extract_kwargs: passed to run_extract (resume, invalidate_cache, client, result_cache)
+
+    Returns:
+        The processed PR rows, or None if the extraction failed or found no merged PRs.
+
+    Raises:
+        Exception: if saving the outputs failed
+    """
+    cfg = fetch_config(config)
+    stream = ReportStream(cfg)
+    incremental = False
+
+    def process(records, incremental_run):
+        nonlocal incremental
+        incremental = incremental_run
+        # the refetched PRs of an incremental run aren't the whole report
+        return records if incremental_run else stream.process(records)
+
+    try:
+        succeeded = run_extract(config, pr_filters, review_filters, check_filters,
+                                record_sink=process, **extract_kwargs)
+    except BaseException:
+        stream.abort()
+        raise
+    if not succeeded:
+        stream.abort()
+        return None
+
+    if incremental:
+        # transform the merged snapshot
+        stream.abort()
+        return run_transformation(config)
+
+    processed_prs = stream.close()
+    logger.info(f"Pipelined transformation completed for {cfg.organization}/{cfg.repository}")
+    return processed_prs
@@ -0,0 +1,138 @@
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PSTATS_FILENAME_TEMPLATE = "{name}_{stage}.pstats"
+ALLOCATIONS_FILENAME_TEMPLATE = "{name}_{stage}_allocations.txt"
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    """
+    Configuration of the --profile mode.
+    """
+    dir_path: str = 'output/profile'
+    top_allocations: int = 25
+
+
+def fetch_config(config) -> ProfilingConfig:
+    """
+    Parses and validates the profiling section of the configuration dictionary.
+
+    Raises:
+        ValueError: if the section is invalid.
+    """
+    profiling_cfg = config.get('profiling') or {}
+    top_allocations = profiling_cfg.get('top_allocations', 25)
+    if not isinstance(top_allocations, int) or top_allocations < 1:
+        raise ValueError("'profiling.top_allocations' must be a positive integer.")
+    return ProfilingConfig(dir_path=profiling_cfg.get('dir_path', 'output/profile'), top_allocations=top_allocations)
+
+
+class StageProfiler:
+    """
+    Profiles pipeline stages: CPU with cProfile, in the calling thread and in every thread started
+    during the stage (the extraction's worker pools), and memory with tracemalloc.
+
+    Per stage it writes `{name}_{stage}.pstats` (all threads merged, e.g. `python -m pstats` or
+    snakeviz) and `{name}_{stage}_allocations.txt`, the source lines that allocated the most
+    memory still held at the end of the stage, with the traced current / peak memory.
+
+    Both tracers slow the run down considerably; without --profile no StageProfiler is created.
+    """
+
+    def __init__(self, cfg: ProfilingConfig, name):
+        self.cfg = cfg
+        self.name = name
+        self._thread_profiles = []
+        self._stage_ended = threading.Event()
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, frame, event, arg):
+        # first profile event of a new thread: hand the thread over to its own cProfile profiler
+        stage_ended = self._stage_ended
+
+        def timer():
+            # a profiler can only be uninstalled from its own thread: threads outliving the stage
+            # (e.g. the client's page executor) uninstall it at their first event after the stage
+            if stage_ended.is_set():
+                sys.setprofile(None)
+            return time.perf_counter()
+
+        profile = cProfile.Profile(timer)
+        with self._lock:
+            self._thread_profiles.append(profile)
+        profile.enable()
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Profiles the block as the stage (also when it raises).
+        """
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_snapshot = tracemalloc.take_snapshot()
+
+        self._thread_profiles = []
+        self._stage_ended = threading.Event()
+        threading.setprofile(self._profile_thread)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            threading.setprofile(None)
+            self._stage_ended.set()
+            with self._lock:
+                thread_profiles = list(self._thread_profiles)
+            for thread_profile in thread_profiles:
+                thread_profile.disable() # flushes its unfinished calls before the stats are merged
+            end_snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            try:
+                self._save(stage, profile, thread_profiles, start_snapshot, end_snapshot, current, peak)
+            except Exception:
+                logger.exception(f"Failed to save the profile of stage '{stage}'.")
+
+    def _save(self, stage, profile, thread_profiles, start_snapshot, end_snapshot, current, peak):
+        os.makedirs(self.cfg.dir_path, exist_ok=True)
+        pstats_path = os.path.join(self.cfg.dir_path, PSTATS_FILENAME_TEMPLATE.format(name=self.name, stage=stage))
+        stats = pstats.Stats(profile)
+        if thread_profiles:
+            stats.add(*thread_profiles)
+        stats.dump_stats(pstats_path)
+
+        # ignore the tracer's own allocations
+        trace_filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, cProfile.__file__)]
+        differences = end_snapshot.filter_traces(trace_filters).compare_to(
+            start_snapshot.filter_traces(trace_filters), 'lineno')
+        top = [diff for diff in differences if diff.size_diff > 0][:self.cfg.top_allocations]
+
+        allocations_path = os.path.join(self.cfg.dir_path,
+                                        ALLOCATIONS_FILENAME_TEMPLATE.format(name=self.name, stage=stage))
+        with open(allocations_path, 'w', encoding='utf-8') as f:
+            f.write(f"Stage '{stage}': traced memory at the end {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB\n")
+            f.write(f"Top {len(top)} lines by memory allocated during the stage and still held at its end:\n\n")
+            for diff in top:
+                frame = diff.traceback[0]
+                f.write(f"{diff.size_diff / 2**10:>12.1f} KiB {diff.count_diff:>+10} blocks  "
+                        f"{frame.filename}:{frame.lineno}\n")
+
+        logger.info(f"Profiled stage '{stage}' ({len(thread_profiles) + 1} threads, peak {peak / 2**20:.1f} MiB): "
+                    f"{pstats_path}, {allocations_path}")
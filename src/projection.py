@@ -0,0 +1,48 @@
+# Constants
+# Fields (dotted paths, e.g. 'user.login') kept at fetch time: what transform.process_pr and the
+# raw snapshot need. Filters add the fields they read through a `fields` attribute.
+PR_FIELDS = ('number', 'title', 'user.login', 'merged_at', 'updated_at', 'merge_commit_sha')
+REVIEW_FIELDS = ('id', 'state', 'user.login', 'submitted_at')
+CHECK_FIELDS = ('id', 'name', 'status', 'conclusion')
+
+
+def fields_for(base_fields, filters=None):
+    """
+    Returns the base fields plus the fields declared by the filters, sorted and without duplicates.
+    """
+    fields = set(base_fields)
+    for fn in filters or []:
+        fields.update(getattr(fn, 'fields', ()))
+    return tuple(sorted(fields))
+
+
+def compile_fields(fields):
+    """
+    Turns dotted paths into a nested spec, e.g. ('number', 'user.login') -> {'number': None, 'user': {'login': None}}.
+    """
+    spec = {}
+    for field in fields:
+        node = spec
+        *parents, leaf = field.split('.')
+        for key in parents:
+            child = node.get(key)
+            if child is None:
+                child = node[key] = {}
+            node = child
+        node.setdefault(leaf, None)
+    return spec
+
+
+def project(obj, spec):
+    """
+    Returns a copy of obj with only the fields of a compiled spec (missing fields are left out).
+    """
+    result = {}
+    for key, sub_spec in spec.items():
+        if key not in obj:
+            continue
+        value = obj[key]
+        if sub_spec is not None and isinstance(value, dict):
+            value = project(value, sub_spec)
+        result[key] = value
+    return result
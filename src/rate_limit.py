@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_RESOURCE = 'core'
+SECONDARY_LIMIT_DEFAULT_WAIT = 60 # seconds, GitHub asks to wait at least a minute without Retry-After
+RATE_LIMITED_STATUSES = (403, 429)
+RESERVE_LIMIT_FRACTION = 10 # the reserve is at most 1/10 of a bucket's limit (search: 30/min -> 3)
+
+
+def resource_for(url):
+    """
+    Returns the rate-limit bucket GitHub charges a request URL to.
+    """
+    if '/search/' in url:
+        return 'search'
+    if url.rstrip('/').endswith('/graphql'):
+        return 'graphql'
+    return DEFAULT_RESOURCE
+
+
+class _Bucket:
+    """
+    Rate-limit state of one token for one resource.
+    `remaining` is None until the first response reports it.
+    """
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+
+
+class RateLimitScheduler:
+    """
+    Central gate for all outgoing GitHub requests.
+
+    Each token has a token bucket per resource (core, search, graphql), driven by the
+    X-RateLimit-Remaining / X-RateLimit-Reset headers of its responses and decremented locally
+    for requests in flight. Requests are spread round-robin over the tokens that have headroom.
+    A bucket is paused once it drops to `reserve` remaining requests (before GitHub rejects it),
+    capped at a tenth of its X-RateLimit-Limit for small buckets like search (30 per minute), or after a secondary rate limit (Retry-After). When every token is paused, acquire() blocks
+    until the earliest reset.
+
+    Safe to share between threads and clients.
+    """
+
+    def __init__(self, tokens, reserve=50):
+        if not tokens:
+            raise ValueError("RateLimitScheduler needs at least one token.")
+
+        self.tokens = list(tokens)
+        self.reserve = reserve
+        self._buckets = {}
+        self._next = 0
+        self._cond = threading.Condition()
+
+        logger.debug(f"RateLimitScheduler initialized with {len(self.tokens)} token(s), reserve={reserve}")
+
+    def _bucket(self, token, resource):
+        return self._buckets.setdefault((token, resource), _Bucket())
+
+    def _reserve(self, bucket):
+        if bucket.limit is None:
+            return self.reserve
+        return min(self.reserve, bucket.limit // RESERVE_LIMIT_FRACTION)
+
+    def _available_at(self, bucket, now):
+        """
+        Returns when the bucket can be used again (`now` or earlier if it can be used right away).
+        """
+        if bucket.paused_until > now:
+            return bucket.paused_until
+        if bucket.remaining is not None and bucket.remaining <= self._reserve(bucket) and bucket.reset_at > now:
+            return bucket.reset_at
+        return now
+
+    def acquire(self, resource=DEFAULT_RESOURCE):
+        """
+        Returns the token to send the next request with, waiting while all tokens are paused.
+        """
+        with self._cond:
+            while True:
+                now = time.time()
+                ready_at = []
+                for i in range(len(self.tokens)):
+                    token = self.tokens[(self._next + i) % len(self.tokens)]
+                    bucket = self._bucket(token, resource)
+                    available_at = self._available_at(bucket, now)
+                    if available_at <= now:
+                        if bucket.remaining is not None:
+                            if bucket.reset_at <= now:
+                                bucket.remaining = None # the window was reset, the next response tells the new budget
+                            else:
+                                bucket.remaining -= 1
+                        self._next = (self._next + i + 1) % len(self.tokens)
+                        return token
+                    ready_at.append(available_at)
+
+                wait = min(ready_at) - now
+                logger.warning(f"Rate limit reached for all tokens ({resource}), pausing for {wait:.0f}s")
+                self._cond.wait(timeout=wait)
+
+    def observe(self, token, response, resource=DEFAULT_RESOURCE):
+        """
+        Updates the token's bucket from the response headers.
+
+        Returns:
+            True if the request was rejected by a (primary or secondary) rate limit and should be retried.
+        """
+        headers = response.headers
+        now = time.time()
+        with self._cond:
+            bucket = self._bucket(token, headers.get('X-RateLimit-Resource', resource))
+            if 'X-RateLimit-Limit' in headers:
+                bucket.limit = int(headers['X-RateLimit-Limit'])
+            if 'X-RateLimit-Remaining' in headers:
+                bucket.remaining = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Reset' in headers:
+                bucket.reset_at = float(headers['X-RateLimit-Reset'])
+
+            if response.status_code not in RATE_LIMITED_STATUSES:
+                return False
+
+            if headers.get('Retry-After'):
+                bucket.paused_until = now + float(headers['Retry-After'])
+            elif bucket.remaining == 0:
+                bucket.paused_until = max(bucket.reset_at, now + 1)
+            elif 'rate limit' in response.text.lower():
+                bucket.paused_until = now + SECONDARY_LIMIT_DEFAULT_WAIT
+            else:
+                return False # a plain 403 (permissions), nothing to wait for
+
+            logger.warning(f"Rate limited (HTTP {response.status_code}), token paused for "
+                           f"{bucket.paused_until - now:.0f}s")
+            self._cond.notify_all()
+            return True
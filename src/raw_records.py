@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Constants
+RAW_NDJSON_FILENAME_TEMPLATE = "{org}_{repo}_merged_prs.ndjson"
+PR_KEY = 'pr'
+REVIEWS_KEY = 'reviews'
+CHECKS_KEY = 'checks'
+DELETED_KEY = 'deleted'
+UPDATES_SUFFIX = '.updates' # records appended after the snapshot was written, see append_raw_records
+
+
+def updates_path(path):
+    return f"{path}{UPDATES_SUFFIX}"
+
+
+class RawRecordWriter:
+    """
+    Streams the line-delimited raw format: one JSON record per PR, holding the PR with its
+    reviews and check runs.
+
+    Records are appended to a temporary file as they are written, which replaces `path` on
+    commit(), so readers never see a half-written snapshot. The new snapshot also supersedes the
+    appended updates of the previous one, which are deleted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+
+    def write(self, pr, reviews, checks):
+        record = {PR_KEY: pr, REVIEWS_KEY: reviews, CHECKS_KEY: checks}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        if os.path.exists(updates_path(self.path)):
+            os.remove(updates_path(self.path))
+        logger.info(f"Saved {self.count} raw records to {self.path}")
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def append_raw_records(path, records, deleted=()):
+    """
+    Appends updated (pr, reviews, checks) records and deleted PR numbers to the updates file of a
+    line-delimited snapshot, instead of rewriting the snapshot. iter_raw_records applies them; the
+    next snapshot written with RawRecordWriter compacts them away.
+    """
+    lines = [json.dumps({PR_KEY: pr, REVIEWS_KEY: reviews, CHECKS_KEY: checks}, ensure_ascii=False)
+             for pr, reviews, checks in records]
+    lines += [json.dumps({DELETED_KEY: number}) for number in deleted]
+    with open(updates_path(path), 'a', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+    logger.info(f"Appended {len(lines)} updates to {updates_path(path)}")
+
+
+def _read_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _record(record):
+    return record[PR_KEY], record.get(REVIEWS_KEY, []), record.get(CHECKS_KEY, [])
+
+
+def iter_raw_records(path):
+    """
+    Reads the line-delimited raw format lazily, one PR at a time, with its appended updates applied
+    (updated PRs in place of their snapshot record, new ones last, deleted ones left out).
+
+    Yields:
+        (pr, reviews, checks) tuples
+    """
+    updates = {} # PR number -> record, or None if deleted; the latest update wins
+    if os.path.exists(updates_path(path)):
+        for record in _read_lines(updates_path(path)):
+            if DELETED_KEY in record:
+                updates[record[DELETED_KEY]] = None
+            else:
+                updates[record[PR_KEY]['number']] = record
+
+    for record in _read_lines(path):
+        number = record[PR_KEY]['number']
+        if number in updates:
+            record = updates.pop(number)
+            if record is None:
+                continue
+        yield _record(record)
+
+    for record in updates.values():
+        if record is not None:
+            yield _record(record)
@@ -0,0 +1,60 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from disk_cache import make_key
+from GitHubClient import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PROJECTIONS = {'check_suite': 'check'} # entry kind -> projection kind, check suites are shaped like check runs
+
+
+class ResultCache:
+    """
+    Persistent cache of the per-PR results that stop changing once a PR has been merged for a while:
+    the completed check runs (or check suites) of its merge commit (keyed by merge_commit_sha) and its
+    approved reviews.
+
+    Entries hold the unfiltered (projected) results, the current filters are applied on every read.
+    Only PRs merged more than `min_age_days` ago are cached, so late check runs and reviews of
+    recent PRs are still picked up. Size and age bounds come from the underlying DiskCache.
+    """
+
+    def __init__(self, cache, min_age_days=3.0, fields=None):
+        self.cache = cache
+        self.min_age = timedelta(days=min_age_days)
+        self.fields = fields or {} # part of the keys, a different projection must not hit old entries
+
+    def is_settled(self, pr):
+        """
+        True if the PR was merged long enough ago for its results to be cached.
+        """
+        merged_at = pr.get('merged_at')
+        if not merged_at:
+            return False
+        return datetime.now(timezone.utc) - parse_timestamp(merged_at) >= self.min_age
+
+    def _key(self, kind, *parts):
+        return make_key(kind, *parts, self.fields.get(PROJECTIONS.get(kind, kind)))
+
+    def get_check_runs(self, org, repo, commit_sha):
+        return self.cache.get(self._key('check', org, repo, commit_sha))
+
+    def put_check_runs(self, org, repo, commit_sha, runs):
+        self.cache.put(self._key('check', org, repo, commit_sha), runs)
+
+    def get_check_suites(self, org, repo, commit_sha):
+        return self.cache.get(self._key('check_suite', org, repo, commit_sha))
+
+    def put_check_suites(self, org, repo, commit_sha, suites):
+        self.cache.put(self._key('check_suite', org, repo, commit_sha), suites)
+
+    def get_reviews(self, org, repo, pr_number):
+        return self.cache.get(self._key('review', org, repo, pr_number))
+
+    def put_reviews(self, org, repo, pr_number, reviews):
+        self.cache.put(self._key('review', org, repo, pr_number), reviews)
+
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,621 @@
+import argparse
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import yaml
+from dotenv import load_dotenv
+
+import extract
+import filters
+import metrics
+import projection
+from filters import compile_filters
+from logger import setup_logging
+from multi_repo import is_multi_repo
+from raw_records import append_raw_records
+from sqlite_store import SQLiteStore
+import transform
+
+logger = logging.getLogger(__name__)
+
+# Constants
+WEBHOOK_SECRET_ENV_VAR_NAME = 'GITHUB_WEBHOOK_SECRET'
+SIGNATURE_HEADER = 'X-Hub-Signature-256'
+EVENT_HEADER = 'X-GitHub-Event'
+EVENTS = ('pull_request', 'pull_request_review', 'check_run') # 'ping' is answered, everything else ignored
+POLL_SECONDS = 1.0 # how often the worker checks for a stop request when idle
+
+
+@dataclass(frozen=True)
+class ServiceConfig:
+    """
+    Configuration of the service mode (python service.py).
+    """
+    host: str = '127.0.0.1'
+    port: int = 8080
+    webhook_path: str = '/webhook'
+    refresh_minutes: float = 60.0 # 0 = no scheduled refresh, webhooks only
+    debounce_seconds: float = 5.0
+    webhook_secret: Optional[str] = None # None = signatures not checked
+
+
+def fetch_config(config) -> ServiceConfig:
+    """
+    Parses and validates the service section of the configuration dictionary.
+
+    Raises:
+        ValueError: if the section is invalid.
+    """
+    service_cfg = config.get('service') or {}
+    port = service_cfg.get('port', 8080)
+    if not isinstance(port, int) or not 0 <= port <= 65535:
+        raise ValueError("'service.port' must be a port number.")
+    for key, default in (('refresh_minutes', 60), ('debounce_seconds', 5)):
+        value = service_cfg.get(key, default)
+        if not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"'service.{key}' must be a non-negative number.")
+    webhook_path = service_cfg.get('webhook_path', '/webhook')
+    if not webhook_path.startswith('/'):
+        raise ValueError("'service.webhook_path' must start with '/'.")
+
+    load_dotenv()
+    return ServiceConfig(
+        host=service_cfg.get('host', '127.0.0.1'),
+        port=port,
+        webhook_path=webhook_path,
+        refresh_minutes=float(service_cfg.get('refresh_minutes', 60)),
+        debounce_seconds=float(service_cfg.get('debounce_seconds', 5)),
+        webhook_secret=os.getenv(WEBHOOK_SECRET_ENV_VAR_NAME) or None,
+    )
+
+
+def verify_signature(secret, body, signature):
+    """
+    True if the X-Hub-Signature-256 header value matches the HMAC-SHA256 of the body.
+    """
+    if not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def load_deliveries(path):
+    """
+    Reads recorded webhook deliveries for replay: a JSON file holding one {"event": .., "payload": ..}
+    object or a list of them.
+
+    Returns:
+        [(event, payload)]
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        deliveries = json.load(f)
+    if isinstance(deliveries, dict):
+        deliveries = [deliveries]
+    return [(delivery['event'], delivery['payload']) for delivery in deliveries]
+
+
+class ReportService:
+    """
+    Long-running report of one repository, kept current without full re-extractions.
+
+    The GitHub client (connection pool, HTTP cache, rate-limit scheduler), the result cache and
+    the raw snapshot, as (pr, reviews, checks) records with their processed report rows, stay in
+    memory between updates:
+
+    - refresh() runs an incremental run_extract (on a schedule) and merges the refetched PRs into
+      memory, only their rows are reprocessed
+    - handle_event() maps a pull_request, pull_request_review or check_run webhook payload to the
+      PRs it affects; apply_pending() refetches only what changed of them (the PR comes with the
+      payload, reviews or check runs are refetched), reprocesses their rows, writes the changed PRs
+      to the snapshot and saves the report
+
+    The snapshot on disk is only read by load(), at startup; from then on memory is authoritative.
+
+    Events are applied by one worker thread (run()), bursts are coalesced for `debounce_seconds`.
+    The filters are rebuilt from the filter options (filter_args, see filters.add_filter_args) for
+    every refresh and update, so relative windows like --merged-since keep moving.
+    """
+
+    def __init__(self, config, filter_args, service_cfg: ServiceConfig):
+        # every scheduled refresh is incremental, the first one is a full extraction without a snapshot
+        self.config = copy.deepcopy(config)
+        self.config.setdefault('extract', {})['incremental'] = True
+        self.cfg = extract.fetch_config(self.config)
+        self.transform_cfg = transform.fetch_config(self.config)
+        self.service_cfg = service_cfg
+        self.repo = f"{self.cfg.organization}/{self.cfg.repository}"
+        self.run_name = f"{self.cfg.organization}_{self.cfg.repository}" # of the metrics files, like main.py's
+
+        self.filter_args = filter_args
+        # the fields the filters read don't depend on when they are built
+        pr_filters, review_filters, check_filters = self.build_filters()
+        fields = extract.projected_fields(self.cfg, pr_filters, review_filters, check_filters)
+        self.pr_spec = projection.compile_fields(fields['pr']) if fields else None
+
+        self.client = extract.build_client(self.cfg, pr_filters, review_filters, check_filters)
+        self.result_cache = extract.build_result_cache(self.cfg, pr_filters, review_filters, check_filters)
+
+        self.records = {} # PR number -> (pr, reviews, checks)
+        self.rows = {} # PR number -> processed row
+        self.by_sha = {} # merge commit SHA -> PR number, to find the PR of a check run
+        self.last_refresh = None
+
+        self.events = queue.Queue()
+        self._pending = {} # PR number -> {'pr': payload PR or None, 'parts': {'reviews', 'checks'}}
+        self._flush_at = None
+        self._stopped = threading.Event()
+
+    def build_filters(self):
+        """
+        Returns the (PR, review, check) filters, with relative cutoffs anchored at the time of the call.
+        """
+        args = self.filter_args
+        return filters.build_pr_filters(args), filters.build_review_filters(args), filters.build_check_filters(args)
+
+    # State
+    def load(self):
+        """
+        Loads the raw snapshot on disk into memory and processes its rows.
+        """
+        if self.cfg.raw_format == 'sqlite':
+            store = SQLiteStore(self.cfg.sqlite_path)
+            try:
+                records = list(store.iter_records(self.repo))
+            finally:
+                store.close()
+        elif os.path.exists(extract.raw_data_path(self.cfg)):
+            records = list(transform.iter_raw_prs(extract.raw_data_path(self.cfg), self.cfg.raw_format))
+        else:
+            records = []
+
+        self.records = {}
+        self.rows = {}
+        self.by_sha = {}
+        for record in records:
+            self._set_record(record[0]['number'], record)
+        logger.info(f"Loaded {len(self.records)} PRs of {self.repo} into memory")
+
+    def _set_record(self, num, record):
+        old = self.records.get(num)
+        if old is not None:
+            self.by_sha.pop(old[0].get('merge_commit_sha'), None)
+        if record is None:
+            self.records.pop(num, None)
+            self.rows.pop(num, None)
+            return
+
+        self.records[num] = record
+        self.rows[num] = transform.process_pr(*record)
+        if record[0].get('merge_commit_sha'):
+            self.by_sha[record[0]['merge_commit_sha']] = num
+
+    def ordered_records(self):
+        # newest updates first, like an extraction
+        return sorted(self.records.values(), key=lambda record: record[0]['updated_at'], reverse=True)
+
+    def save(self, changed=(), removed=()):
+        """
+        Writes the changed and removed PRs to the snapshot and saves the report outputs from memory.
+        They are upserted into the SQLite store or appended to the ndjson raw file (see
+        raw_records.append_raw_records); only the JSON raw file, which can't be appended to, is rewritten.
+        The extract state (watermark) is left to refresh(), so the next incremental run still covers
+        everything since the last one.
+        """
+        records = self.ordered_records()
+        if self.cfg.raw_format == 'sqlite':
+            store = SQLiteStore(self.cfg.sqlite_path)
+            try:
+                with store.transaction():
+                    for num in changed:
+                        store.upsert_pr(self.repo, *self.records[num])
+                    for pr in removed:
+                        store.delete_pr(self.repo, pr)
+            finally:
+                store.close()
+        elif self.cfg.raw_format == 'ndjson':
+            append_raw_records(extract.raw_data_path(self.cfg), [self.records[num] for num in changed],
+                               [pr['number'] for pr in removed])
+        else:
+            extract.save_raw_payload(records, self.cfg)
+
+        self.save_report(records)
+
+    def save_report(self, records=None):
+        rows = [self.rows[pr['number']] for pr, _, _ in (records or self.ordered_records())]
+        if not rows:
+            logger.warning("No merged PRs in the snapshot, no report saved.")
+            return
+        with metrics.REGISTRY.stage('transform.save'):
+            transform.save_processed_prs(rows, self.transform_cfg)
+            transform.save_report(rows, self.transform_cfg)
+
+    def refresh(self):
+        """
+        Applies the pending webhook updates, then runs an incremental extraction with the warm
+        client and caches. The refetched PRs are merged into memory like the extraction merges them
+        into the snapshot (see merge_refetched), and the report is saved from memory.
+
+        Returns:
+            True if the extraction succeeded.
+        """
+        self.apply_pending()
+        logger.info(f"Refreshing {self.repo}")
+        filter_lists = self.build_filters()
+        refetched = {}
+        incremental = False
+
+        def collect(records, incremental_run):
+            nonlocal incremental
+            incremental = incremental_run
+            for record in records:
+                refetched[record[0]['number']] = record
+                yield record
+
+        with metrics.REGISTRY.stage('service.refresh'):
+            succeeded = extract.run_extract(self.config, *filter_lists, client=self.client,
+                                            result_cache=self.result_cache, record_sink=collect)
+            if not succeeded:
+                logger.warning(f"Refresh of {self.repo} failed or found no merged PRs, keeping the current report.")
+                return False
+            self.merge_refetched(refetched, incremental, *filter_lists)
+            self.save_report()
+
+        self.last_refresh = time.time()
+        metrics.save_run_metrics(self.config, self.run_name)
+        return True
+
+    def merge_refetched(self, refetched, incremental, pr_filters, review_filters, check_filters):
+        """
+        Replaces the in-memory records with those of a full extraction, or merges those of an
+        incremental one: the other PRs are kept with the current filters re-applied, like
+        extract.merge_raw_payloads, so only the refetched and re-filtered rows are reprocessed.
+        """
+        if not incremental:
+            self.records, self.rows, self.by_sha = {}, {}, {}
+        keep_pr = compile_filters(pr_filters)
+        keep_reviews = compile_filters(review_filters).select
+        keep_checks = compile_filters(check_filters).select
+
+        for num, (pr, reviews, checks) in list(self.records.items()):
+            if num in refetched:
+                continue
+            if not keep_pr(pr):
+                self._set_record(num, None)
+                continue
+            kept_reviews = keep_reviews(reviews)
+            kept_checks = keep_checks(checks)
+            if len(kept_reviews) != len(reviews) or len(kept_checks) != len(checks):
+                self._set_record(num, (pr, kept_reviews, kept_checks))
+        for num, record in refetched.items():
+            self._set_record(num, record)
+        logger.info(f"Merged {len(refetched)} refetched PRs into the {len(self.records)} PRs of {self.repo} in memory")
+
+    # Webhooks
+    def handle_event(self, event, payload):
+        """
+        Marks the PRs affected by a webhook payload for update (see apply_pending).
+
+        Returns:
+            The numbers of the affected PRs (empty if the event doesn't change the report).
+        """
+        repository = (payload.get('repository') or {}).get('full_name') or ''
+        if repository.lower() != self.repo.lower():
+            logger.debug(f"Ignoring {event} event of {repository or 'unknown repository'}")
+            return []
+
+        if event == 'pull_request':
+            pr = payload.get('pull_request') or {}
+            num = pr.get('number')
+            if num is None or (not pr.get('merged_at') and num not in self.records):
+                return [] # not merged (yet)
+            # a newly merged PR needs its reviews and check runs, a known one only its new fields
+            self._mark(num, pr=pr, parts=() if num in self.records else ('reviews', 'checks'))
+            affected = [num]
+        elif event == 'pull_request_review':
+            num = (payload.get('pull_request') or {}).get('number')
+            affected = [num] if num in self.records or num in self._pending else []
+            for num in affected:
+                self._mark(num, parts=('reviews',))
+        elif event == 'check_run':
+            sha = (payload.get('check_run') or {}).get('head_sha')
+            affected = [num for num in (self.by_sha.get(sha),) if num is not None]
+            affected += [num for num, item in self._pending.items()
+                         if item['pr'] and item['pr'].get('merge_commit_sha') == sha and num not in affected]
+            for num in affected:
+                self._mark(num, parts=('checks',))
+        else:
+            return []
+
+        if affected and self._flush_at is None:
+            self._flush_at = time.monotonic() + self.service_cfg.debounce_seconds
+        logger.debug(f"{event} event ({payload.get('action')}) affects PRs {affected}")
+        return affected
+
+    def _mark(self, num, pr=None, parts=()):
+        item = self._pending.setdefault(num, {'pr': None, 'parts': set()})
+        if pr is not None:
+            item['pr'] = pr
+        item['parts'].update(parts)
+
+    def _update_record(self, num, item, pr_filters, review_filters, check_filters):
+        """
+        Returns the updated (pr, reviews, checks) record of a PR, or None if the PR filters drop it.
+        """
+        old = self.records.get(num)
+        if item['pr'] is not None:
+            pr = projection.project(item['pr'], self.pr_spec) if self.pr_spec else item['pr']
+        elif old is not None:
+            pr = old[0]
+        else:
+            return None # only a review or check run of a PR whose merge event failed
+        if not pr.get('merged_at') or not compile_filters(pr_filters)(pr):
+            return None
+
+        reviews = old[1] if old else None
+        if reviews is None or 'reviews' in item['parts']:
+            reviews = extract.fetch_pr_reviews(self.client, pr, self.cfg, review_filters, self.result_cache,
+                                               refresh=True)
+        checks = old[2] if old else None
+        if checks is None or 'checks' in item['parts']:
+            checks = extract.fetch_pr_checks(self.client, pr, self.cfg, check_filters, self.result_cache,
+                                             refresh=True)
+        return pr, reviews, checks
+
+    def apply_pending(self):
+        """
+        Refetches what changed of the PRs marked by handle_event, updates their rows and saves the
+        snapshot and the report. PRs whose update fails are left as they are until the next refresh.
+
+        Returns:
+            The number of updated or removed PRs.
+        """
+        pending, self._pending, self._flush_at = self._pending, {}, None
+        if not pending:
+            return 0
+
+        filter_lists = self.build_filters()
+
+        def update(num, item):
+            try:
+                return num, self._update_record(num, item, *filter_lists), True
+            except Exception:
+                # fetch_data logs the exception
+                return num, None, False
+
+        with metrics.REGISTRY.stage('service.update'):
+            with ThreadPoolExecutor(max_workers=self.cfg.max_workers) as executor:
+                results = list(executor.map(lambda entry: update(*entry), pending.items()))
+
+            changed = []
+            removed = []
+            for num, record, succeeded in results:
+                if not succeeded:
+                    continue
+                if record is None:
+                    if num in self.records:
+                        removed.append(self.records[num][0])
+                        self._set_record(num, None)
+                    continue
+                self._set_record(num, record)
+                changed.append(num)
+
+            if changed or removed:
+                self.save(changed, removed)
+
+        failed = sum(1 for _, _, succeeded in results if not succeeded)
+        logger.info(f"Applied webhook updates: {len(changed)} PRs updated, {len(removed)} removed"
+                    + (f", {failed} failed (left for the next refresh)" if failed else ""))
+        return len(changed) + len(removed)
+
+    # Worker
+    def run(self):
+        """
+        Applies queued events and runs the scheduled refreshes until stop() is called.
+        """
+        interval = self.service_cfg.refresh_minutes * 60
+        next_refresh = time.monotonic() + interval if interval else None
+        while not self._stopped.is_set():
+            deadlines = [deadline for deadline in (next_refresh, self._flush_at) if deadline is not None]
+            timeout = min([POLL_SECONDS] + [max(0.0, deadline - time.monotonic()) for deadline in deadlines])
+            try:
+                event, payload = self.events.get(timeout=timeout)
+                self.handle_event(event, payload)
+            except queue.Empty:
+                pass
+            except Exception:
+                logger.exception("Failed to handle a webhook event.")
+
+            try:
+                if self._flush_at is not None and time.monotonic() >= self._flush_at:
+                    self.apply_pending()
+                if next_refresh is not None and time.monotonic() >= next_refresh:
+                    self.refresh()
+                    next_refresh = time.monotonic() + interval
+            except Exception:
+                logger.exception("Service update failed.")
+
+        # apply what is still queued before exiting
+        while not self.events.empty():
+            self.handle_event(*self.events.get())
+        self.apply_pending()
+
+    def stop(self):
+        self._stopped.set()
+
+    def status(self):
+        return {
+            'repository': self.repo,
+            'prs': len(self.records),
+            'queued_events': self.events.qsize(),
+            'pending_prs': len(self._pending),
+            'last_refresh': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.last_refresh))
+                            if self.last_refresh else None,
+        }
+
+
+def build_server(service: ReportService):
+    """
+    HTTP server of the service:
+
+    - POST {webhook_path}: GitHub webhook deliveries (checked against GITHUB_WEBHOOK_SECRET when set),
+      queued for the worker and answered with 202 right away
+    - GET /health: status of the service (JSON)
+    - GET /metrics: run metrics in the Prometheus text format
+    """
+    service_cfg = service.service_cfg
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, json.dumps(service.status()).encode('utf-8'), 'application/json')
+            elif self.path == '/metrics':
+                self._send(200, metrics.REGISTRY.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+            else:
+                self._send(404, b'{"message": "Not Found"}', 'application/json')
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.path != service_cfg.webhook_path:
+                return self._send(404, b'{"message": "Not Found"}', 'application/json')
+            if service_cfg.webhook_secret and not verify_signature(service_cfg.webhook_secret, body,
+                                                                   self.headers.get(SIGNATURE_HEADER)):
+                logger.warning(f"Rejected webhook delivery with an invalid signature from {self.address_string()}")
+                return self._send(401, b'{"message": "Invalid signature"}', 'application/json')
+
+            event = self.headers.get(EVENT_HEADER)
+            if event == 'ping':
+                return self._send(200, b'{"message": "pong"}', 'application/json')
+            if event not in EVENTS:
+                return self._send(202, b'{"message": "Ignored"}', 'application/json')
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return self._send(400, b'{"message": "Invalid JSON"}', 'application/json')
+
+            service.events.put((event, payload))
+            self._send(202, b'{"message": "Queued"}', 'application/json')
+
+        def _send(self, status, data, content_type):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((service_cfg.host, service_cfg.port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(service: ReportService):
+    """
+    Runs the service until SIGINT / SIGTERM: an initial refresh, then the webhook server
+    and the worker.
+    """
+    service.load()
+    service.refresh()
+
+    server = build_server(service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Listening for webhooks on http://{server.server_address[0]}:{server.server_port}"
+                f"{service.service_cfg.webhook_path}"
+                + (f", refreshing every {service.service_cfg.refresh_minutes:g} minutes"
+                   if service.service_cfg.refresh_minutes else ""))
+    if not service.service_cfg.webhook_secret:
+        logger.warning(f"{WEBHOOK_SECRET_ENV_VAR_NAME} is not set, webhook signatures are not checked.")
+
+    signal.signal(signal.SIGTERM, lambda *_: service.stop())
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        service.stop()
+        service.run() # drains the queue and returns
+    finally:
+        server.shutdown()
+        server.server_close()
+        metrics.save_run_metrics(service.config, service.run_name)
+    logger.info("Service stopped.")
+
+
+def replay(service: ReportService, paths, refresh=False):
+    """
+    Applies recorded webhook deliveries to the snapshot on disk (after a refresh with refresh=True),
+    the same way the server would, and saves the updated snapshot and report.
+    """
+    service.load()
+    if refresh:
+        service.refresh()
+
+    for path in paths:
+        for event, payload in load_deliveries(path):
+            affected = service.handle_event(event, payload)
+            logger.info(f"Replayed {event} event ({payload.get('action')}) from {path}: PRs {affected or 'none'}")
+    service.apply_pending()
+    metrics.save_run_metrics(service.config, service.run_name)
+
+
+def main():
+    setup_logging(name=__name__)
+
+    parser = argparse.ArgumentParser(description="Scytale PR Report - service mode")
+    parser.add_argument("--config", default="config/settings.yaml",
+        help="Path to your settings.yaml"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="Keep the report current: scheduled refreshes and webhooks")
+    filters.add_filter_args(serve_parser)
+
+    replay_parser = commands.add_parser('replay', help="Apply recorded webhook deliveries to the snapshot")
+    replay_parser.add_argument("delivery_paths", nargs='+',
+        help="JSON files of {\"event\": .., \"payload\": ..} objects (or lists of them)"
+    )
+    replay_parser.add_argument("--refresh", action="store_true",
+        help="Run an incremental extraction before replaying"
+    )
+    filters.add_filter_args(replay_parser)
+
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as ymlfile:
+        config = yaml.safe_load(ymlfile)
+
+    try:
+        if is_multi_repo(config):
+            raise ValueError("The service mode serves a single repository, "
+                             "unset 'github.repositories' / 'github.all_repositories'.")
+        service = ReportService(config, args, fetch_config(config))
+    except ValueError as e:
+        logger.error(f"Invalid configuration: {e}")
+        sys.exit(1)
+
+    try:
+        if args.command == 'serve':
+            serve(service)
+        else:
+            replay(service, args.delivery_paths, refresh=args.refresh)
+    except Exception:
+        logger.exception(f"Service command '{args.command}' failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import sys
+
+import yaml
+
+import extract
+import filters
+from logger import setup_logging
+from multi_repo import target_config
+from raw_records import RawRecordWriter, iter_raw_records
+
+logger = logging.getLogger(__name__)
+
+# Constants
+MANIFEST_FILENAME = "manifest.json"
+SHARD_FILENAME_TEMPLATE = "shard_{index:04d}.json"
+SHARD_OUTPUT_FILENAME_TEMPLATE = "shard_{index:04d}.out.ndjson"
+SHARD_DIR_TEMPLATE = "{org}_{repo}"
+SHARD_FILE_RE = re.compile(r"shard_\d{4}\.(json|out\.ndjson(\.tmp)?)") # units and outputs (.tmp: of a killed worker)
+
+
+def filter_arg_names():
+    """
+    Returns the names of the filter CLI arguments (see filters.add_filter_args).
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    filters.add_filter_args(parser)
+    return sorted(vars(parser.parse_args([])))
+
+
+def build_filters(filter_args):
+    """
+    Rebuilds the PR, review and check filters from recorded filter arguments.
+    """
+    args = argparse.Namespace(**filter_args)
+    return filters.build_pr_filters(args), filters.build_review_filters(args), filters.build_check_filters(args)
+
+
+def shard_dir_path(config, org=None, repo=None):
+    sharding_cfg = config.get('sharding') or {}
+    github_cfg = config['github']
+    dirname = SHARD_DIR_TEMPLATE.format(org=org or github_cfg['organization'], repo=repo or github_cfg['repository'])
+    return os.path.join(sharding_cfg.get('dir_path', 'data/shards'), dirname)
+
+
+def plan_shards(config, filter_args, shard_count):
+    """
+    Coordinator: fetches the merged-PR list and splits it into `shard_count` work units
+    (contiguous slices, newest update first), written to the shard directory with a manifest.
+
+    Returns:
+        Path of the manifest, or None if no merged PRs were found.
+    """
+    cfg = extract.fetch_config(config)
+    pr_filters, review_filters, check_filters = build_filters(filter_args)
+    client = extract.build_client(cfg, pr_filters, review_filters, check_filters)
+
+    merged_prs = extract.fetch_data(client.fetch_merged_prs, "merged PRs", cfg.organization, cfg.repository,
+                                    filters=pr_filters, use_search=cfg.search_pushdown) or []
+    if not merged_prs:
+        logger.warning("No merged PRs found. Nothing to shard.")
+        return None
+
+    dir_path = shard_dir_path(config)
+    os.makedirs(dir_path, exist_ok=True)
+    for name in os.listdir(dir_path): # the files of a previous plan don't belong to this one
+        if name == MANIFEST_FILENAME or SHARD_FILE_RE.fullmatch(name):
+            os.remove(os.path.join(dir_path, name))
+
+    shard_size = math.ceil(len(merged_prs) / shard_count)
+    shards = []
+    for index, start in enumerate(range(0, len(merged_prs), shard_size)):
+        filename = SHARD_FILENAME_TEMPLATE.format(index=index)
+        with open(os.path.join(dir_path, filename), 'w', encoding='utf-8') as f:
+            json.dump({
+                'organization': cfg.organization,
+                'repository': cfg.repository,
+                'index': index,
+                'filter_args': filter_args,
+                'merged_prs': merged_prs[start:start + shard_size],
+            }, f, ensure_ascii=False)
+        shards.append(filename)
+
+    manifest_path = os.path.join(dir_path, MANIFEST_FILENAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'organization': cfg.organization,
+            'repository': cfg.repository,
+            'filter_args': filter_args,
+            'pr_count': len(merged_prs),
+            'shards': shards,
+        }, f, indent=4)
+
+    logger.info(f"Planned {len(shards)} shards of up to {shard_size} PRs for {len(merged_prs)} merged PRs in {dir_path}")
+    return manifest_path
+
+
+def work_shard(config, shard_path):
+    """
+    Worker: fetches the reviews and check runs of the PRs of one work unit, with the token of
+    this process (GITHUB_TOKEN / GITHUB_TOKENS), and writes them next to it as line-delimited
+    records. A shard whose output already exists is skipped, so failed workers can simply be rerun.
+
+    Returns:
+        Path of the shard output.
+    """
+    with open(shard_path, 'r', encoding='utf-8') as f:
+        shard = json.load(f)
+
+    dir_path = os.path.dirname(shard_path)
+    output_path = os.path.join(dir_path, SHARD_OUTPUT_FILENAME_TEMPLATE.format(index=shard['index']))
+    if os.path.exists(output_path):
+        logger.info(f"Shard {shard['index']} already done ({output_path})")
+        return output_path
+
+    cfg = extract.fetch_config(target_config(config, shard['organization'], shard['repository']))
+    pr_filters, review_filters, check_filters = build_filters(shard['filter_args'])
+    client = extract.build_client(cfg, pr_filters, review_filters, check_filters)
+    result_cache = extract.build_result_cache(cfg, pr_filters, review_filters, check_filters)
+
+    writer = RawRecordWriter(output_path)
+    try:
+        for pr, reviews, checks in extract.iter_pr_details(client, shard['merged_prs'], cfg, review_filters,
+                                                           check_filters, result_cache=result_cache):
+            writer.write(pr, reviews, checks)
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    return output_path
+
+
+def iter_shard_records(dir_path, manifest):
+    """
+    Yields the (pr, reviews, checks) records of all shard outputs, in shard order.
+
+    Raises:
+        FileNotFoundError: if a shard wasn't processed yet.
+    """
+    outputs = [os.path.join(dir_path, SHARD_OUTPUT_FILENAME_TEMPLATE.format(index=index))
+               for index in range(len(manifest['shards']))]
+    missing = [path for path in outputs if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"{len(missing)} of {len(outputs)} shards are not done yet: {', '.join(missing)}")
+
+    for path in outputs:
+        yield from iter_raw_records(path)
+
+
+def merge_shards(config, manifest_path):
+    """
+    Combines the shard outputs into the raw snapshot of the configured raw format
+    (what run_transformation expects) and records the extract state.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    cfg = extract.fetch_config(target_config(config, manifest['organization'], manifest['repository']))
+    signature = filters.filter_signature(*build_filters(manifest['filter_args']))
+    records = iter_shard_records(os.path.dirname(manifest_path), manifest)
+
+    if cfg.raw_format == 'sqlite':
+        watermark = extract.save_store_records(records, cfg)
+    elif cfg.raw_format == 'ndjson':
+        watermark = extract.save_raw_records(records, cfg)
+    else:
+        watermark = extract.save_raw_payload(records, cfg)
+
+    extract.save_extract_state(watermark, cfg, signature)
+    logger.info(f"Merged {len(manifest['shards'])} shards ({manifest['pr_count']} PRs) into {extract.raw_data_path(cfg)}")
+
+
+def run_local(config_path, config, filter_args, shard_count, processes):
+    """
+    Runs plan, `processes` worker processes (at most, one per shard) and merge on this machine.
+
+    Returns:
+        True if successful, False otherwise.
+    """
+    manifest_path = plan_shards(config, filter_args, shard_count)
+    if manifest_path is None:
+        return False
+
+    dir_path = os.path.dirname(manifest_path)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        shard_paths = [os.path.join(dir_path, name) for name in json.load(f)['shards']]
+
+    # each worker process takes every n-th shard
+    workers = []
+    for worker_index in range(min(processes, len(shard_paths))):
+        command = [sys.executable, os.path.abspath(__file__), '--config', config_path, 'work',
+                   *shard_paths[worker_index::processes]]
+        workers.append(subprocess.Popen(command))
+    failed = sum(1 for worker in workers if worker.wait() != 0)
+    if failed:
+        logger.error(f"{failed} of {len(workers)} worker processes failed, rerun them with 'work' and then 'merge'.")
+        return False
+
+    merge_shards(config, manifest_path)
+    return True
+
+
+def main():
+    setup_logging(name=__name__)
+
+    parser = argparse.ArgumentParser(description="Scytale PR Report - sharded extraction")
+    parser.add_argument("--config", default="config/settings.yaml",
+        help="Path to your settings.yaml"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = commands.add_parser('plan', help="Fetch the merged PRs and write them as shards")
+    plan_parser.add_argument("--shards", type=int, help="Number of shards (default: sharding.shards)")
+    filters.add_filter_args(plan_parser)
+
+    work_parser = commands.add_parser('work', help="Fetch reviews and check runs of shards")
+    work_parser.add_argument("shard_paths", nargs='+', help="Shard files written by 'plan'")
+
+    merge_parser = commands.add_parser('merge', help="Combine the shard outputs into the raw snapshot")
+    merge_parser.add_argument("--manifest", help="Manifest written by 'plan' (default: the configured repository's)")
+
+    local_parser = commands.add_parser('local', help="plan, work in several processes and merge on this machine")
+    local_parser.add_argument("--shards", type=int, help="Number of shards (default: sharding.shards)")
+    local_parser.add_argument("--processes", type=int, help="Worker processes (default: sharding.processes)")
+    filters.add_filter_args(local_parser)
+
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as ymlfile:
+        config = yaml.safe_load(ymlfile)
+    sharding_cfg = config.get('sharding') or {}
+
+    try:
+        if args.command == 'work':
+            for shard_path in args.shard_paths:
+                work_shard(config, shard_path)
+            return
+
+        if args.command == 'merge':
+            merge_shards(config, args.manifest or os.path.join(shard_dir_path(config), MANIFEST_FILENAME))
+            return
+
+        filter_args = {name: getattr(args, name) for name in filter_arg_names()}
+        shard_count = args.shards or sharding_cfg.get('shards', 8)
+        if not isinstance(shard_count, int) or shard_count < 1:
+            raise ValueError("The number of shards must be a positive integer.")
+        if args.command == 'plan':
+            if plan_shards(config, filter_args, shard_count) is None:
+                sys.exit(1)
+        elif not run_local(args.config, config, filter_args, shard_count,
+                           args.processes or sharding_cfg.get('processes', 4)):
+            sys.exit(1)
+    except Exception:
+        logger.exception(f"Sharded extraction step '{args.command}' failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
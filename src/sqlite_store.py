@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Constants
+BUSY_TIMEOUT_SECONDS = 60 # wait for the write lock held by another run instead of failing
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prs (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    title TEXT,
+    author TEXT,
+    merged_at TEXT,
+    updated_at TEXT,
+    merge_commit_sha TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    repo TEXT NOT NULL,
+    pr_number INTEGER NOT NULL,
+    review_id INTEGER NOT NULL,
+    reviewer TEXT,
+    state TEXT,
+    submitted_at TEXT,
+    PRIMARY KEY (repo, pr_number, review_id)
+);
+CREATE TABLE IF NOT EXISTS check_runs (
+    repo TEXT NOT NULL,
+    pr_number INTEGER NOT NULL,
+    check_run_id INTEGER NOT NULL,
+    commit_sha TEXT,
+    name TEXT,
+    status TEXT,
+    conclusion TEXT,
+    PRIMARY KEY (repo, pr_number, check_run_id)
+);
+CREATE INDEX IF NOT EXISTS idx_prs_repo_merged_at ON prs (repo, merged_at);
+CREATE INDEX IF NOT EXISTS idx_prs_repo_author ON prs (repo, author);
+CREATE INDEX IF NOT EXISTS idx_prs_merged_at ON prs (merged_at);
+CREATE INDEX IF NOT EXISTS idx_prs_author ON prs (author);
+"""
+
+# Same rules as transform.process_pr: CR passed if any review is APPROVED, checks passed if at
+# least one completed check run exists and all completed ones succeeded.
+REPORT_QUERY = """
+SELECT
+    p.number AS pr_number,
+    p.title AS pr_title,
+    p.author AS author,
+    p.merged_at AS merge_date,
+    EXISTS (
+        SELECT 1 FROM reviews r
+        WHERE r.repo = p.repo AND r.pr_number = p.number AND r.state = 'APPROVED'
+    ) AS cr_passed,
+    EXISTS (
+        SELECT 1 FROM check_runs c
+        WHERE c.repo = p.repo AND c.pr_number = p.number AND c.status = 'completed'
+    ) AND NOT EXISTS (
+        SELECT 1 FROM check_runs c
+        WHERE c.repo = p.repo AND c.pr_number = p.number AND c.status = 'completed'
+          AND (c.conclusion IS NULL OR c.conclusion != 'success')
+    ) AS checks_passed
+FROM prs p
+WHERE p.repo = ?
+ORDER BY p.updated_at DESC, p.number DESC
+"""
+# PR numbers bound as one JSON array parameter (see _numbers), e.g. `number NOT IN {NUMBERS}`
+NUMBERS = "(SELECT value FROM json_each(?))"
+
+
+def _numbers(numbers):
+    return json.dumps(sorted(numbers))
+
+
+def _login(obj):
+    return (obj.get('user') or {}).get('login')
+
+
+class SQLiteStore:
+    """
+    Embedded SQLite store for PRs, their reviews and the check runs of their merge commits,
+    for any number of repositories ('org/repo').
+
+    Rows are upserted keyed by PR number (check runs too: merge_commit_sha can be null), so a run
+    only writes what it fetched, and reports are generated with a query instead of rereading whole snapshots.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS)
+        self._conn.executescript(SCHEMA)
+
+        logger.debug(f"SQLiteStore opened at {path}")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups writes: committed together on success, rolled back on any error.
+        """
+        try:
+            yield self
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def commit(self):
+        self._conn.commit()
+
+    def upsert_pr(self, repo, pr, reviews, checks):
+        """
+        Upserts a PR and replaces its reviews and the check runs of its merge commit.
+        """
+        self._conn.execute(
+            """
+            INSERT INTO prs (repo, number, title, author, merged_at, updated_at, merge_commit_sha)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (repo, number) DO UPDATE SET
+                title = excluded.title,
+                author = excluded.author,
+                merged_at = excluded.merged_at,
+                updated_at = excluded.updated_at,
+                merge_commit_sha = excluded.merge_commit_sha
+            """,
+            (repo, pr['number'], pr.get('title'), _login(pr), pr.get('merged_at'), pr.get('updated_at'),
+             pr.get('merge_commit_sha')),
+        )
+
+        self._conn.execute("DELETE FROM reviews WHERE repo = ? AND pr_number = ?", (repo, pr['number']))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO reviews (repo, pr_number, review_id, reviewer, state, submitted_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(repo, pr['number'], review['id'], _login(review), review.get('state'), review.get('submitted_at'))
+             for review in reviews],
+        )
+
+        self._conn.execute("DELETE FROM check_runs WHERE repo = ? AND pr_number = ?", (repo, pr['number']))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO check_runs (repo, pr_number, check_run_id, commit_sha, name, status, conclusion) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(repo, pr['number'], check['id'], pr.get('merge_commit_sha'), check.get('name'), check.get('status'),
+              check.get('conclusion')) for check in checks],
+        )
+
+    def iter_prs(self, repo, exclude=()):
+        """
+        Yields the stored PRs of a repository as (projected) PR dicts, except the numbers in `exclude`.
+        """
+        cursor = self._conn.execute(
+            f"SELECT number, title, author, merged_at, updated_at, merge_commit_sha FROM prs "
+            f"WHERE repo = ? AND number NOT IN {NUMBERS}",
+            (repo, _numbers(exclude)))
+        for number, title, author, merged_at, updated_at, sha in cursor:
+            yield {
+                'number': number,
+                'title': title,
+                'user': {'login': author},
+                'merged_at': merged_at,
+                'updated_at': updated_at,
+                'merge_commit_sha': sha,
+            }
+
+    def iter_records(self, repo, exclude=()):
+        """
+        Yields the stored (pr, reviews, checks) records of a repository, like raw_records.iter_raw_records,
+        except the PR numbers in `exclude` (their reviews and check runs aren't read either).
+        """
+        exclude = _numbers(exclude)
+        reviews = {}
+        for pr_number, review_id, reviewer, state, submitted_at in self._conn.execute(
+                f"SELECT pr_number, review_id, reviewer, state, submitted_at FROM reviews "
+                f"WHERE repo = ? AND pr_number NOT IN {NUMBERS}", (repo, exclude)):
+            reviews.setdefault(pr_number, []).append(
+                {'id': review_id, 'state': state, 'user': {'login': reviewer}, 'submitted_at': submitted_at})
+
+        checks = {}
+        for pr_number, check_run_id, name, status, conclusion in self._conn.execute(
+                f"SELECT pr_number, check_run_id, name, status, conclusion FROM check_runs "
+                f"WHERE repo = ? AND pr_number NOT IN {NUMBERS}", (repo, exclude)):
+            checks.setdefault(pr_number, []).append(
+                {'id': check_run_id, 'name': name, 'status': status, 'conclusion': conclusion})
+
+        for pr in list(self.iter_prs(repo, exclude)):
+            yield pr, reviews.get(pr['number'], []), checks.get(pr['number'], [])
+
+    def latest_update(self, repo):
+        """
+        Returns the newest `updated_at` of the stored PRs of a repository, or None.
+        """
+        # ISO 8601 UTC timestamps sort lexicographically
+        return self._conn.execute("SELECT MAX(updated_at) FROM prs WHERE repo = ?", (repo,)).fetchone()[0]
+
+    def delete_pr(self, repo, pr):
+        self._conn.execute("DELETE FROM prs WHERE repo = ? AND number = ?", (repo, pr['number']))
+        self._conn.execute("DELETE FROM reviews WHERE repo = ? AND pr_number = ?", (repo, pr['number']))
+        self._conn.execute("DELETE FROM check_runs WHERE repo = ? AND pr_number = ?", (repo, pr['number']))
+
+    def delete_prs_except(self, repo, keep):
+        """
+        Deletes the stored PRs of a repository (with their reviews and check runs) whose numbers aren't in `keep`.
+
+        Returns:
+            The number of deleted PRs.
+        """
+        keep = _numbers(keep)
+        deleted = self._conn.execute(f"DELETE FROM prs WHERE repo = ? AND number NOT IN {NUMBERS}",
+                                     (repo, keep)).rowcount
+        self._conn.execute(f"DELETE FROM reviews WHERE repo = ? AND pr_number NOT IN {NUMBERS}", (repo, keep))
+        self._conn.execute(f"DELETE FROM check_runs WHERE repo = ? AND pr_number NOT IN {NUMBERS}", (repo, keep))
+        return deleted
+
+    def report_frame(self, repo):
+        """
+        Returns the processed report rows of a repository (transform.PROCESSED_COLUMNS) from one query.
+        """
+        df = pd.read_sql_query(REPORT_QUERY, self._conn, params=(repo,))
+        return df.astype({'cr_passed': 'bool', 'checks_passed': 'bool'}).astype({'pr_number': 'object'})
+
+    def close(self):
+        self._conn.close()
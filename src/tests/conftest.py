@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR) # the modules of src are imported flat, like main.py does
+
+from benchmarks.mock_api import MockGitHubAPI
+from benchmarks.synthetic import SyntheticRepo
+
+ORGANIZATION = 'synthetic'
+REPOSITORY = 'repo'
+
+
+class MutableRepo(SyntheticRepo):
+    """
+    SyntheticRepo whose reviews and check runs can be replaced per PR, to simulate changes on GitHub.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.review_overrides = {} # PR number -> reviews
+        self.check_overrides = {} # commit sha -> check runs
+
+    def reviews(self, number):
+        if number in self.review_overrides:
+            return self.review_overrides[number]
+        return super().reviews(number)
+
+    def check_runs(self, sha):
+        if sha in self.check_overrides:
+            return self.check_overrides[sha]
+        return super().check_runs(sha)
+
+
+@pytest.fixture
+def synthetic_repo():
+    return MutableRepo(120)
+
+
+@pytest.fixture
+def mock_api(synthetic_repo):
+    api = MockGitHubAPI(synthetic_repo).start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def config(tmp_path, mock_api, monkeypatch):
+    """
+    Configuration of the synthetic repository served by mock_api, with all outputs under tmp_path.
+    """
+    monkeypatch.setenv('GITHUB_TOKEN', 'test-token')
+    monkeypatch.delenv('GITHUB_TOKENS', raising=False)
+    return {
+        'github': {'organization': ORGANIZATION, 'repository': REPOSITORY, 'api_base_url': mock_api.base_url},
+        'data': {
+            'raw_dir_path': str(tmp_path / 'raw'),
+            'processed_dir_path': str(tmp_path / 'processed'),
+            'sqlite_path': str(tmp_path / 'github.db'),
+            'raw_format': 'json',
+        },
+        'output': {'report_dir_path': str(tmp_path / 'reports'), 'formats': ['csv']},
+        'extract': {'max_workers': 4},
+        'http': {'max_retries': 0},
+        'metrics': {'enabled': False},
+    }
+
+
+def report_path(config):
+    return os.path.join(config['output']['report_dir_path'], f"{ORGANIZATION}_{REPOSITORY}_report.csv")
@@ -0,0 +1,59 @@
+import argparse
+import json
+import logging
+from datetime import datetime, timezone
+
+import pytest
+
+import extract
+import filters
+from benchmarks.synthetic import EPOCH
+from conftest import MutableRepo
+
+
+@pytest.fixture
+def synthetic_repo():
+    return MutableRepo(200, max_reviews=8, max_check_runs=12)
+
+
+def test_connection_pool_covers_the_page_executor(config, caplog):
+    # one review / check run per page: the per-PR workers paginate through the page executor
+    config['http']['page_sizes'] = {'reviews': 1, 'check_runs': 1}
+    with caplog.at_level(logging.WARNING, logger='urllib3'):
+        assert extract.run_extract(config, [], [], [])
+    assert not [record for record in caplog.records if 'pool is full' in record.getMessage()]
+
+
+def filter_lists(*argv):
+    parser = argparse.ArgumentParser()
+    filters.add_filter_args(parser)
+    args = parser.parse_args(list(argv))
+    return filters.build_pr_filters(args), filters.build_review_filters(args), filters.build_check_filters(args)
+
+
+def snapshot_numbers(config):
+    with open(extract.raw_data_path(extract.fetch_config(config)), 'r', encoding='utf-8') as f:
+        return {pr['number'] for pr in json.load(f)['merged_prs']}
+
+
+def test_incremental_run_with_wider_filters_fetches_everything(config, synthetic_repo, caplog):
+    config['extract']['incremental'] = True
+    author = synthetic_repo.pr(0)['user']['login']
+    days = (datetime.now(timezone.utc) - EPOCH).days + 2 # every synthetic PR is in the window
+
+    assert extract.run_extract(config, *filter_lists('--only-authors', author, '--merged-since', str(days)))
+    narrow = snapshot_numbers(config)
+    assert 0 < len(narrow) < synthetic_repo.merged_count()
+
+    # same options (in another order): incremental
+    with caplog.at_level(logging.INFO, logger='extract'):
+        assert extract.run_extract(config, *filter_lists('--merged-since', str(days), '--only-authors', author, author))
+    assert 'Loaded previous snapshot' in caplog.text
+    assert snapshot_numbers(config) == narrow
+
+    # wider options: the PRs of the other authors were never fetched, a full extraction runs
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger='extract'):
+        assert extract.run_extract(config, *filter_lists('--merged-since', str(days)))
+    assert 'Loaded previous snapshot' not in caplog.text
+    assert len(snapshot_numbers(config)) == synthetic_repo.merged_count()
@@ -0,0 +1,167 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import filters
+
+PR = {
+    'number': 7,
+    'title': 'Fix the parser',
+    'user': {'login': 'alice'},
+    'draft': False,
+    'merged_at': '2024-03-01T12:00:00Z',
+    'updated_at': '2024-03-02T08:00:00Z',
+    'labels': None,
+}
+
+
+def matches(expression, item=PR):
+    return filters.parse_expression(expression)(item)
+
+
+def filter_args(*argv):
+    parser = argparse.ArgumentParser()
+    filters.add_filter_args(parser)
+    return parser.parse_args(list(argv))
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ("number == 7", True),
+    ("number != 7", False),
+    ("number >= 7.5", False),
+    ("title == 'Fix the parser'", True),
+    ('title == "Fix the parser"', True),
+    (r"title == 'it\'s'", False),
+    ("user.login == 'alice'", True),
+    ("user.login in ['alice', 'bob']", True),
+    ("user.login not in ['alice', 'bob']", False),
+    ("user.name is null", True), # missing fields read as null
+    ("user.login is not null", True),
+    ("labels == null", True),
+    ("draft == false", True),
+    ("number == '7'", False), # no match across types, no error
+    ("number < 'a'", False),
+    ("missing > 3", False),
+    ("merged_at >= '2024-03-01T12:00:00Z'", True),
+    ("merged_at > '2024-03-01T12:00:00Z'", False),
+    ("merged_at >= '2024-03-01T13:00:00+02:00'", True), # compared as instants
+    ("merged_at < '2024-03-01'", False),
+    ("merged_at >= now-3650d", True),
+    ("merged_at >= now", False),
+    ("number == 7 and user.login == 'bob'", False),
+    ("number == 7 or user.login == 'bob'", True),
+    ("not number == 7 or user.login == 'alice'", True),
+    ("not (number == 7 or user.login == 'alice')", False),
+    ("number == 1 or number == 2 and number == 7", False), # and binds tighter than or
+    ("(number == 1 or number == 7) and user.login == 'alice'", True),
+])
+def test_expressions(expression, expected):
+    assert matches(expression) is expected
+
+
+@pytest.mark.parametrize('expression', [
+    "",
+    "number ==",
+    "number = 7",
+    "number == 7 and",
+    "(number == 7",
+    "number == 7)",
+    "title == fix", # unquoted string
+    "and == 1",
+    "number in [1, 2",
+    "merged_at >= 3", # timestamps compare with ISO-8601 strings
+    "number > null",
+    "title == 'unterminated",
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        filters.parse_expression(expression)
+
+
+def test_relative_times_are_fixed_when_parsed():
+    predicate = filters.parse_expression("merged_at >= now-1h")
+    assert predicate({'merged_at': filters.utc_timestamp((datetime.now(timezone.utc) - timedelta(minutes=30)).isoformat())})
+    assert not predicate({'merged_at': filters.utc_timestamp((datetime.now(timezone.utc) - timedelta(hours=2)).isoformat())})
+
+
+def test_utc_timestamp():
+    assert filters.utc_timestamp('2024-03-01T12:00:00Z') == '2024-03-01T12:00:00Z'
+    assert filters.utc_timestamp('2024-03-01T14:00:00+02:00') == '2024-03-01T12:00:00Z'
+    assert filters.utc_timestamp('2024-03-01T12:00:00') == '2024-03-01T12:00:00Z'
+    assert filters.utc_timestamp(None) is None
+    assert filters.utc_timestamp(1709294400) is None
+    assert filters.utc_timestamp(datetime(2024, 3, 1, 12, tzinfo=timezone.utc)) is None
+
+
+def test_timestamp_comparisons_do_not_match_non_strings():
+    assert not matches("merged_at >= '2024-01-01'", dict(PR, merged_at=1709294400))
+    assert not matches("merged_at >= now-3650d", dict(PR, merged_at={'date': '2024-03-01'}))
+
+
+def test_compiled_filter_orders_predicates_by_cost_and_combines_pushdowns():
+    calls = []
+
+    def legacy(item):
+        calls.append('legacy')
+        return True
+
+    date = filters.merge_date_filter(30)
+    author = filters.author_whitelist_filter(['alice'])
+    compiled = filters.compile_filters([legacy, date, author])
+
+    assert [p.cost for p in compiled.predicates] == sorted(p.cost for p in compiled.predicates)
+    assert compiled.predicates[-1].test is legacy
+    assert set(compiled.fields) == {'merged_at', 'user.login'}
+    assert sorted(compiled.search_qualifiers) == sorted(date.search_qualifiers + author.search_qualifiers)
+    assert compiled.updated_since == date.updated_since
+
+    # the cheaper predicates short-circuit the legacy callable
+    assert not compiled(dict(PR, user={'login': 'bob'}))
+    assert calls == []
+
+
+def test_compile_filters():
+    assert filters.compile_filters([]) is filters.MATCH_ALL
+    assert filters.MATCH_ALL(PR)
+    compiled = filters.compile_filters([filters.check_name_filter(['build'])])
+    assert filters.compile_filters(compiled) is compiled
+    assert filters.compile_filters([compiled]) is compiled
+    checks = [{'name': 'build'}, {'name': 'lint'}, {'name': 'build'}]
+    assert compiled.select(checks) == [checks[0], checks[2]]
+
+
+def test_author_pushdown_only_for_a_single_author():
+    assert filters.author_whitelist_filter(['alice', 'alice']).search_qualifiers == ['author:alice']
+    assert filters.author_whitelist_filter(['alice', 'bob']).search_qualifiers == []
+
+
+def test_merge_date_filter_bounds_pagination():
+    predicate = filters.merge_date_filter(7)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=7)
+    assert abs(predicate.updated_since - cutoff) < timedelta(minutes=1)
+    assert predicate.search_qualifiers == [f"merged:>={predicate.updated_since:%Y-%m-%d}"]
+    assert not predicate({'merged_at': None})
+
+
+def test_builders():
+    args = filter_args('--merged-since', '3650', '--only-authors', 'alice', 'bob', '--pr-filter', 'draft == false',
+                       '--reviewers', 'carol', '--recent-reviews', '3650',
+                       '--check-names', 'build', '--check-filter', "conclusion != 'skipped'")
+
+    [pr_filter] = filters.build_pr_filters(args)
+    assert pr_filter(PR)
+    assert not pr_filter(dict(PR, user={'login': 'dave'}))
+    assert not pr_filter(dict(PR, draft=True))
+
+    [review_filter] = filters.build_review_filters(args)
+    review = {'user': {'login': 'carol'}, 'submitted_at': '2024-03-01T00:00:00Z'}
+    assert review_filter.select([review, dict(review, user={'login': 'bob'})]) == [review]
+
+    [check_filter] = filters.build_check_filters(args)
+    assert check_filter({'name': 'build', 'conclusion': 'failure'}) # failures are kept for checks_passed
+    assert not check_filter({'name': 'build', 'conclusion': 'skipped'})
+    assert not check_filter({'name': 'lint', 'conclusion': 'success'})
+
+    none = filter_args()
+    assert filters.build_pr_filters(none) == filters.build_review_filters(none) == filters.build_check_filters(none) == []
@@ -0,0 +1,45 @@
+import threading
+from datetime import datetime, timezone
+
+import filters
+from GitHubClient import GitHubClient
+
+UPDATED_SINCE = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def search_query(*filter_list, updated_since=None):
+    client = GitHubClient('token', 'http://127.0.0.1')
+    return client._plan_search_query('org', 'repo', list(filter_list), updated_since)
+
+
+def test_time_bounds_alone_use_the_listing():
+    assert search_query() is None
+    assert search_query(updated_since=UPDATED_SINCE) is None
+    assert search_query(filters.merge_date_filter(30), updated_since=UPDATED_SINCE) is None
+    assert search_query(filters.author_whitelist_filter(['alice', 'bob'])) is None # several authors don't OR
+
+
+def test_author_is_pushed_down_with_the_time_bounds():
+    date = filters.merge_date_filter(30)
+    query = search_query(filters.author_whitelist_filter(['alice']), date, updated_since=UPDATED_SINCE)
+    assert query.split() == ['repo:org/repo', 'is:pr', 'is:merged', 'author:alice', *date.search_qualifiers,
+                             'updated:>=2024-03-01T00:00:00Z']
+
+
+def test_search_hits_are_fetched_through_the_shared_executor(monkeypatch):
+    client = GitHubClient('token', 'http://127.0.0.1', max_workers=4)
+    pages = [{'total_count': 3, 'items': [{'number': 3}, {'number': 2}, {'number': 1}]}]
+    monkeypatch.setattr(client, '_get_json', lambda endpoint, params=None: pages.pop(0))
+    threads = set()
+
+    def fetch_pull(org, repo, number):
+        threads.add(threading.current_thread().name)
+        return {'number': number, 'user': {'login': 'alice'}, 'merged_at': '2024-03-02T00:00:00Z'}
+
+    monkeypatch.setattr(client, 'fetch_pull', fetch_pull)
+    prs = client.fetch_merged_prs('org', 'repo', filters=[filters.author_whitelist_filter(['alice'])],
+                                  use_search=True)
+
+    assert [pr['number'] for pr in prs] == [3, 2, 1]
+    assert threads and all(name.startswith('github-pages') for name in threads)
+    assert client._executor() is client._executor()
@@ -0,0 +1,119 @@
+import pytest
+
+import extract
+import filters
+import transform
+from GitHubClient import GitHubClient
+from GitHubGraphQLClient import GRAPHQL_FIELDS, GitHubGraphQLClient
+from conftest import ORGANIZATION, REPOSITORY
+
+
+class SyntheticGraphQLClient(GitHubGraphQLClient):
+    """
+    GraphQL client answering MERGED_PRS_QUERY from the synthetic repository, in GitHub's GraphQL shapes.
+    Check runs are filtered like the query asks (checkType: LATEST keeps the latest run of each name).
+    """
+
+    def __init__(self, repo, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.repo = repo
+
+    def _graphql(self, query, variables):
+        latest_only = 'checkType: LATEST' in query
+        nodes = [self._node(pr, latest_only) for pr in self.repo.prs(0, self.repo.pr_count) if pr['merged_at']]
+        return {'repository': {'pullRequests': {'pageInfo': {'hasNextPage': False, 'endCursor': None},
+                                                'nodes': nodes}}}
+
+    def _node(self, pr, latest_only):
+        runs = [run for run in self.repo.check_runs(pr['merge_commit_sha']) if run['status'] == 'completed']
+        if latest_only:
+            latest = {}
+            for run in runs:
+                if run['name'] not in latest or run['id'] > latest[run['name']]['id']:
+                    latest[run['name']] = run
+            runs = [run for run in runs if latest[run['name']] is run]
+        suites = {}
+        for run in runs:
+            suites.setdefault(run['app']['slug'], (run['app'], []))[1].append({
+                'databaseId': run['id'], 'name': run['name'], 'status': run['status'].upper(),
+                'conclusion': run['conclusion'].upper() if run['conclusion'] else None,
+                'detailsUrl': run.get('details_url'), 'url': run.get('html_url'),
+                'startedAt': run['started_at'], 'completedAt': run['completed_at'],
+            })
+        reviews = [review for review in self.repo.reviews(pr['number']) if review['state'] == 'APPROVED']
+        return {
+            'databaseId': pr['id'], 'number': pr['number'], 'title': pr['title'], 'body': pr['body'],
+            'isDraft': pr['draft'], 'url': pr.get('html_url'), 'authorAssociation': pr.get('author_association'),
+            'createdAt': pr['created_at'], 'updatedAt': pr['updated_at'], 'closedAt': pr['closed_at'],
+            'mergedAt': pr['merged_at'], 'author': pr['user'],
+            'labels': {'nodes': [{'name': label['name']} for label in pr['labels']]},
+            'headRefName': pr['head']['ref'], 'headRefOid': pr['head']['sha'],
+            'baseRefName': pr['base']['ref'], 'baseRefOid': pr['base']['sha'],
+            'mergeCommit': {'oid': pr['merge_commit_sha'], 'checkSuites': {
+                'pageInfo': {'hasNextPage': False},
+                'nodes': [{'app': app, 'checkRuns': {'pageInfo': {'hasNextPage': False}, 'nodes': nodes}}
+                          for app, nodes in suites.values()],
+            }},
+            'reviews': {'pageInfo': {'hasNextPage': False}, 'nodes': [{
+                'databaseId': review['id'], 'state': review['state'], 'body': review['body'],
+                'url': review.get('html_url'), 'authorAssociation': review.get('author_association'),
+                'submittedAt': review['submitted_at'], 'commit': {'oid': review['commit_id']},
+                'author': review['user'],
+            } for review in reviews]},
+        }
+
+
+def fetch_records(client, pr_filters=None):
+    records = {}
+    for pr in client.fetch_merged_prs(ORGANIZATION, REPOSITORY, filters=pr_filters):
+        reviews = client.fetch_approved_reviews(ORGANIZATION, REPOSITORY, pr['number'])
+        checks = client.fetch_pr_check_runs(ORGANIZATION, REPOSITORY, pr['merge_commit_sha'])
+        records[pr['number']] = (pr, reviews, checks)
+    return records
+
+
+def mapped(kind, obj):
+    return {field: filters.field_getter(field)(obj) for field in GRAPHQL_FIELDS[kind]}
+
+
+@pytest.fixture
+def rerun_check(synthetic_repo):
+    # a check that failed and was rerun successfully: only the rerun is the latest run of its name
+    pr = next(pr for pr in synthetic_repo.prs(0, synthetic_repo.pr_count) if pr['merged_at'])
+    sha = pr['merge_commit_sha']
+    run = dict(synthetic_repo.check_runs(sha)[0], conclusion='success')
+    synthetic_repo.check_overrides[sha] = [dict(run, id=run['id'] - 1, conclusion='failure'), run]
+    return pr['number']
+
+
+def test_graphql_backend_matches_rest(config, synthetic_repo, mock_api, rerun_check):
+    cfg = extract.fetch_config(config)
+    rest = GitHubClient(cfg.token, cfg.api_base_url)
+    graphql = SyntheticGraphQLClient(synthetic_repo, cfg.token, cfg.api_base_url)
+
+    rest_records = fetch_records(rest)
+    graphql_records = fetch_records(graphql)
+    assert sum(mock_api.counts.values()) == len(rest_records) * 2 + 2 # GraphQL made no REST requests
+
+    assert list(graphql_records) == list(rest_records)
+    for number, (pr, reviews, checks) in rest_records.items():
+        graphql_pr, graphql_reviews, graphql_checks = graphql_records[number]
+        assert mapped('pr', graphql_pr) == mapped('pr', pr)
+        assert [mapped('review', review) for review in graphql_reviews] == [mapped('review', r) for r in reviews]
+        assert sorted(mapped('check', check).items() for check in graphql_checks) == \
+            sorted(mapped('check', check).items() for check in checks)
+        assert transform.process_pr(*graphql_records[number]) == transform.process_pr(pr, reviews, checks)
+    assert transform.process_pr(*graphql_records[rerun_check])['checks_passed']
+
+
+def test_graphql_backend_rejects_filters_on_unmapped_fields(config):
+    config['github']['backend'] = 'graphql'
+    cfg = extract.fetch_config(config)
+    supported = [filters.parse_expression("draft == false and labels.name == 'bug' and base.ref == 'main'")]
+    assert isinstance(extract.build_client(cfg, supported, [], []), GitHubGraphQLClient)
+
+    with pytest.raises(ValueError, match='milestone.title'):
+        extract.build_client(cfg, [filters.parse_expression("milestone.title == 'v1'")], [], [])
+    with pytest.raises(ValueError, match='output.title'):
+        extract.build_client(cfg, [], [], [filters.parse_expression("output.title is null")])
+    assert not extract.run_extract(config, [filters.parse_expression("requested_reviewers is null")], [], [])
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+import pipeline
+from conftest import report_path
+
+
+@pytest.mark.parametrize('raw_format', ['json', 'ndjson', 'sqlite'])
+def test_pipelined_runs_report_the_whole_snapshot(config, synthetic_repo, monkeypatch, raw_format):
+    config['data']['raw_format'] = raw_format
+    config['extract']['incremental'] = True
+    merged = synthetic_repo.merged_count()
+
+    transformations = []
+    run_transformation = pipeline.run_transformation
+    monkeypatch.setattr(pipeline, 'run_transformation',
+                        lambda config: transformations.append(config) or run_transformation(config))
+
+    # full run: the rows come from the stream
+    assert len(pipeline.run_pipelined(config, [], [], [])) == merged
+    assert transformations == []
+    full_report = pd.read_csv(report_path(config))
+
+    # incremental run: only the refetched PRs pass through, the merged snapshot is transformed
+    rows = pipeline.run_pipelined(config, [], [], [])
+    assert len(transformations) == 1
+    assert len(rows) == merged
+    assert sorted(pd.read_csv(report_path(config))['PR number']) == sorted(full_report['PR number'])
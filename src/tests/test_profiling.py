@@ -0,0 +1,26 @@
+import pstats
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_stage_stops_the_profilers_of_threads_outliving_it(tmp_path):
+    profiler = profiling.StageProfiler(profiling.ProfilingConfig(dir_path=str(tmp_path)), 'test')
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outliving') # like the client's page executor
+    try:
+        with profiler.stage('extract'):
+            assert executor.submit(busy, 1000).result() > 0
+
+        # the worker thread still runs, without the stage's profiler or hook
+        assert executor.submit(sys.getprofile).result() is None
+        assert threading._profile_hook is None
+        stats = pstats.Stats(str(tmp_path / 'test_extract.pstats'))
+        assert any(func[2] == 'busy' for func in stats.stats)
+    finally:
+        executor.shutdown()
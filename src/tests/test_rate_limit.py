@@ -0,0 +1,53 @@
+import time
+
+from rate_limit import RateLimitScheduler
+
+
+class Response:
+    def __init__(self, status_code=200, text='', **headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {key.replace('_', '-'): str(value) for key, value in headers.items()}
+
+
+def rate_limit_headers(limit, remaining, resource, reset_in=60):
+    return {'X_RateLimit_Limit': limit, 'X_RateLimit_Remaining': remaining,
+            'X_RateLimit_Resource': resource, 'X_RateLimit_Reset': int(time.time() + reset_in)}
+
+
+def test_search_bucket_keeps_a_proportional_reserve():
+    scheduler = RateLimitScheduler(['token'], reserve=50)
+    token = scheduler.acquire('search')
+    scheduler.observe(token, Response(**rate_limit_headers(30, 29, 'search')), 'search')
+
+    # the reserve of 50 would pause the whole 30/min bucket, it is capped at 3
+    now = time.time()
+    bucket = scheduler._bucket(token, 'search')
+    assert scheduler._available_at(bucket, now) <= now
+    for _ in range(26):
+        scheduler.acquire('search')
+    assert bucket.remaining == 3
+    assert scheduler._available_at(bucket, now) > now
+
+
+def test_core_bucket_keeps_the_configured_reserve():
+    scheduler = RateLimitScheduler(['token'], reserve=50)
+    token = scheduler.acquire()
+    scheduler.observe(token, Response(**rate_limit_headers(5000, 51, 'core')))
+    bucket = scheduler._bucket(token, 'core')
+    now = time.time()
+    assert scheduler._available_at(bucket, now) <= now
+    scheduler.observe(token, Response(**rate_limit_headers(5000, 50, 'core')))
+    assert scheduler._available_at(bucket, now) > now
+
+
+def test_tokens_are_spread_round_robin():
+    scheduler = RateLimitScheduler(['a', 'b'])
+    assert [scheduler.acquire() for _ in range(4)] == ['a', 'b', 'a', 'b']
+
+
+def test_secondary_rate_limit_pauses_the_token():
+    scheduler = RateLimitScheduler(['a', 'b'])
+    assert scheduler.observe('a', Response(403, 'secondary rate limit', Retry_After=30))
+    assert [scheduler.acquire() for _ in range(2)] == ['b', 'b']
+    assert not scheduler.observe('b', Response(403, 'Resource not accessible by integration'))
@@ -0,0 +1,31 @@
+import pytest
+
+from disk_cache import DiskCache
+from result_cache import ResultCache
+
+SUITES = [{'id': 1, 'name': 'github-actions', 'status': 'completed', 'conclusion': 'success'}]
+
+
+@pytest.mark.parametrize('get, put', [
+    ('get_check_runs', 'put_check_runs'),
+    ('get_check_suites', 'put_check_suites'),
+])
+def test_check_entries_are_keyed_by_the_check_projection(tmp_path, get, put):
+    disk = DiskCache(str(tmp_path / 'results'))
+    narrow = ResultCache(disk, fields={'check': ['id', 'name', 'status', 'conclusion']})
+    getattr(narrow, put)('org', 'repo', 'abc', SUITES)
+
+    assert getattr(narrow, get)('org', 'repo', 'abc') == SUITES
+    assert getattr(ResultCache(disk, fields={'check': ['id', 'name', 'status', 'conclusion']}), get)(
+        'org', 'repo', 'abc') == SUITES
+    # a filter on another check field needs entries that kept it
+    wider = ResultCache(disk, fields={'check': ['id', 'name', 'status', 'conclusion', 'app.slug']})
+    assert getattr(wider, get)('org', 'repo', 'abc') is None
+    # a different review projection doesn't matter
+    assert getattr(ResultCache(disk, fields=dict(narrow.fields, review=['id'])), get)('org', 'repo', 'abc') == SUITES
+
+
+def test_check_runs_and_suites_do_not_share_entries(tmp_path):
+    cache = ResultCache(DiskCache(str(tmp_path / 'results')))
+    cache.put_check_suites('org', 'repo', 'abc', SUITES)
+    assert cache.get_check_runs('org', 'repo', 'abc') is None
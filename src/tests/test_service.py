@@ -0,0 +1,220 @@
+import argparse
+import csv
+import hashlib
+import hmac
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import extract
+import filters
+import raw_records
+import service
+from benchmarks.synthetic import EPOCH
+from GitHubGraphQLClient import GitHubGraphQLClient
+from conftest import ORGANIZATION, REPOSITORY, report_path
+
+FULL_NAME = f"{ORGANIZATION}/{REPOSITORY}"
+
+
+def filter_args(*argv):
+    parser = argparse.ArgumentParser()
+    filters.add_filter_args(parser)
+    return parser.parse_args(list(argv))
+
+
+def report_rows(config):
+    with open(report_path(config), newline='', encoding='utf-8') as f:
+        return {int(row['PR number']): row for row in csv.DictReader(f)}
+
+
+def delivery(event, **payload):
+    return {'event': event, 'payload': dict(payload, repository={'full_name': FULL_NAME})}
+
+
+def replay(report_service, tmp_path, *deliveries):
+    path = tmp_path / 'deliveries.json'
+    path.write_text(json.dumps(list(deliveries)), encoding='utf-8')
+    service.replay(report_service, [str(path)])
+
+
+@pytest.fixture
+def extracted(config):
+    """
+    The configuration, after a full extraction and transformation of the synthetic repository.
+    """
+    assert extract.run_extract(config, [], [], [])
+    report_service = service.ReportService(config, filter_args(), service.ServiceConfig(debounce_seconds=0))
+    report_service.load()
+    report_service.save_report()
+    return config
+
+
+def new_service(config, *argv):
+    return service.ReportService(config, filter_args(*argv), service.ServiceConfig(debounce_seconds=0))
+
+
+@pytest.mark.parametrize('raw_format', ['json', 'ndjson', 'sqlite'])
+def test_review_event_refetches_only_that_prs_reviews(config, synthetic_repo, mock_api, tmp_path, raw_format):
+    config['data']['raw_format'] = raw_format
+    assert extract.run_extract(config, [], [], [])
+    report_service = new_service(config)
+    report_service.load()
+    report_service.save_report()
+    before = report_rows(config)
+
+    num = next(num for num, row in report_service.rows.items() if not row['cr_passed'])
+    synthetic_repo.review_overrides[num] = [
+        {'id': 1, 'state': 'APPROVED', 'user': {'login': 'alice'}, 'submitted_at': '2024-06-01T00:00:00Z'}]
+    mock_api.reset_counts()
+
+    replay(report_service, tmp_path,
+           delivery('pull_request_review', action='submitted', pull_request={'number': num}))
+
+    assert dict(mock_api.counts) == {'reviews': 1}
+    after = report_rows(config)
+    assert after[num]['CR_Passed'] == 'True'
+    assert {n: row for n, row in after.items() if n != num} == {n: row for n, row in before.items() if n != num}
+
+    # the saved snapshot holds the update, a restarted service sees it
+    reloaded = new_service(config)
+    reloaded.load()
+    assert reloaded.rows[num]['cr_passed'] is True
+
+
+def test_check_run_event_maps_the_merge_commit_to_its_pr(extracted, synthetic_repo, mock_api, tmp_path):
+    report_service = new_service(extracted)
+    report_service.load()
+    num, (pr, _, _) = next((num, record) for num, record in report_service.records.items()
+                           if report_service.rows[num]['checks_passed'])
+    sha = pr['merge_commit_sha']
+    synthetic_repo.check_overrides[sha] = [{'id': 1, 'name': 'build', 'status': 'completed', 'conclusion': 'failure'}]
+    mock_api.reset_counts()
+
+    replay(report_service, tmp_path,
+           delivery('check_run', action='completed', check_run={'head_sha': sha}),
+           delivery('check_run', action='completed', check_run={'head_sha': 'f' * 40})) # not a merge commit
+
+    assert dict(mock_api.counts) == {'check_runs': 1}
+    assert report_rows(extracted)[num]['CHECKS_PASSED'] == 'False'
+
+
+def test_pull_request_events(extracted, synthetic_repo, mock_api, tmp_path):
+    report_service = new_service(extracted)
+    report_service.load()
+    num = next(iter(report_service.records))
+    edited = dict(synthetic_repo.pr(synthetic_repo.pr_count - num), title='Renamed')
+    unmerged = next(pr for pr in synthetic_repo.prs(0, synthetic_repo.pr_count) if not pr['merged_at'])
+    newly_merged = dict(unmerged, merged_at=unmerged['updated_at'])
+    mock_api.reset_counts()
+
+    replay(report_service, tmp_path,
+           delivery('pull_request', action='edited', pull_request=edited),
+           delivery('pull_request', action='opened', pull_request=dict(unmerged, number=10_000)),
+           {'event': 'pull_request', 'payload': {'action': 'edited', 'pull_request': dict(edited, title='Other'),
+                                                 'repository': {'full_name': 'other/repo'}}})
+    # an edit only changes the PR fields, no refetch; unmerged PRs and other repositories are ignored
+    assert sum(mock_api.counts.values()) == 0
+    rows = report_rows(extracted)
+    assert rows[num]['PR title'] == 'Renamed'
+    assert 10_000 not in rows
+
+    replay(report_service, tmp_path, delivery('pull_request', action='closed', pull_request=newly_merged))
+    assert dict(mock_api.counts) == {'reviews': 1, 'check_runs': 1}
+    assert unmerged['number'] in report_rows(extracted)
+
+
+def test_merged_since_window_moves(extracted, synthetic_repo, tmp_path, monkeypatch):
+    days = (datetime.now(timezone.utc) - EPOCH).days + 2 # every synthetic PR is in the window
+    report_service = new_service(extracted, '--merged-since', str(days))
+    report_service.load()
+    num = next(iter(report_service.records))
+    pr = synthetic_repo.pr(synthetic_repo.pr_count - num)
+
+    # four days later the window starts after every synthetic PR
+    later = datetime.now(timezone.utc) + timedelta(days=4)
+    monkeypatch.setattr(filters, 'utc_cutoff', lambda days=0, **delta: later - timedelta(days=days, **delta))
+    replay(report_service, tmp_path, delivery('pull_request', action='edited', pull_request=pr))
+
+    assert num not in report_service.records
+    assert num not in report_rows(extracted)
+
+
+def test_graphql_prefetch_is_served_once(config, mock_api):
+    cfg = extract.fetch_config(config)
+    client = GitHubGraphQLClient(cfg.token, cfg.api_base_url)
+    stale = [{'id': 1, 'state': 'APPROVED', 'user': {'login': 'alice'}, 'submitted_at': '2024-01-01T00:00:00Z'}]
+    client._reviews[(ORGANIZATION, REPOSITORY, 7)] = stale
+    client._check_runs[(ORGANIZATION, REPOSITORY, 'abc')] = []
+    client._check_runs[(ORGANIZATION, 'other', 'abc')] = []
+
+    assert client.fetch_approved_reviews(ORGANIZATION, REPOSITORY, 7) == stale
+    assert mock_api.counts['reviews'] == 0
+    client.fetch_approved_reviews(ORGANIZATION, REPOSITORY, 7) # a refetch goes to REST
+    assert mock_api.counts['reviews'] == 1
+
+    client.clear_prefetched(ORGANIZATION, REPOSITORY)
+    assert list(client._check_runs) == [(ORGANIZATION, 'other', 'abc')]
+
+
+def test_verify_signature():
+    body = b'{"zen": "Keep it logically awesome."}'
+    signature = 'sha256=' + hmac.new(b'secret', body, hashlib.sha256).hexdigest()
+    assert service.verify_signature('secret', body, signature)
+    assert not service.verify_signature('other', body, signature)
+    assert not service.verify_signature('secret', body, None)
+
+
+@pytest.mark.parametrize('raw_format', ['json', 'ndjson', 'sqlite'])
+def test_refresh_merges_the_refetched_prs_in_memory(config, synthetic_repo, monkeypatch, raw_format):
+    config['data']['raw_format'] = raw_format
+    report_service = new_service(config)
+    report_service.load()
+    assert report_service.refresh() # full extraction, nothing on disk yet
+
+    num = next(num for num, row in report_service.rows.items() if not row['cr_passed'])
+    synthetic_repo.review_overrides[num] = [
+        {'id': 1, 'state': 'APPROVED', 'user': {'login': 'alice'}, 'submitted_at': '2024-06-01T00:00:00Z'}]
+    # the PR was updated after the previous run: refetched by the incremental run
+    monkeypatch.setattr(synthetic_repo, 'pr', lambda index, pr=synthetic_repo.pr: dict(
+        pr(index), updated_at='2099-01-01T00:00:00Z') if index == synthetic_repo.pr_count - num else pr(index))
+
+    monkeypatch.setattr(report_service, 'load', lambda: pytest.fail("refresh() reloaded the snapshot"))
+    assert report_service.refresh()
+    assert report_service.rows[num]['cr_passed'] is True
+
+    reloaded = new_service(config)
+    reloaded.load()
+    assert reloaded.rows == report_service.rows
+
+
+def test_ndjson_updates_are_appended_until_the_next_refresh(config, synthetic_repo, tmp_path):
+    config['data']['raw_format'] = 'ndjson'
+    report_service = new_service(config)
+    report_service.load()
+    assert report_service.refresh()
+    path = extract.raw_data_path(report_service.cfg)
+    with open(path, 'rb') as f:
+        snapshot = f.read()
+
+    num = next(num for num, row in report_service.rows.items() if not row['cr_passed'])
+    synthetic_repo.review_overrides[num] = [
+        {'id': 1, 'state': 'APPROVED', 'user': {'login': 'alice'}, 'submitted_at': '2024-06-01T00:00:00Z'}]
+    replay(report_service, tmp_path,
+           delivery('pull_request_review', action='submitted', pull_request={'number': num}))
+
+    with open(path, 'rb') as f:
+        assert f.read() == snapshot
+    with open(raw_records.updates_path(path), encoding='utf-8') as f:
+        assert [json.loads(line)['pr']['number'] for line in f] == [num]
+    assert report_rows(config)[num]['CR_Passed'] == 'True'
+
+    # the next snapshot compacts the updates
+    assert report_service.refresh()
+    assert not os.path.exists(raw_records.updates_path(path))
+    reloaded = new_service(config)
+    reloaded.load()
+    assert reloaded.rows == report_service.rows
+    assert reloaded.rows[num]['cr_passed'] is True
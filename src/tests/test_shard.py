@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import yaml
+
+import extract
+import filters
+import shard
+
+
+def filter_args(*argv):
+    parser = argparse.ArgumentParser()
+    filters.add_filter_args(parser)
+    args = parser.parse_args(list(argv))
+    return {name: getattr(args, name) for name in shard.filter_arg_names()}
+
+
+def raw_snapshot(config):
+    with open(extract.raw_data_path(extract.fetch_config(config)), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def sharded(config, tmp_path, monkeypatch):
+    """
+    The configuration with a shard directory under tmp_path, also written to a settings file for
+    the worker processes (which log to tmp_path/logs).
+    """
+    monkeypatch.chdir(tmp_path)
+    config['sharding'] = {'dir_path': str(tmp_path / 'shards')}
+    config_path = tmp_path / 'settings.yaml'
+    config_path.write_text(yaml.safe_dump(config), encoding='utf-8')
+    return config, str(config_path)
+
+
+@pytest.fixture
+def single_process_snapshot(config):
+    assert extract.run_extract(config, [], [], [])
+    snapshot = raw_snapshot(config)
+    os.remove(extract.raw_data_path(extract.fetch_config(config)))
+    return snapshot
+
+
+def shard_command(config_path, *argv):
+    return [sys.executable, os.path.abspath(shard.__file__), '--config', config_path, *argv]
+
+
+def test_local_matches_a_single_process_extraction(sharded, single_process_snapshot):
+    config, config_path = sharded
+    assert shard.run_local(config_path, config, filter_args(), shard_count=5, processes=3)
+    assert raw_snapshot(config) == single_process_snapshot
+
+
+def test_plan_work_merge_commands(sharded, single_process_snapshot):
+    config, config_path = sharded
+    subprocess.run(shard_command(config_path, 'plan', '--shards', '3'), check=True)
+    dir_path = shard.shard_dir_path(config)
+    with open(os.path.join(dir_path, shard.MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['pr_count'] == len(single_process_snapshot['merged_prs'])
+    assert len(manifest['shards']) == 3
+
+    # one worker per shard, like on separate machines
+    shard_paths = [os.path.join(dir_path, name) for name in manifest['shards']]
+    workers = [subprocess.Popen(shard_command(config_path, 'work', path)) for path in shard_paths]
+    assert [worker.wait() for worker in workers] == [0, 0, 0]
+
+    # a lost shard output fails the merge until that shard is rerun
+    os.remove(os.path.join(dir_path, shard.SHARD_OUTPUT_FILENAME_TEMPLATE.format(index=1)))
+    with pytest.raises(subprocess.CalledProcessError):
+        subprocess.run(shard_command(config_path, 'merge'), check=True)
+    subprocess.run(shard_command(config_path, 'work', shard_paths[1]), check=True)
+    subprocess.run(shard_command(config_path, 'merge'), check=True)
+
+    assert raw_snapshot(config) == single_process_snapshot
+
+
+def test_plan_removes_only_the_files_of_the_previous_plan(sharded):
+    config, _ = sharded
+    dir_path = shard.shard_dir_path(config)
+    os.makedirs(os.path.join(dir_path, 'archive'))
+    for name in ('notes.txt', 'shard_0009.json', 'shard_0009.out.ndjson', 'shard_0009.out.ndjson.tmp'):
+        with open(os.path.join(dir_path, name), 'w', encoding='utf-8') as f:
+            f.write('stale')
+
+    manifest_path = shard.plan_shards(config, filter_args(), 2)
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        shards = json.load(f)['shards']
+    assert sorted(os.listdir(dir_path)) == sorted(['archive', 'notes.txt', shard.MANIFEST_FILENAME, *shards])
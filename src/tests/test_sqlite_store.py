@@ -0,0 +1,174 @@
+import pandas as pd
+import pytest
+
+import extract
+import filters
+import sqlite_store
+import transform
+from benchmarks.synthetic import SyntheticRepo
+from sqlite_store import SQLiteStore
+
+REPO = 'synthetic/repo'
+
+
+def synthetic_records(pr_count, seed=0):
+    """
+    (pr, reviews, checks) records of the merged PRs of a synthetic repository, with every review state.
+    """
+    repo = SyntheticRepo(pr_count, seed=seed)
+    for pr in repo.prs(0, pr_count):
+        if pr['merged_at']:
+            yield pr, repo.reviews(pr['number']), repo.check_runs(pr['merge_commit_sha'])
+
+
+def edge_case_records():
+    def pr(number, **fields):
+        return dict({'number': number, 'title': f"PR {number}", 'user': {'login': 'alice'},
+                     'merged_at': '2024-01-01T00:00:00Z', 'updated_at': f"2024-01-{number:02d}T00:00:00Z",
+                     'merge_commit_sha': f"{number:040x}"}, **fields)
+
+    def check(check_id, status='completed', conclusion='success'):
+        return {'id': check_id, 'name': 'build', 'status': status, 'conclusion': conclusion}
+
+    def review(review_id, state):
+        return {'id': review_id, 'state': state, 'user': {'login': 'bob'}, 'submitted_at': '2024-01-01T00:00:00Z'}
+
+    return [
+        (pr(1), [], []),
+        (pr(2), [review(1, 'COMMENTED'), review(2, 'APPROVED')], [check(1), check(2)]),
+        (pr(3), [review(3, 'CHANGES_REQUESTED')], [check(3), check(4, conclusion='failure')]),
+        (pr(4), [], [check(5, status='in_progress', conclusion=None)]),
+        (pr(5), [], [check(6), check(7, status='queued', conclusion=None)]),
+        (pr(6), [], [check(8, conclusion=None)]),
+        (pr(7, title=None, user={}), [review(4, 'APPROVED')], [check(9)]),
+        (pr(8, merge_commit_sha=None), [], [check(10)]), # no merge commit: check runs are keyed by PR
+        (pr(9, merge_commit_sha=None), [], [check(11, conclusion='failure')]),
+    ]
+
+
+def stored_report(records, repo=REPO):
+    return {row['pr_number']: row for row in report_rows(records, repo)}
+
+
+def report_rows(records, repo=REPO, path=':memory:'):
+    store = SQLiteStore(path)
+    try:
+        with store.transaction():
+            for pr, reviews, checks in records:
+                store.upsert_pr(repo, pr, reviews, checks)
+        df = store.report_frame(repo)
+    finally:
+        store.close()
+    assert list(df.columns) == transform.PROCESSED_COLUMNS
+    return df.astype(object).where(pd.notna(df), None).to_dict('records')
+
+
+@pytest.mark.parametrize('records', [
+    pytest.param(lambda: list(synthetic_records(300)), id='synthetic'),
+    pytest.param(lambda: list(synthetic_records(300, seed=1)), id='synthetic-seed-1'),
+    pytest.param(edge_case_records, id='edge-cases'),
+])
+def test_report_query_matches_process_pr(records):
+    records = records()
+    expected = {pr['number']: transform.process_pr(pr, reviews, checks) for pr, reviews, checks in records}
+    assert stored_report(records) == expected
+
+
+def test_report_query_orders_by_latest_update():
+    rows = report_rows(edge_case_records())
+    assert [row['pr_number'] for row in rows] == [9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_report_query_is_per_repository(tmp_path):
+    path = str(tmp_path / 'github.db')
+    report_rows(edge_case_records(), repo='other/repo', path=path)
+    rows = report_rows(edge_case_records()[:2], path=path)
+    assert [row['pr_number'] for row in rows] == [2, 1]
+
+
+@pytest.fixture
+def store_cfg(config, monkeypatch):
+    config['data']['raw_format'] = 'sqlite'
+    monkeypatch.setattr(extract, 'STORE_BATCH_SIZE', 7)
+    return extract.fetch_config(config)
+
+
+def stored_numbers(cfg, repo=REPO):
+    store = SQLiteStore(cfg.sqlite_path)
+    try:
+        return sorted(pr['number'] for pr in store.iter_prs(repo))
+    finally:
+        store.close()
+
+
+def stored_report_of(cfg):
+    store = SQLiteStore(cfg.sqlite_path)
+    try:
+        return {row['pr_number']: row for row in store.report_frame(REPO).to_dict('records')}
+    finally:
+        store.close()
+
+
+def test_save_store_records_releases_the_write_lock_between_batches(store_cfg, monkeypatch):
+    monkeypatch.setattr(sqlite_store, 'BUSY_TIMEOUT_SECONDS', 0.1)
+    records = edge_case_records()
+    records += [(dict(pr, number=pr['number'] + 10), reviews, checks) for pr, reviews, checks in records]
+
+    def fetched():
+        # another run writes to the store while this one fetches the next batch from GitHub
+        for index, record in enumerate(records):
+            if index == 9:
+                other = SQLiteStore(store_cfg.sqlite_path)
+                try:
+                    with other.transaction():
+                        other.upsert_pr('other/repo', *record)
+                finally:
+                    other.close()
+            yield record
+
+    watermark = extract.save_store_records(fetched(), store_cfg)
+
+    assert stored_numbers(store_cfg) == [1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 15, 16, 17, 18, 19]
+    assert stored_numbers(store_cfg, 'other/repo') == [11]
+    assert watermark == '2024-01-09T00:00:00Z'
+
+
+def test_save_store_records_full_and_incremental_runs(store_cfg):
+    records = edge_case_records()
+    extract.save_store_records(records, store_cfg)
+
+    # an incremental run keeps the PRs it didn't refetch, with the current filters applied to them
+    extract.save_store_records(records[:1], store_cfg, merge_previous=True,
+                               pr_filters=[filters.parse_expression("number != 6")],
+                               review_filters=[filters.parse_expression("user.login != 'bob'")])
+    assert stored_numbers(store_cfg) == [1, 2, 3, 4, 5, 7, 8, 9]
+    report = stored_report_of(store_cfg)
+    assert not any(row['cr_passed'] for row in report.values())
+    assert sorted(n for n, row in report.items() if row['checks_passed']) == [2, 5, 7, 8]
+
+    # a full run only keeps what it fetched
+    extract.save_store_records(records[:2], store_cfg)
+    assert stored_numbers(store_cfg) == [1, 2]
+
+
+
+def test_save_store_records_reads_back_only_the_prs_it_did_not_refetch(store_cfg, monkeypatch):
+    records = edge_case_records()
+    extract.save_store_records(records, store_cfg)
+
+    read_back = []
+    iter_records = SQLiteStore.iter_records
+
+    def spy(self, repo, exclude=()):
+        for record in iter_records(self, repo, exclude):
+            read_back.append(record[0]['number'])
+            yield record
+
+    monkeypatch.setattr(SQLiteStore, 'iter_records', spy)
+    extract.save_store_records(records[:4], store_cfg)
+    assert read_back == [] # a full run deletes the others in SQL
+    assert stored_numbers(store_cfg) == [1, 2, 3, 4]
+
+    extract.save_store_records(records[2:], store_cfg, merge_previous=True)
+    assert sorted(read_back) == [1, 2]
+    assert stored_numbers(store_cfg) == [1, 2, 3, 4, 5, 6, 7, 8, 9]
@@ -0,0 +1,27 @@
+import transform
+
+
+def edge_case_records():
+    pr = {'number': 1, 'title': 'PR', 'user': {'login': 'alice'}, 'merged_at': '2024-01-01T00:00:00Z'}
+    success = {'status': 'completed', 'conclusion': 'success'}
+    return [
+        (pr, [], []), # neither reviews nor checks
+        (dict(pr, number=2), [{'state': 'COMMENTED'}, {'state': 'APPROVED'}], [success, success]),
+        (dict(pr, number=3), [{'state': 'CHANGES_REQUESTED'}], [success, {'status': 'completed', 'conclusion': 'failure'}]),
+        (dict(pr, number=4), [], [{'status': 'in_progress', 'conclusion': None}]), # nothing completed yet
+        (dict(pr, number=5), [], [success, {'status': 'queued', 'conclusion': None}]),
+        (dict(pr, number=6), [], [{'status': 'completed', 'conclusion': 'skipped'}]),
+        (dict(pr, number=7), [{}], [{'status': 'completed'}]), # missing state / conclusion
+        ({'number': 8, 'user': {}}, [], []), # missing title, author and merge date
+        ({'number': 9}, [{'state': 'APPROVED'}], [success]), # missing user
+    ]
+
+
+def test_process_pr_edge_cases():
+    rows = {row['pr_number']: row for row in (transform.process_pr(*record) for record in edge_case_records())}
+    assert all(list(row) == transform.PROCESSED_COLUMNS for row in rows.values())
+    assert [n for n, row in rows.items() if row['cr_passed']] == [2, 9]
+    assert [n for n, row in rows.items() if row['checks_passed']] == [2, 5, 9]
+    assert rows[8] == {'pr_number': 8, 'pr_title': None, 'author': None, 'merge_date': None,
+                       'cr_passed': False, 'checks_passed': False}
+
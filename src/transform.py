@@ -1,12 +1,16 @@
 
+import csv
 import json
 import os
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from tqdm import tqdm
 
 import pandas as pd
 
+import metrics
+from raw_records import RAW_NDJSON_FILENAME_TEMPLATE, iter_raw_records
+from sqlite_store import SQLiteStore
 
 # Constants
 MERGED_PRS_KEY = 'merged_prs'
@@ -16,6 +20,21 @@ CHECK_STATUSES_KEY = 'check_statuses'
 RAW_FILENAME_TEMPLATE = "{org}_{repo}_merged_prs.json"
 PROCESSED_FILENAME_TEMPLATE = "{org}_{repo}_processed_merged_prs.json"
 REPORT_FILENAME_TEMPLATE = "{org}_{repo}_report.csv"
+REPORT_PARQUET_FILENAME_TEMPLATE = "{org}_{repo}_report.parquet"
+REPORT_FILENAME_TEMPLATES = {'csv': REPORT_FILENAME_TEMPLATE, 'parquet': REPORT_PARQUET_FILENAME_TEMPLATE}
+COMBINED_REPORT_FILENAME_TEMPLATES = {'csv': "{org}_combined_report.csv", 'parquet': "{org}_combined_report.parquet"}
+
+REPORT_FORMATS = ('csv', 'parquet')
+REPORT_COLUMNS = {
+    'repository': 'Repository', # combined reports only
+    'pr_number': 'PR number',
+    'pr_title': 'PR title',
+    'author': 'Author',
+    'merge_date': 'Merge date',
+    'cr_passed': 'CR_Passed',
+    'checks_passed': 'CHECKS_PASSED',
+}
+PROCESSED_COLUMNS = ['pr_number', 'pr_title', 'author', 'merge_date', 'cr_passed', 'checks_passed']
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +49,10 @@ class TransformConfig:
     raw_dir_path: str
     processed_dir_path: str
     report_dir_path: str
+    raw_format: str = 'json'
+    sqlite_path: str = None
+    report_formats: tuple = ('csv',)
+    parquet_compression: str = 'zstd'
 
 
 def fetch_config(config):
@@ -54,10 +77,20 @@ def fetch_config(config):
         raise ValueError("Missing 'data.raw_dir_path' in configuration.")
     if 'processed_dir_path' not in data_cfg:
         raise ValueError("Missing 'data.processed_dir_path' in configuration.")
+    raw_format = data_cfg.get('raw_format', 'json')
+    if raw_format not in ('json', 'ndjson', 'sqlite'):
+        raise ValueError(f"Invalid 'data.raw_format': '{raw_format}'")
+    if raw_format == 'sqlite' and 'sqlite_path' not in data_cfg:
+        raise ValueError("Missing 'data.sqlite_path' in configuration.")
 
     output_cfg = config.get('output')
     if not output_cfg or 'report_dir_path' not in output_cfg:
         raise ValueError("Missing 'output.report_dir_path' in configuration.")
+    report_formats = tuple(output_cfg.get('formats', ['csv']))
+    for report_format in report_formats:
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Invalid 'output.formats' entry: '{report_format}' "
+                             f"(expected one of {', '.join(REPORT_FORMATS)})")
 
     return TransformConfig(
         api_base_url=github_cfg['api_base_url'],
@@ -66,6 +99,10 @@ def fetch_config(config):
         raw_dir_path=data_cfg['raw_dir_path'],
         processed_dir_path=data_cfg['processed_dir_path'],
         report_dir_path=output_cfg['report_dir_path'],
+        raw_format=raw_format,
+        sqlite_path=data_cfg.get('sqlite_path'),
+        report_formats=report_formats,
+        parquet_compression=output_cfg.get('parquet_compression', 'zstd'),
     )
 
 
@@ -89,6 +126,32 @@ def load_raw_prs(raw_path):
     return merged_prs, reviews, check_statuses
 
 
+def iter_raw_prs(raw_path, raw_format='json'):
+    """
+    Iterates over the raw PR data, one PR at a time.
+    The ndjson format is streamed from disk, so memory stays flat regardless of the repo size.
+
+    Yields:
+        (pr, reviews, checks) tuples
+
+    Raises:
+        KeyError: if reviews or check runs of a PR are missing (json format)
+    """
+    if raw_format == 'ndjson':
+        logger.debug(f"Streaming raw PR records from {raw_path}")
+        yield from iter_raw_records(raw_path)
+        return
+
+    merged_prs, reviews_map, checks_map = load_raw_prs(raw_path)
+    for pr in merged_prs:
+        pr_key = str(pr.get('number'))
+
+        if pr_key not in reviews_map or pr_key not in checks_map:
+            raise KeyError(f"Missing data for PR number {pr_key}")
+
+        yield pr, reviews_map[pr_key], checks_map[pr_key]
+
+
 def process_pr(pr, reviews, checks):
     """
     Transforms a single PR record into a flat dictionary for reporting.
@@ -110,12 +173,16 @@ def process_pr(pr, reviews, checks):
         'cr_passed': cr_passed,
         'checks_passed': checks_passed,
     }
-    logger.debug(f"Processed PR data: {result}")
+    if logger.isEnabledFor(logging.DEBUG): # don't format the dict for every PR when it isn't logged
+        logger.debug(f"Processed PR data: {result}")
     return result
 
 
 def save_processed_prs(processed, cfg: TransformConfig):
 
+    if isinstance(processed, pd.DataFrame):
+        processed = processed.to_dict(orient='records')
+
     try:
         os.makedirs(cfg.processed_dir_path, exist_ok=True)
         filename = PROCESSED_FILENAME_TEMPLATE.format(org=cfg.organization, repo=cfg.repository)
@@ -130,36 +197,145 @@ def save_processed_prs(processed, cfg: TransformConfig):
         raise
 
 
-def save_report(processed_data, cfg: TransformConfig):
+def typed_report_frame(df):
+    """
+    Converts the report columns to their real types: int PR number, UTC timestamp merge date,
+    string title/author and bool flags (CSV keeps everything as text).
+    """
+    return df.astype({
+        'PR number': 'int64',
+        'PR title': 'string',
+        'Author': 'string',
+        'CR_Passed': 'bool',
+        'CHECKS_PASSED': 'bool',
+    }).assign(**{'Merge date': pd.to_datetime(df['Merge date'], utc=True)})
+
 
+def save_report(processed_data, cfg: TransformConfig, filename_templates=None):
+
+    filename_templates = filename_templates or REPORT_FILENAME_TEMPLATES
     try:
         os.makedirs(cfg.report_dir_path, exist_ok=True)
-        df = pd.DataFrame.from_records(processed_data).rename(columns={
-            'pr_number': 'PR number',
-            'pr_title': 'PR title',
-            'author': 'Author',
-            'merge_date': 'Merge date',
-            'cr_passed': 'CR_Passed',
-            'checks_passed': 'CHECKS_PASSED',
-        })
-
-        filename = REPORT_FILENAME_TEMPLATE.format(org=cfg.organization, repo=cfg.repository)
-        path = os.path.join(cfg.report_dir_path, filename)
-        df.to_csv(path, index=False)
-
-        logger.info(f"Saved report to {path}")
+        df = processed_data if isinstance(processed_data, pd.DataFrame) else pd.DataFrame.from_records(processed_data)
+        df = df.rename(columns=REPORT_COLUMNS)
+
+        for report_format in cfg.report_formats:
+            filename = filename_templates[report_format].format(org=cfg.organization, repo=cfg.repository)
+            path = os.path.join(cfg.report_dir_path, filename)
+            if report_format == 'parquet':
+                try:
+                    typed_report_frame(df).to_parquet(path, index=False, compression=cfg.parquet_compression)
+                except ImportError as e:
+                    raise ImportError("Parquet output needs pyarrow, install it with 'pip install pyarrow'.") from e
+            else:
+                df.to_csv(path, index=False)
+
+            logger.info(f"Saved report to {path}")
     except Exception:
         logger.exception(f"Failed to save report to {cfg.report_dir_path}")
         raise
 
 
-def run_transformation(config_dict) -> None:
+class ReportStream:
+    """
+    Builds the outputs of run_transformation from PR records while they are extracted (pipelined mode).
+
+    process() runs process_pr on each record as it passes through and appends the row to a temporary
+    CSV file next to the report right away, which replaces the report on close(); abort() deletes it,
+    so a failed run leaves the previous report in place. The processed JSON and the other report
+    formats need all rows and are written by close().
+    """
+
+    def __init__(self, cfg: TransformConfig):
+        self.cfg = cfg
+        self.rows = []
+        self._csv_file = None
+        self._csv_writer = None
+
+    def process(self, records):
+        """
+        Passes (pr, reviews, checks) records through, processing each one on the way.
+        """
+        for record in records:
+            row = process_pr(*record)
+            self.rows.append(row)
+            if 'csv' in self.cfg.report_formats:
+                self._write_csv_row(row)
+            yield record
+
+    def _write_csv_row(self, row):
+        if self._csv_writer is None:
+            os.makedirs(self.cfg.report_dir_path, exist_ok=True)
+            filename = REPORT_FILENAME_TEMPLATE.format(org=self.cfg.organization, repo=self.cfg.repository)
+            self.csv_path = os.path.join(self.cfg.report_dir_path, filename)
+            self._csv_file = open(f"{self.csv_path}.tmp", 'w', encoding='utf-8', newline='')
+            self._csv_writer = csv.writer(self._csv_file, lineterminator='\n') # same output as DataFrame.to_csv
+            self._csv_writer.writerow([REPORT_COLUMNS[column] for column in PROCESSED_COLUMNS])
+
+        self._csv_writer.writerow([row[column] for column in PROCESSED_COLUMNS])
+        self._csv_file.flush() # rows are readable (in the .tmp file) as soon as they are processed
+
+    def close(self):
+        """
+        Completes the outputs.
+
+        Returns:
+            The processed PR rows, or None if no record passed through.
+        """
+        if self._csv_file:
+            self._csv_file.close()
+            os.replace(self._csv_file.name, self.csv_path)
+            logger.info(f"Saved report to {self.csv_path}")
+        if not self.rows:
+            return None
+
+        logger.info(f"Processed {len(self.rows)} PR records")
+        with metrics.REGISTRY.stage('transform.save'):
+            save_processed_prs(self.rows, self.cfg)
+            other_formats = tuple(report_format for report_format in self.cfg.report_formats if report_format != 'csv')
+            if other_formats:
+                save_report(self.rows, replace(self.cfg, report_formats=other_formats))
+        return self.rows
+
+    def abort(self):
+        if self._csv_file:
+            self._csv_file.close()
+            if os.path.exists(self._csv_file.name):
+                os.remove(self._csv_file.name)
+
+
+def save_combined_report(reports, config_dict):
+    """
+    Saves one report of several repositories, with a leading repository column.
+
+    Args:
+        reports: mapping of 'org/repo' to the processed PR rows returned by run_transformation
+        config_dict: dict loaded from settings.yaml (output settings and file name organization)
+    """
+    cfg = fetch_config(config_dict)
+    frames = [
+        (rows if isinstance(rows, pd.DataFrame) else pd.DataFrame.from_records(rows, columns=PROCESSED_COLUMNS))
+        .assign(repository=repository)
+        for repository, rows in reports.items()
+    ]
+    combined = pd.concat(frames, ignore_index=True)[['repository'] + PROCESSED_COLUMNS]
+
+    logger.info(f"Combining the reports of {len(reports)} repositories ({len(combined)} PRs)")
+    save_report(combined, cfg, COMBINED_REPORT_FILENAME_TEMPLATES)
+
+
+@metrics.REGISTRY.timed('transform')
+def run_transformation(config_dict):
     """
     The transformation pipeline:
       1. Validates configuration
-      2. Loads raw PR data
+      2. Loads raw PR data (streamed one PR at a time for the ndjson raw format)
       3. Processes each PR
-      4. Saves JSON and CSV outputs
+         (with the sqlite raw format, steps 2 and 3 are a single report query on the store)
+      4. Saves JSON and report outputs (CSV and/or Parquet, see output.formats)
+
+    Returns:
+        The processed PR rows (list of dicts or DataFrame), or None if there were no merged PRs.
 
     Raises:
         ValueError: if configuration is invalid
@@ -169,39 +345,54 @@ def run_transformation(config_dict) -> None:
     """
     # 1. Validate configuration
     cfg = fetch_config(config_dict)
-    logger.name = f'{__name__}_{cfg.organization}_{cfg.repository}'
-    logger.info(f"Starting transformation")
+    log = logger.getChild(f"{cfg.organization}_{cfg.repository}") # per repository, runs can be concurrent
+    log.info(f"Starting transformation")
 
     try:
+        if cfg.raw_format == 'sqlite':
+            # 2+3. Query the report rows from the store
+            store = SQLiteStore(cfg.sqlite_path)
+            try:
+                with metrics.REGISTRY.stage('transform.process'):
+                    processed_prs = store.report_frame(f"{cfg.organization}/{cfg.repository}")
+            finally:
+                store.close()
+            if len(processed_prs) == 0:
+                log.warning(f"No merged PRs found. Skipping transformation")
+                return
+
+            log.info(f"Queried {len(processed_prs)} PR records from {cfg.sqlite_path}")
+            with metrics.REGISTRY.stage('transform.save'):
+                save_processed_prs(processed_prs, cfg)
+                save_report(processed_prs, cfg)
+
+            log.info(f"Transformation completed")
+            return processed_prs
+
         # Build raw data file path
-        raw_filename = RAW_FILENAME_TEMPLATE.format(org=cfg.organization, repo=cfg.repository)
+        template = RAW_NDJSON_FILENAME_TEMPLATE if cfg.raw_format == 'ndjson' else RAW_FILENAME_TEMPLATE
+        raw_filename = template.format(org=cfg.organization, repo=cfg.repository)
         raw_path = os.path.join(cfg.raw_dir_path, raw_filename)
 
-        # 2. Load raw data
-        merged_prs, reviews_map, checks_map = load_raw_prs(raw_path)
+        # 2+3. Load raw data and process PRs, one at a time
+        records = tqdm(iter_raw_prs(raw_path, cfg.raw_format), desc="Processing PRs", unit="PR")
+        with metrics.REGISTRY.stage('transform.process'):
+            processed_prs = [process_pr(pr, reviews, checks) for pr, reviews, checks in records]
 
-        if len(merged_prs) == 0:
-            logger.warning(f"No merged PRs found. Skipping transformation")
+        if len(processed_prs) == 0:
+            log.warning(f"No merged PRs found. Skipping transformation")
             return
 
-        # 3. Process PRs
-        processed_prs = []
-        for pr in tqdm(merged_prs, desc="Processing PRs", unit="PR"):
-            pr_key = str(pr.get('number'))
-
-            if pr_key not in reviews_map or pr_key not in checks_map:
-                raise KeyError(f"Missing data for PR number {pr_key}")
-
-            processed_prs.append(process_pr(pr, reviews_map[pr_key], checks_map[pr_key]))
-
-        logger.info(f"Processed {len(processed_prs)} PR records")
+        log.info(f"Processed {len(processed_prs)} PR records")
 
         # 4. Save outputs
-        save_processed_prs(processed_prs, cfg)
-        save_report(processed_prs, cfg)
+        with metrics.REGISTRY.stage('transform.save'):
+            save_processed_prs(processed_prs, cfg)
+            save_report(processed_prs, cfg)
 
-        logger.info(f"Transformation completed")
+        log.info(f"Transformation completed")
+        return processed_prs
 
     except Exception as e:
-        logger.exception(f"Transformation failed: {e}")
+        log.exception(f"Transformation failed: {e}")
         raise
@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Constants
+RETRYABLE_STATUSES = frozenset({500, 502, 503, 504})
+
+
+class HttpTransport:
+    """
+    Pooled HTTP transport used by GitHubClient.
+
+    Keeps a single requests.Session, so connections are reused (keep-alive) and
+    responses are gzip-compressed. The connection pool should be sized to the number
+    of worker threads that share the transport.
+    Connection errors, timeouts and retryable statuses are retried with jittered
+    exponential backoff.
+
+    Any object with the same `get(url, headers=None, params=None)` method (and `post` for the
+    GraphQL backend) that returns a requests-like response can be passed to GitHubClient instead.
+    """
+
+    def __init__(self, pool_size=10, max_retries=5, backoff_factor=0.5, max_backoff=30.0,
+                 timeout=30.0, retry_statuses=RETRYABLE_STATUSES, metrics_registry=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retry_statuses = frozenset(retry_statuses)
+        self.metrics = metrics_registry or metrics.REGISTRY # retries are recorded here
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+
+        logger.debug(f"HttpTransport initialized with pool_size={pool_size}, max_retries={max_retries}")
+
+    def _backoff(self, attempt):
+        # "full jitter": a random delay up to the exponential bound, so parallel workers don't retry in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def request(self, method, url, headers=None, params=None, json=None):
+        """
+        Sends a request, retrying transient failures.
+
+        Returns:
+            The last response (which may still carry an error status once retries are exhausted).
+
+        Raises:
+            requests.ConnectionError / requests.Timeout: if the last attempt failed to connect.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, headers=headers, params=params, json=json,
+                                                timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status_code not in self.retry_statuses or attempt >= self.max_retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+                response.close() # release the connection back to the pool
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.metrics.record_retry(url, reason)
+            logger.warning(f"Request to {url} failed ({reason}), retrying in {delay:.2f}s "
+                           f"(attempt {attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+    def get(self, url, headers=None, params=None):
+        return self.request('GET', url, headers=headers, params=params)
+
+    def post(self, url, headers=None, json=None):
+        return self.request('POST', url, headers=headers, json=json)
+
+    def close(self):
+        self.session.close()